@@ -0,0 +1,81 @@
+import numpy as np
+
+from navPoint import get_coordinate_arrays
+from navSegment import get_segment_arrays
+
+
+class AirGraph:
+    def __init__(self, numbers, offsets, targets, weights):
+        self.numbers = numbers  # Sorted NavPoint numbers, index -> number
+        self.offsets = offsets  # Neighbors of index i are targets[offsets[i]:offsets[i + 1]]
+        self.targets = targets  # Neighbor indices
+        self.weights = weights  # Segment distances, aligned with targets
+
+
+def build_graph_from_arrays(point_numbers, origins, destinations, distances):
+    # Undirected CSR with the same semantics as AirSpace.undirected: one entry per
+    # neighbor, weighted by the first segment joining the pair, in segment order.
+    point_numbers = np.asarray(point_numbers, dtype=np.int64)
+    origins = np.asarray(origins, dtype=np.int64)
+    destinations = np.asarray(destinations, dtype=np.int64)
+    distances = np.asarray(distances, dtype=np.float64)
+
+    # Sort and drop repeats; np.unique is far slower on millions of integers
+    numbers = np.sort(np.concatenate((point_numbers, origins, destinations)))
+    numbers = numbers[np.r_[True, numbers[1:] != numbers[:-1]]]
+    n = len(numbers)
+    index_dtype = np.int32 if n < 2 ** 31 else np.int64
+
+    origin_index = np.searchsorted(numbers, origins)
+    destination_index = np.searchsorted(numbers, destinations)
+
+    sources = np.concatenate((origin_index, destination_index))
+    targets = np.concatenate((destination_index, origin_index))
+    weights = np.concatenate((distances, distances))
+    order = np.concatenate((np.arange(len(origins)), np.arange(len(origins))))
+
+    # Keep the first segment for every (source, target) pair
+    pair_keys = sources * n + targets
+    by_pair = np.lexsort((order, pair_keys))
+    first = np.ones(len(by_pair), dtype=bool)
+    first[1:] = pair_keys[by_pair[1:]] != pair_keys[by_pair[:-1]]
+    kept = by_pair[first]
+
+    by_source = kept[np.lexsort((order[kept], sources[kept]))]
+    sources = sources[by_source]
+
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=offsets[1:])
+
+    return AirGraph(numbers,
+                    offsets,
+                    targets[by_source].astype(index_dtype),
+                    weights[by_source])
+
+
+def build_graph(airspace):
+    graph = build_graph_from_arrays(get_coordinate_arrays(airspace.navpoints.store)[0],
+                                    *get_segment_arrays(airspace.navsegments.store))
+    airspace.graph = graph
+    return graph
+
+
+def get_index(graph, number):
+    i = int(np.searchsorted(graph.numbers, number))
+    if i < len(graph.numbers) and graph.numbers[i] == number:
+        return i
+    return None
+
+
+def get_number(graph, index):
+    return int(graph.numbers[index])
+
+
+def graph_neighbors(graph, index):
+    start = graph.offsets[index]
+    end = graph.offsets[index + 1]
+    return zip(graph.targets[start:end].tolist(), graph.weights[start:end].tolist())
+
+
+def graph_nbytes(graph):
+    return graph.numbers.nbytes + graph.offsets.nbytes + graph.targets.nbytes + graph.weights.nbytes
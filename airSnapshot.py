@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from airSpace import add_navairport, clear_airspace, load_from_files
+from airGraph import AirGraph, build_graph
+from bulkLoader import load_from_files_bulk
+from loadProgress import finish_file, set_stage, start_file
+from navAirport import NavAirport
+from navPoint import NavPointStore, reindex_rows
+from navSegment import NavSegmentStore
+
+SNAPSHOT_VERSION = 2  # Bump whenever the loaders change what an airspace holds
+
+_POINT_ARRAYS = ("numbers", "latitudes", "longitudes", "sorted_numbers", "sorted_rows")
+_SEGMENT_ARRAYS = ("origins", "destinations", "distances")
+_GRAPH_ARRAYS = ("numbers", "offsets", "targets", "weights")
+
+
+def file_fingerprint(path, with_hash=True):
+    stat = os.stat(path)
+    fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if with_hash:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        fingerprint["sha256"] = digest.hexdigest()
+    return fingerprint
+
+
+def save_snapshot(airspace, directory, sources=None):
+    # Writes the point and segment stores, the CSR graph and the airports as .npy
+    # files plus manifest.json into a scratch directory, then renames it into place.
+    # That swap is not atomic: for an instant directory is missing, and a reader then
+    # loads the text files as for any missing snapshot.
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=".snapshot-", dir=parent)
+    aside = None
+
+    try:
+        points = airspace.navpoints.store
+        if points.recent_rows:
+            reindex_rows(points)
+        for field in _POINT_ARRAYS:
+            array = getattr(points, field)
+            np.save(os.path.join(scratch, f"point_{field}.npy"),
+                    array if field.startswith("sorted") else array[:points.count])
+        names = "\n".join(points.names).encode("utf-8")
+        np.save(os.path.join(scratch, "point_names.npy"), np.frombuffer(names, dtype=np.uint8))
+
+        segments = airspace.navsegments.store
+        for field in _SEGMENT_ARRAYS:
+            np.save(os.path.join(scratch, f"segment_{field}.npy"), getattr(segments, field)[:segments.count])
+
+        graph = airspace.graph if airspace.graph is not None else build_graph(airspace)
+        for field in _GRAPH_ARRAYS:
+            np.save(os.path.join(scratch, f"graph_{field}.npy"), getattr(graph, field))
+
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "name": airspace.name,
+            "point_count": points.count,
+            "segment_count": segments.count,
+            "airports": [[a.name, a.sids, a.stars] for a in airspace.navairports.values()],
+            "heuristic_scale": airspace.heuristic_scale,
+            "sources": sources or {},
+        }
+        with open(os.path.join(scratch, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        # The old copy is moved aside, not deleted, until the new one is in place, and
+        # is moved back if that fails
+        if os.path.isdir(directory):
+            aside = scratch + ".old"
+            os.replace(directory, aside)
+        try:
+            os.replace(scratch, directory)
+        except BaseException:
+            if aside is not None:
+                os.replace(aside, directory)
+                aside = None
+            raise
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    finally:
+        # The replaced copy, or an orphan left by a failed move back
+        if aside is not None:
+            shutil.rmtree(aside, ignore_errors=True)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        return None
+    return manifest
+
+
+def load_snapshot(airspace, directory):
+    # Replaces whatever the airspace holds, closures and route cache included, with a
+    # snapshot. Arrays are memory-mapped copy-on-write,
+    # so pages are read lazily and later edits never touch the files. They are used as
+    # plain ndarray views: slicing an np.memmap is several times slower, which the
+    # searches pay on every graph_neighbors call.
+    manifest = read_manifest(directory)
+    if manifest is None:
+        raise ValueError(f"No usable airspace snapshot in {directory}")
+
+    def array(name):
+        return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="c").view(np.ndarray)
+
+    points = NavPointStore(capacity=0)
+    for field in _POINT_ARRAYS:
+        setattr(points, field, array(f"point_{field}"))
+    names = array("point_names").tobytes().decode("utf-8")
+    points.names = names.split("\n") if manifest["point_count"] else []
+    points.count = manifest["point_count"]
+
+    segments = NavSegmentStore(capacity=0)
+    for field in _SEGMENT_ARRAYS:
+        setattr(segments, field, array(f"segment_{field}"))
+    segments.count = manifest["segment_count"]
+
+    clear_airspace(airspace)
+    airspace.name = manifest["name"]
+    airspace.navpoints.store = points
+    airspace.navsegments.store = segments
+    airspace.names = dict(zip(reversed(points.names), reversed(points.numbers.tolist())))
+    airspace.graph = AirGraph(*(array(f"graph_{field}") for field in _GRAPH_ARRAYS))
+    airspace.heuristic_scale = manifest["heuristic_scale"]
+    for name, sids, stars in manifest["airports"]:
+        add_navairport(airspace, NavAirport(name, sids, stars))
+    return manifest
+
+
+def default_cache_directory(nav_file, seg_file, aer_file):
+    key = hashlib.sha256("\n".join(os.path.abspath(p) for p in (nav_file, seg_file, aer_file))
+                         .encode("utf-8")).hexdigest()[:16]
+    return os.path.join(os.path.dirname(os.path.abspath(nav_file)), ".airspace_cache", key)
+
+
+def _sources_unchanged(manifest, paths):
+    # Size and mtime match: trust the snapshot. Otherwise compare content hashes,
+    # so a touched but identical file still reuses it (and its new mtime is recorded).
+    touched = False
+    for path in paths:
+        recorded = manifest["sources"].get(os.path.abspath(path))
+        if recorded is None:
+            return False, False
+        current = file_fingerprint(path, with_hash=False)
+        if current["size"] != recorded["size"]:
+            return False, False
+        if current["mtime_ns"] != recorded["mtime_ns"]:
+            if file_fingerprint(path)["sha256"] != recorded["sha256"]:
+                return False, False
+            recorded["mtime_ns"] = current["mtime_ns"]
+            touched = True
+    return True, touched
+
+
+def load_from_files_cached(airspace, nav_file, seg_file, aer_file, cache_directory=None, bulk=True,
+                           progress=None):
+    # load_from_files backed by a snapshot: reused while the three source files are
+    # unchanged, rebuilt (and rewritten) otherwise. Returns True on success. progress
+    # (loadProgress.LoadProgress) is passed on to the loader; a cancelled load raises
+    # LoadCancelled and writes no snapshot.
+    paths = (nav_file, seg_file, aer_file)
+    if cache_directory is None:
+        cache_directory = default_cache_directory(*paths)
+
+    manifest = read_manifest(cache_directory)
+    try:
+        unchanged, touched = _sources_unchanged(manifest, paths) if manifest is not None else (False, False)
+        if unchanged:
+            load_snapshot(airspace, cache_directory)
+            for path in paths:
+                start_file(progress, path)
+                finish_file(progress, path)
+            if touched:
+                with open(os.path.join(cache_directory, "manifest.json"), "w", encoding="utf-8") as f:
+                    json.dump(manifest, f)
+            return True
+    except (OSError, ValueError) as e:
+        print(f"Ignoring airspace snapshot in {cache_directory}: {e}")
+
+    loader = load_from_files_bulk if bulk else load_from_files
+    if not loader(airspace, nav_file, seg_file, aer_file, progress=progress):
+        return False
+    set_stage(progress, "snapshot")
+
+    try:
+        save_snapshot(airspace, cache_directory,
+                      {os.path.abspath(path): file_fingerprint(path) for path in paths})
+    except OSError as e:
+        print(f"Could not write airspace snapshot to {cache_directory}: {e}")
+    return True
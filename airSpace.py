@@ -1,23 +1,148 @@
-from navPoint import NavPoint
-from navSegment import NavSegment
+from navPoint import NavPoint, NavPointMap, StoredNavPoint, find_row, find_rows, get_coordinate_arrays, store_point
+from navSegment import NavSegment, NavSegmentList, StoredNavSegment, get_segment_arrays
 from navAirport import NavAirport, add_sid, add_star
+from airGraph import get_index, get_number, graph_neighbors
+from pathSearch import SearchStats, ShortestPathTree, grow_tree, shortest_path, tree_path
+from geoDistance import EARTH_RADIUS_KM, haversine
+from loadProgress import LoadCancelled, check_cancelled, finish_file, set_file_read, set_stage, start_file
+from perfStats import LoadTimings, add_phase, stats_dict, trace_event, trace_search
+import perfStats
+from spatialIndex import build_point_grid, build_segment_grid, cap_bbox, grid_insert, grid_remove, grid_rows_in_bbox, \
+    segment_grid_insert, segment_rows_in_bbox, segment_rows_in_circle, segment_rows_in_polygon
+import bisect
+import itertools
 import math
+import time
+
+import numpy as np
+
+PROGRESS_LINES = 10_000  # load_from_files reports progress and checks for cancel this often
 
 
 class AirSpace:
     def __init__(self, name=""):
         self.name = name
-        self.navpoints = {}  # Dictionary of NavPoints keyed by number
-        self.navsegments = []  # List of NavSegments
+        self.navpoints = NavPointMap()  # NavPoints keyed by number, stored column-wise
+        self.navsegments = NavSegmentList()  # NavSegments in load order, stored column-wise
         self.navairports = {}  # Dictionary of NavAirports keyed by name
+        self.outgoing = {}  # origin number -> {destination number: distance}
+        self.incoming = {}  # destination number -> {origin number: distance}
+        self.undirected = {}  # number -> {neighbor number: distance}, first segment wins
+        self.adjacency_count = 0  # Segments already in the three maps above, see sync_adjacency
+        self.names = {}  # NavPoint name -> number, first point with that name wins
+        self.sorted_names = None  # Sorted (upper-case name, name) pairs, rebuilt on demand
+        self.name_trie = None  # Character trie over upper-case names, rebuilt on demand
+        self.point_grid = None  # spatialIndex.PointGrid over the points, built on demand, kept current by add_navpoint
+        self.segment_grid = None  # spatialIndex.SegmentGrid over segment boxes, built on demand
+        self.graph = None  # Compact AirGraph built by airGraph.build_graph, dropped on changes
+        self.heuristic_scale = None  # A* lower-bound factor, recomputed on demand after changes
+        self.version = 0  # Bumped by every change to points or segments
+        self.route_cache = None  # routeCache.RouteCache, created on first cached query
+        # Operational closures, applied by the searches on top of the data without changing
+        # version; see close_navsegment and friends
+        self.closed_points = set()  # NavPoint numbers the searches may not pass through
+        self.closed_segments = set()  # (lower number, higher number) connections closed both ways
+        self.segment_distances = {}  # (lower number, higher number) -> distance replacing the data's
+        self.closure_log = []  # Every closure change in order, replayed by routeCache.apply_closures
 
 
 def add_navpoint(airspace, navpoint):
-    airspace.navpoints[navpoint.number] = navpoint
+    # names keeps the point in the lowest store row for every name, as add_navpoints_bulk
+    # and load_snapshot build it
+    previous = airspace.navpoints.get(navpoint.number)
+    previous_name = None if previous is None else previous.name
+
+    grid = airspace.point_grid
+    store = airspace.navpoints.store
+    if grid is not None and previous is not None:
+        grid_remove(grid, find_row(store, navpoint.number), previous.latitude, previous.longitude)
+
+    row = store_point(store, navpoint.number, navpoint.name, navpoint.latitude, navpoint.longitude)
+    if grid is not None:
+        grid_insert(grid, row, navpoint.latitude, navpoint.longitude)
+    airspace.segment_grid = None
+    airspace.version += 1
+    airspace.graph = None
+    airspace.heuristic_scale = None
+
+    names = airspace.names
+    changed = False
+    if previous_name is not None and previous_name != navpoint.name and names.get(previous_name) == navpoint.number:
+        # Renamed: the old name passes to the next point that still has it
+        try:
+            names[previous_name] = store.numbers[store.names.index(previous_name)].item()
+        except ValueError:
+            del names[previous_name]
+            changed = True
+    holder = names.get(navpoint.name)
+    if holder is None or (holder != navpoint.number and find_row(store, holder) > row):
+        names[navpoint.name] = navpoint.number
+        changed = changed or holder is None
+    if changed:
+        airspace.sorted_names = None
+        airspace.name_trie = None
 
 
 def add_navsegment(airspace, navsegment):
+    in_sync = airspace.adjacency_count == len(airspace.navsegments)
     airspace.navsegments.append(navsegment)
+    airspace.version += 1
+    if airspace.segment_grid is not None:
+        segment_grid_insert(airspace.segment_grid, airspace.navpoints.store, airspace.navsegments.store,
+                            len(airspace.navsegments) - 1)
+    airspace.graph = None
+    airspace.heuristic_scale = None
+
+    if in_sync:
+        _add_adjacency(airspace, navsegment.origin_number, navsegment.destination_number, navsegment.distance)
+        airspace.adjacency_count += 1
+
+
+def sync_adjacency(airspace):
+    # Bulk loads fill the segment store without touching the adjacency maps;
+    # this folds in every segment added since the maps were last updated.
+    start = airspace.adjacency_count
+    if start == len(airspace.navsegments):
+        return
+
+    origins, destinations, distances = get_segment_arrays(airspace.navsegments.store)
+    for origin, destination, distance in zip(origins[start:].tolist(), destinations[start:].tolist(),
+                                             distances[start:].tolist()):
+        _add_adjacency(airspace, origin, destination, distance)
+    airspace.adjacency_count = len(airspace.navsegments)
+
+
+def _add_adjacency(airspace, origin, destination, distance):
+    airspace.outgoing.setdefault(origin, {}).setdefault(destination, distance)
+    airspace.incoming.setdefault(destination, {}).setdefault(origin, distance)
+    airspace.undirected.setdefault(origin, {}).setdefault(destination, distance)
+    airspace.undirected.setdefault(destination, {}).setdefault(origin, distance)
+
+
+def clear_airspace(airspace):
+    # Empties the airspace for a loader that fills it in one go: points, segments,
+    # airports, every derived index, the closures and the route cache. version keeps
+    # counting up, so nothing built from the old contents matches the new ones.
+    airspace.navpoints = NavPointMap()
+    airspace.navsegments = NavSegmentList()
+    airspace.navairports = {}
+    airspace.outgoing = {}
+    airspace.incoming = {}
+    airspace.undirected = {}
+    airspace.adjacency_count = 0
+    airspace.names = {}
+    airspace.sorted_names = None
+    airspace.name_trie = None
+    airspace.point_grid = None
+    airspace.segment_grid = None
+    airspace.graph = None
+    airspace.heuristic_scale = None
+    airspace.version += 1
+    airspace.route_cache = None
+    airspace.closed_points = set()
+    airspace.closed_segments = set()
+    airspace.segment_distances = {}
+    airspace.closure_log = []
 
 
 def add_navairport(airspace, navairport):
@@ -29,45 +154,256 @@ def get_navpoint_by_number(airspace, number):
 
 
 def get_navpoint_by_name(airspace, name):
-    for point in airspace.navpoints.values():
-        if point.name == name:
-            return point
-    return None
+    number = airspace.names.get(name)
+    if number is None:
+        return None
+    return airspace.navpoints.get(number)
+
+
+def _sorted_names(airspace):
+    if airspace.sorted_names is None:
+        airspace.sorted_names = sorted((name.upper(), name) for name in airspace.names)
+    return airspace.sorted_names
+
+
+def find_navpoints_by_prefix(airspace, prefix, limit=10):
+    # Case-insensitive; returns up to limit NavPoints in alphabetical order
+    entries = _sorted_names(airspace)
+    key = prefix.upper()
+    matches = []
+
+    i = bisect.bisect_left(entries, (key,))
+    while i < len(entries) and entries[i][0].startswith(key) and len(matches) < limit:
+        matches.append(get_navpoint_by_name(airspace, entries[i][1]))
+        i += 1
+
+    return matches
+
+
+def _name_trie(airspace):
+    if airspace.name_trie is None:
+        trie = {}
+        for upper_name, name in _sorted_names(airspace):
+            node = trie
+            for char in upper_name:
+                node = node.setdefault(char, {})
+            node[None] = name
+        airspace.name_trie = trie
+    return airspace.name_trie
+
+
+def find_navpoints_fuzzy(airspace, name, max_distance=2, limit=10):
+    # Case-insensitive Levenshtein search over the name trie; branches whose
+    # best edit distance already exceeds max_distance are pruned.
+    # Returns (NavPoint, edit distance) pairs, closest first.
+    key = name.upper()
+    matches = []
+    stack = [(_name_trie(airspace), list(range(len(key) + 1)))]
+
+    while stack:
+        node, row = stack.pop()
+        for char, child in node.items():
+            if char is None:
+                if row[-1] <= max_distance:
+                    matches.append((row[-1], child))
+                continue
+
+            next_row = [row[0] + 1]
+            for i in range(1, len(key) + 1):
+                cost = 0 if key[i - 1] == char else 1
+                next_row.append(min(next_row[i - 1] + 1, row[i] + 1, row[i - 1] + cost))
+
+            if min(next_row) <= max_distance:
+                stack.append((child, next_row))
+
+    matches.sort()
+    return [(get_navpoint_by_name(airspace, n), d) for d, n in matches[:limit]]
+
+
+def _point_grid(airspace):
+    if airspace.point_grid is None:
+        airspace.point_grid = build_point_grid(airspace.navpoints.store)
+    return airspace.point_grid
+
+
+def _check_finite(**values):
+    # The grid maps coordinates to cells with math.floor, which fails on NaN and infinity
+    for name, value in values.items():
+        if not math.isfinite(value):
+            raise ValueError(f"{name} must be finite")
+
+
+def find_navpoints_in_bbox(airspace, min_lat, min_lon, max_lat, max_lon):
+    # NavPoints inside the box in load order; min_lon > max_lon crosses the antimeridian.
+    # Raises ValueError for a coordinate that is not finite.
+    _check_finite(min_lat=min_lat, min_lon=min_lon, max_lat=max_lat, max_lon=max_lon)
+    store = airspace.navpoints.store
+    rows = grid_rows_in_bbox(_point_grid(airspace), store, min_lat, min_lon, max_lat, max_lon)
+    return [StoredNavPoint(store, row) for row in np.sort(rows).tolist()]
+
+
+def find_navpoints_within_radius(airspace, latitude, longitude, radius_km):
+    # [(NavPoint, distance in km)] within radius_km of the position, nearest first.
+    # Raises ValueError for a coordinate that is not finite or a radius that is not >= 0.
+    _check_finite(latitude=latitude, longitude=longitude)
+    if not radius_km >= 0:
+        raise ValueError("radius_km must be >= 0")
+    store = airspace.navpoints.store
+    rows = grid_rows_in_bbox(_point_grid(airspace), store,
+                             *cap_bbox(latitude, longitude, radius_km, EARTH_RADIUS_KM))
+    distances = haversine(latitude, longitude, store.latitudes[rows], store.longitudes[rows])
+    order = np.lexsort((rows, distances))
+    order = order[distances[order] <= radius_km]
+    return [(StoredNavPoint(store, row), distance)
+            for row, distance in zip(rows[order].tolist(), distances[order].tolist())]
+
+
+def find_nearest_navpoints(airspace, latitude, longitude, k=1):
+    # [(NavPoint, distance in km)] for the k points closest to the position, nearest
+    # first. Searches a growing circle, so snapping a position to the nearest fix
+    # only looks at the grid cells around it. Raises ValueError for a coordinate that
+    # is not finite.
+    _check_finite(latitude=latitude, longitude=longitude)
+    if k <= 0 or not len(airspace.navpoints):
+        return []
+
+    radius = math.radians(_point_grid(airspace).cell_degrees) * EARTH_RADIUS_KM
+    while True:
+        found = find_navpoints_within_radius(airspace, latitude, longitude, radius)
+        if len(found) >= k or radius >= math.pi * EARTH_RADIUS_KM:
+            return found[:k]
+        radius *= 2
 
 
 def get_navairport_by_name(airspace, name):
     return airspace.navairports.get(name)
 
 
-def load_from_files(airspace, nav_file, seg_file, aer_file):
+def airspace_name_for(nav_file):
+    if nav_file.startswith(("Cat_", "cat_")):
+        return "Catalunya"
+    elif nav_file.startswith(("Esp_", "esp_")):
+        return "España"
+    elif nav_file.startswith(("Eur_", "eur_")):
+        return "Europe"
+    return None
+
+
+def is_nav_header(first_line):
+    try:
+        parts = first_line.split()
+        if len(parts) >= 4:
+            int(parts[0])
+            float(parts[2])
+            float(parts[3])
+            return False
+        return True
+    except (ValueError, IndexError):
+        return True
+
+
+def is_seg_header(first_line):
+    try:
+        parts = first_line.split()
+        if len(parts) >= 3:
+            int(parts[0])
+            int(parts[1])
+            float(parts[2])
+            return False
+        return True
+    except (ValueError, IndexError):
+        return True
+
+
+def is_aer_header(first_line):
+    parts = first_line.split()
+    return len(parts) < 1 or parts[0].startswith('#')
+
+
+def read_airports(lines):
+    # Airports from the lines of an *_aer.txt file (header included), as
+    # (NavAirport, SID names, STAR names). An airport line may list SID/STAR numbers
+    # itself; otherwise it is followed by named departure (XXX.D) and arrival (XXX.A)
+    # points, which resolve_procedures turns into numbers once the points are loaded.
+    lines = iter(lines)
+    first_line = next(lines, "")
+    if not is_aer_header(first_line.strip()):
+        lines = itertools.chain([first_line], lines)
+
+    airports = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        if line.endswith((".D", ".A")) and airports:
+            current_airport, sid_names, star_names = airports[-1]
+            (sid_names if line.endswith(".D") else star_names).append(line)
+            continue
+
+        if line.startswith(("LE", "LF")):
+            parts = line.split()
+            airport_code = parts[0]
+
+            if ',' in line:
+                continue
+            current_airport = NavAirport(airport_code)
+
+            point_numbers = [int(p) for p in parts[1:]]
+            mid_point = len(point_numbers) // 2
+
+            for sid in point_numbers[:mid_point]:
+                add_sid(current_airport, sid)
+
+            for star in point_numbers[mid_point:]:
+                add_star(current_airport, star)
+
+            airports.append((current_airport, [], []))
+    return airports
+
+
+def resolve_procedures(airspace, navairport, sid_names, star_names):
+    for name in sid_names:
+        point = get_navpoint_by_name(airspace, name)
+        if point is not None:
+            add_sid(navairport, point.number)
+
+    for name in star_names:
+        point = get_navpoint_by_name(airspace, name)
+        if point is not None:
+            add_star(navairport, point.number)
+
+
+def load_from_files(airspace, nav_file, seg_file, aer_file, validate=False, progress=None, timings=None):
+    # With a loadProgress.LoadProgress, the bytes read of each file are reported
+    # every PROGRESS_LINES lines, and cancel_load stops the load with LoadCancelled.
+    # With a perfStats.LoadTimings, the seconds spent per file sniffing the header,
+    # parsing (reading included) and constructing the objects are added to it.
+    clock = time.perf_counter
+    if timings is None and perfStats.active_trace is not None:
+        timings = LoadTimings()
+    timed = timings is not None
     try:
-        if nav_file.startswith(("Cat_", "cat_")):
-            airspace.name = "Catalunya"
-        elif nav_file.startswith(("Esp_", "esp_")):
-            airspace.name = "España"
-        elif nav_file.startswith(("Eur_", "eur_")):
-            airspace.name = "Europe"
+        airspace.name = airspace_name_for(nav_file) or airspace.name
 
+        set_stage(progress, "points")
+        start_file(progress, nav_file)
+        file_start = clock()
+        construct = 0.0
         with open(nav_file, 'r') as f:
             first_line = f.readline().strip()
             f.seek(0)
 
-            try:
-                parts = first_line.split()
-                if len(parts) >= 4:
-                    int(parts[0])
-                    float(parts[2])
-                    float(parts[3])
-                    is_header = False
-                else:
-                    is_header = True
-            except (ValueError, IndexError):
-                is_header = True
-
-            if is_header:
+            if is_nav_header(first_line):
                 next(f)
+            sniffed = clock()
+
+            count = 0
+            for count, line in enumerate(f, 1):
+                if count % PROGRESS_LINES == 0:
+                    check_cancelled(progress)
+                    set_file_read(progress, nav_file, f.buffer.tell())
 
-            for line in f:
                 line = line.strip()
                 if not line:
                     continue
@@ -78,28 +414,33 @@ def load_from_files(airspace, nav_file, seg_file, aer_file):
                     name = parts[1]
                     latitude = float(parts[2])
                     longitude = float(parts[3])
+                    if timed:
+                        parsed = clock()
                     add_navpoint(airspace, NavPoint(number, name, latitude, longitude))
-
+                    if timed:
+                        construct += clock() - parsed
+        finish_file(progress, nav_file)
+        if timed:
+            _record_file(timings, "nav", file_start, sniffed, clock(), construct, count)
+
+        set_stage(progress, "segments")
+        start_file(progress, seg_file)
+        file_start = clock()
+        construct = 0.0
         with open(seg_file, 'r') as f:
             first_line = f.readline().strip()
             f.seek(0)
 
-            try:
-                parts = first_line.split()
-                if len(parts) >= 3:
-                    int(parts[0])
-                    int(parts[1])
-                    float(parts[2])
-                    is_header = False
-                else:
-                    is_header = True
-            except (ValueError, IndexError):
-                is_header = True
-
-            if is_header:
+            if is_seg_header(first_line):
                 next(f)
+            sniffed = clock()
+
+            count = 0
+            for count, line in enumerate(f, 1):
+                if count % PROGRESS_LINES == 0:
+                    check_cancelled(progress)
+                    set_file_read(progress, seg_file, f.buffer.tell())
 
-            for line in f:
                 line = line.strip()
                 if not line:
                     continue
@@ -109,59 +450,54 @@ def load_from_files(airspace, nav_file, seg_file, aer_file):
                     origin = int(parts[0])
                     destination = int(parts[1])
                     distance = float(parts[2])
+                    if timed:
+                        parsed = clock()
                     add_navsegment(airspace, NavSegment(origin, destination, distance))
-
+                    if timed:
+                        construct += clock() - parsed
+        finish_file(progress, seg_file)
+        if timed:
+            _record_file(timings, "seg", file_start, sniffed, clock(), construct, count)
+
+        set_stage(progress, "airports")
+        start_file(progress, aer_file)
+        file_start = clock()
         with open(aer_file, 'r') as f:
-            first_line = f.readline().strip()
-            f.seek(0)
-
-            try:
-                parts = first_line.split()
-                if len(parts) < 1 or parts[0].startswith('#'):
-                    is_header = True
-                else:
-                    is_header = False
-            except:
-                is_header = True
-
-            if is_header:
-                next(f)
-            current_airport = None
-            reading_sids = True
-
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-
-                if line.startswith(("LE", "LF")):
-                    parts = line.split()
-                    airport_code = parts[0]
-
-                    if ',' in line:
-                        continue
-                    current_airport = NavAirport(airport_code)
-
-                    point_numbers = [int(p) for p in parts[1:]]
-                    mid_point = len(point_numbers) // 2
-
-                    for sid in point_numbers[:mid_point]:
-                        add_sid(current_airport, sid)
-
-                    for star in point_numbers[mid_point:]:
-                        add_star(current_airport, star)
-
-                    add_navairport(airspace, current_airport)
+            lines = f.readlines()
+        airports = read_airports(lines)
+        parsed = clock()
+        for navairport, sid_names, star_names in airports:
+            resolve_procedures(airspace, navairport, sid_names, star_names)
+            add_navairport(airspace, navairport)
+        finish_file(progress, aer_file)
+        if timed:
+            end = clock()
+            _record_file(timings, "aer", file_start, file_start, end, end - parsed, len(lines))
+        check_cancelled(progress)
+
+        if validate:
+            print_segment_outliers(validate_segment_distances(airspace))
 
         return True
 
+    except LoadCancelled:
+        raise
     except Exception as e:
         print(f"Error loading airspace data: {e}")
         return False
 
 
+def _record_file(timings, kind, start, sniffed, end, construct, lines):
+    add_phase(timings, f"{kind}.sniff", sniffed - start)
+    add_phase(timings, f"{kind}.parse", end - sniffed - construct)
+    add_phase(timings, f"{kind}.construct", construct)
+    timings.lines[kind] = timings.lines.get(kind, 0) + lines
+    trace_event(f"load {kind}", start, end, lines=lines, sniff=sniffed - start, parse=end - sniffed - construct,
+                construct=construct)
+
+
 def calculate_distance(airspace, point1, point2):
-    R = 6371.0
+    R = EARTH_RADIUS_KM
     lat1 = math.radians(point1.latitude)
     lon1 = math.radians(point1.longitude)
     lat2 = math.radians(point2.latitude)
@@ -177,69 +513,364 @@ def calculate_distance(airspace, point1, point2):
 
 
 def find_neighbors(airspace, navpoint_number):
-    neighbors = []
-
-    for segment in airspace.navsegments:
-        if segment.origin_number == navpoint_number:
-            neighbors.append(segment.destination_number)
-        elif segment.destination_number == navpoint_number:
-            neighbors.append(segment.origin_number)
-
-    return neighbors
-
-
-def find_shortest_path(airspace, start_number, end_number):
-    import heapq
-
-    if start_number not in airspace.navpoints or end_number not in airspace.navpoints:
-        return [], 0
-
-    distances = {node: float('infinity') for node in airspace.navpoints}
-    distances[start_number] = 0
+    graph = airspace.graph
+    if graph is not None:
+        index = get_index(graph, navpoint_number)
+        if index is None:
+            return []
+        return [get_number(graph, i) for i, _ in graph_neighbors(graph, index)]
 
-    previous = {node: None for node in airspace.navpoints}
+    sync_adjacency(airspace)
+    return list(airspace.undirected.get(navpoint_number, {}))
 
-    priority_queue = [(0, start_number)]
 
-    while priority_queue:
-        current_distance, current_node = heapq.heappop(priority_queue)
+def find_outgoing(airspace, navpoint_number):
+    # {destination number: distance} for the segments leaving navpoint_number
+    sync_adjacency(airspace)
+    return airspace.outgoing.get(navpoint_number, {})
+
+
+def get_segment_distance(airspace, number1, number2):
+    # Distance of the first segment joining the two points in either direction, or None
+    sync_adjacency(airspace)
+    return airspace.undirected.get(number1, {}).get(number2)
 
-        if current_node == end_number:
-            break
 
-        if current_distance > distances[current_node]:
-            continue
-
-        neighbors = find_neighbors(airspace, current_node)
-
-        for neighbor in neighbors:
-            segment = None
-            for seg in airspace.navsegments:
-                if (seg.origin_number == current_node and seg.destination_number == neighbor) or \
-                        (seg.destination_number == current_node and seg.origin_number == neighbor):
-                    segment = seg
-                    break
+def _segment_grid(airspace):
+    if airspace.segment_grid is None:
+        airspace.segment_grid = build_segment_grid(airspace.navpoints.store, airspace.navsegments.store)
+    return airspace.segment_grid
+
+
+def _segment_views(airspace, rows):
+    store = airspace.navsegments.store
+    return [StoredNavSegment(store, row) for row in rows.tolist()]
+
+
+def find_segments_in_bbox(airspace, min_lat, min_lon, max_lat, max_lon):
+    # NavSegments that cross or touch the box, in load order
+    return _segment_views(airspace, segment_rows_in_bbox(_segment_grid(airspace), airspace.navpoints.store,
+                                                         airspace.navsegments.store,
+                                                         min_lat, min_lon, max_lat, max_lon))
+
+
+def find_segments_in_circle(airspace, latitude, longitude, radius_km):
+    # NavSegments passing within radius_km of the position, in load order
+    return _segment_views(airspace, segment_rows_in_circle(_segment_grid(airspace), airspace.navpoints.store,
+                                                           airspace.navsegments.store,
+                                                           latitude, longitude, radius_km, EARTH_RADIUS_KM))
+
+
+def find_segments_in_polygon(airspace, polygon):
+    # NavSegments that cross or touch the polygon, given as [(latitude, longitude), ...]
+    return _segment_views(airspace, segment_rows_in_polygon(_segment_grid(airspace), airspace.navpoints.store,
+                                                            airspace.navsegments.store, polygon))
+
+
+def segment_great_circle_distances(airspace):
+    # Great-circle length of every segment in one vectorized pass, NaN where an
+    # endpoint is not a known NavPoint. Returns (origins, destinations, distances, geometric).
+    origins, destinations, distances = get_segment_arrays(airspace.navsegments.store)
+    store = airspace.navpoints.store
+    _, latitudes, longitudes = get_coordinate_arrays(store)
+
+    origin_rows = find_rows(store, origins)
+    destination_rows = find_rows(store, destinations)
+    known = (origin_rows >= 0) & (destination_rows >= 0)
+
+    geometric = np.full(len(distances), np.nan)
+    geometric[known] = haversine(latitudes[origin_rows[known]], longitudes[origin_rows[known]],
+                                 latitudes[destination_rows[known]], longitudes[destination_rows[known]])
+    return origins, destinations, distances, geometric
+
+
+def validate_segment_distances(airspace, tolerance=0.05):
+    # Segments whose listed distance differs from the great-circle distance by more
+    # than tolerance (relative), or whose endpoints are missing.
+    # Returns (origin, destination, distance, great-circle distance or None) tuples.
+    origins, destinations, distances, geometric = segment_great_circle_distances(airspace)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error = np.abs(distances - geometric) / geometric
+    bad = np.isnan(geometric) | (error > tolerance) | ((geometric == 0) & (distances != 0))
+
+    return [(o, d, dist, None if math.isnan(g) else g)
+            for o, d, dist, g in zip(origins[bad].tolist(), destinations[bad].tolist(),
+                                     distances[bad].tolist(), geometric[bad].tolist())]
+
+
+def print_segment_outliers(outliers, limit=10):
+    if not outliers:
+        print("All segment distances match the navpoint coordinates.")
+        return
+
+    print(f"{len(outliers)} segment distances do not match the navpoint coordinates:")
+    for origin, destination, distance, geometric in outliers[:limit]:
+        if geometric is None:
+            print(f"  Segment {origin} -> {destination}: endpoint not found")
+        else:
+            print(f"  Segment {origin} -> {destination}: {distance:.2f} km, great-circle {geometric:.2f} km")
+    if len(outliers) > limit:
+        print(f"  ... and {len(outliers) - limit} more")
+
+
+def get_heuristic_scale(airspace):
+    # Largest k <= 1 with k * great-circle distance <= every segment distance, so
+    # the A* lower bound stays admissible even where the data rounds distances down
+    if airspace.heuristic_scale is None:
+        _, _, distances, geometric = segment_great_circle_distances(airspace)
+        positive = geometric > 0
+        scale = 1.0
+        if positive.any():
+            scale = min(scale, float((distances[positive] / geometric[positive]).min()))
+        # Distances set by set_navsegment_distance must not break the bound either
+        for (number1, number2), distance in airspace.segment_distances.items():
+            point1 = airspace.navpoints.get(number1)
+            point2 = airspace.navpoints.get(number2)
+            if point1 is not None and point2 is not None:
+                geometric = calculate_distance(airspace, point1, point2)
+                if geometric > 0:
+                    scale = min(scale, distance / geometric)
+        airspace.heuristic_scale = max(scale, 0.0)
+    return airspace.heuristic_scale
+
+
+def _lower_bound(airspace, to_number):
+    scale = get_heuristic_scale(airspace)
+    coordinates = {}
+
+    def coords(node):
+        if node not in coordinates:
+            point = airspace.navpoints.get(to_number(node))
+            coordinates[node] = None if point is None else \
+                (math.radians(point.latitude), math.radians(point.longitude))
+        return coordinates[node]
+
+    def lower_bound(u, v):
+        a = coords(u)
+        b = coords(v)
+        if a is None or b is None:
+            return 0
+        h = math.sin((b[0] - a[0]) / 2) ** 2 + \
+            math.cos(a[0]) * math.cos(b[0]) * math.sin((b[1] - a[1]) / 2) ** 2
+        return scale * 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+    return lower_bound
+
+
+def search_space(airspace, avoid=None, closures=True):
+    # (neighbors, to_node, to_number) for the current graph backend: CSR indices when
+    # airspace.graph is built, NavPoint numbers over the adjacency maps otherwise.
+    # avoid is an iterable of NavSegments whose connection the searches may not use.
+    # The airspace's closures and distance changes are applied unless closures is False.
+    graph = airspace.graph
+    if graph is not None:
+        neighbors, to_node, to_number = (lambda index: graph_neighbors(graph, index),
+                                         lambda number: get_index(graph, number),
+                                         lambda index: get_number(graph, index))
+    else:
+        sync_adjacency(airspace)
+        adjacency = airspace.undirected
+        neighbors, to_node, to_number = (lambda number: adjacency.get(number, {}).items(),
+                                         lambda number: number,
+                                         lambda number: number)
+
+    if not closures or not has_closures(airspace):
+        if avoid is None:
+            return neighbors, to_node, to_number
+        closures = False
+
+    closed, blocked, weights = closure_nodes(airspace, to_node) if closures else (set(), set(), {})
+    # Searches are undirected, so closing a segment closes both directions between its points
+    for segment in avoid or ():
+        origin = to_node(segment.origin_number)
+        destination = to_node(segment.destination_number)
+        if origin is not None and destination is not None:
+            blocked.add((origin, destination))
+            blocked.add((destination, origin))
+    return open_neighbors(neighbors, closed, blocked, weights), to_node, to_number
+
+
+def has_closures(airspace):
+    return bool(airspace.closed_points or airspace.closed_segments or airspace.segment_distances)
+
+
+def closure_nodes(airspace, to_node):
+    # The airspace's closures in the nodes of a search backend: (closed nodes, blocked
+    # (node, node) pairs in both directions, {(node, node): distance} in both directions)
+    closed = {to_node(number) for number in airspace.closed_points} - {None}
+    blocked = set()
+    for number1, number2 in airspace.closed_segments:
+        node1 = to_node(number1)
+        node2 = to_node(number2)
+        if node1 is not None and node2 is not None:
+            blocked.add((node1, node2))
+            blocked.add((node2, node1))
+    weights = {}
+    for (number1, number2), distance in airspace.segment_distances.items():
+        weights[(to_node(number1), to_node(number2))] = weights[(to_node(number2), to_node(number1))] = distance
+    return closed, blocked, weights
+
+
+def open_neighbors(neighbors, closed, blocked, weights):
+    # neighbors without closed nodes and blocked pairs, with weights replaced where given
+    def neighbors_open(node):
+        if node in closed:
+            return []
+        return [(neighbor, weights.get((node, neighbor), weight)) for neighbor, weight in neighbors(node)
+                if neighbor not in closed and (node, neighbor) not in blocked]
+
+    return neighbors_open
+
+
+def _connection(number1, number2):
+    return (number1, number2) if number1 <= number2 else (number2, number1)
+
+
+def _data_distance(airspace, number1, number2):
+    # Distance the search graph has between the two points, None when no segment joins them
+    neighbors, to_node, to_number = search_space(airspace, closures=False)
+    node = to_node(number1)
+    if node is None:
+        return None
+    target = to_node(number2)
+    for neighbor, weight in neighbors(node):
+        if neighbor == target:
+            return weight
+    return None
 
-            if segment:
-                distance = current_distance + segment.distance
 
-                if distance < distances[neighbor]:
-                    distances[neighbor] = distance
-                    previous[neighbor] = current_node
-                    heapq.heappush(priority_queue, (distance, neighbor))
+def get_search_distance(airspace, number1, number2):
+    # Distance the searches use between two joined points: infinite while the
+    # connection is closed, the set_navsegment_distance value when there is one
+    connection = _connection(number1, number2)
+    if connection in airspace.closed_segments:
+        return math.inf
+    distance = airspace.segment_distances.get(connection)
+    return distance if distance is not None else _data_distance(airspace, number1, number2)
+
+
+def _log_segment_change(airspace, connection, before):
+    after = get_search_distance(airspace, *connection)
+    if after != before:
+        airspace.closure_log.append(("segment", connection, before, after))
+
+
+def close_navsegment(airspace, number1, number2):
+    # Closes the connection between two points in both directions for every search,
+    # without touching the segment data or airspace.version. Cached routes and search
+    # trees are repaired by routeCache.apply_closures. Raises ValueError when no
+    # segment joins the points.
+    if _data_distance(airspace, number1, number2) is None:
+        raise ValueError(f"No segment joins navigation points {number1} and {number2}")
+    connection = _connection(number1, number2)
+    before = get_search_distance(airspace, *connection)
+    airspace.closed_segments.add(connection)
+    _log_segment_change(airspace, connection, before)
+
+
+def reopen_navsegment(airspace, number1, number2):
+    connection = _connection(number1, number2)
+    if connection in airspace.closed_segments:
+        before = get_search_distance(airspace, *connection)
+        airspace.closed_segments.discard(connection)
+        _log_segment_change(airspace, connection, before)
+
+
+def set_navsegment_distance(airspace, number1, number2, distance=None):
+    # Distance the searches use between two joined points from now on, in both
+    # directions; None goes back to the distance in the data
+    if _data_distance(airspace, number1, number2) is None:
+        raise ValueError(f"No segment joins navigation points {number1} and {number2}")
+    if distance is not None and not (math.isfinite(distance) and distance >= 0):
+        raise ValueError(f"Segment distance must be a finite number of km >= 0, not {distance}")
+    connection = _connection(number1, number2)
+    before = get_search_distance(airspace, *connection)
+    if distance is None:
+        airspace.segment_distances.pop(connection, None)
+    else:
+        airspace.segment_distances[connection] = float(distance)
+    airspace.heuristic_scale = None
+    _log_segment_change(airspace, connection, before)
+
+
+def close_navpoint(airspace, number):
+    # No search starts, ends or passes through the point until reopen_navpoint
+    if number not in airspace.navpoints:
+        raise ValueError(f"Navigation point {number} not found")
+    if number not in airspace.closed_points:
+        airspace.closed_points.add(number)
+        airspace.closure_log.append(("point", number, False, True))
+
+
+def reopen_navpoint(airspace, number):
+    if number in airspace.closed_points:
+        airspace.closed_points.discard(number)
+        airspace.closure_log.append(("point", number, True, False))
+
+
+def find_shortest_path(airspace, start_number, end_number, method="dijkstra", stats=None, avoid=None):
+    # method is one of pathSearch.SEARCH_METHODS; all of them return the same path and
+    # cost. Pass a pathSearch.SearchStats to get the nodes settled, heap pushes and
+    # pops, stale entries and edges relaxed, and avoid=[NavSegment, ...] (e.g. from
+    # find_segments_in_polygon) to route around closed segments without rebuilding
+    # the graph. Closed points and segments are never used. While a perfStats trace
+    # is active every query is recorded in it.
+    if start_number not in airspace.navpoints or end_number not in airspace.navpoints:
+        return [], 0
 
-    path = []
-    current_node = end_number
+    if start_number == end_number:
+        return [], 0
 
-    while current_node is not None:
-        path.append(current_node)
-        current_node = previous[current_node]
+    traced = perfStats.active_trace is not None
+    if traced:
+        start = time.perf_counter()
+        stats = stats if stats is not None else SearchStats()
+        before = stats_dict(stats)
+    neighbors, to_node, to_number = search_space(airspace, avoid)
+    path, distance = shortest_path(neighbors, to_node(start_number), to_node(end_number),
+                                   method, _lower_bound(airspace, to_number), stats)
+    if traced:
+        trace_search("find_shortest_path", start, stats, before, origin=start_number, destination=end_number)
+    return [to_number(node) for node in path], distance
+
+
+def shortest_path_tree(airspace, start_number, end_number=None, stats=None):
+    # Dijkstra tree from start_number, grown until end_number is settled (the whole
+    # reachable network when None). route_from_tree resumes it for other targets.
+    tree = multi_source_tree(airspace, [start_number])
+    if end_number is None or end_number in airspace.navpoints:
+        grow_tree(tree, None if end_number is None else tree.to_node(end_number), stats)
+    return tree
+
+
+def multi_source_tree(airspace, start_numbers):
+    # Not yet grown tree whose distances are to the nearest of start_numbers; the
+    # first point of every route_from_tree path says which start it came from
+    neighbors, to_node, to_number = search_space(airspace)
+    sources = [to_node(number) for number in start_numbers if number in airspace.navpoints]
+    return ShortestPathTree(neighbors, sources, to_node, to_number)
+
+
+def route_from_tree(tree, end_number, stats=None):
+    # Same (path, distance) as find_shortest_path from the tree's origin
+    end = tree.to_node(end_number)
+    if end is None or end in tree.sources or not grow_tree(tree, end, stats):
+        return [], 0
 
-    path.reverse()
+    path, distance = tree_path(tree, end)
+    return [tree.to_number(node) for node in path], distance
 
-    if not path or (len(path) == 1 and path[0] == start_number):
-        return [], 0
 
-    total_distance = distances[end_number]
+def single_source_shortest_paths(airspace, start_number, stats=None):
+    # Full Dijkstra tree in one run: ({number: distance}, {number: previous number})
+    # for every point reachable from start_number
+    if start_number not in airspace.navpoints:
+        return {}, {}
 
-    return path, total_distance
+    tree = shortest_path_tree(airspace, start_number, stats=stats)
+    to_number = tree.to_number
+    distances = {to_number(node): tree.distances[node] for node in tree.settled}
+    previous = {to_number(node): None if tree.previous[node] is None else to_number(tree.previous[node])
+                for node in tree.settled}
+    return distances, previous
@@ -0,0 +1,377 @@
+from collections import OrderedDict
+import bisect
+import json
+import math
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from airSpace import AirSpace, add_navairport, get_heuristic_scale, has_closures
+from airGraph import build_graph
+from bulkLoader import add_navpoints_bulk, add_navsegments_bulk
+from geoDistance import EARTH_RADIUS_KM
+from navAirport import NavAirport
+from navPoint import NavPoint, get_coordinate_arrays
+from navSegment import get_segment_arrays
+from pathSearch import shortest_path
+
+TILES_VERSION = 1
+
+# Files of a tile directory, besides manifest.json. Points are stored grouped by tile and
+# by number within a tile, segments grouped by the tile of their origin, so a tile is one
+# contiguous slice of every array: points tile_points[t]:tile_points[t + 1], segments
+# tile_segments[t]:tile_segments[t + 1].
+_POINT_ARRAYS = ("numbers", "latitudes", "longitudes", "name_offsets", "offsets")
+_EDGE_ARRAYS = ("targets", "weights")
+_SEGMENT_ARRAYS = ("origins", "destinations", "distances")
+_TILED_ARRAYS = ("tile_points", "tile_segments", "names") + _POINT_ARRAYS + _EDGE_ARRAYS + _SEGMENT_ARRAYS
+
+
+class Tile:
+    # Copy of one tile's slices; dropping the Tile frees them
+    def __init__(self, key, numbers, names, latitudes, longitudes, offsets, targets, weights,
+                 origins, destinations, distances):
+        self.key = key  # (row, column) of the tile_degrees grid, None for points without coordinates
+        self.numbers = numbers  # Sorted numbers of the points in the tile
+        self.names = names  # One per point, aligned with numbers
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        # Rows of the AirGraph of the whole airspace for these points, with neighbor
+        # numbers instead of indices: neighbors of point i are targets[offsets[i]:offsets[i + 1]]
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        # Segments that start in the tile, in load order, to rebuild regions for the map
+        self.origins = origins
+        self.destinations = destinations
+        self.distances = distances
+
+
+class TiledAirSpace:
+    # An airspace split by save_tiles, opened with open_tiles. The tile arrays are
+    # memory-mapped and only a small index (number -> tile, 12 bytes per point) is
+    # read; a tile is copied out of the files when a lookup, search or region touches
+    # it, and at most max_tiles are kept.
+    def __init__(self, directory, manifest, arrays, numbers, tiles, max_tiles):
+        self.directory = directory
+        self.name = manifest["name"]
+        self.tile_degrees = manifest["tile_degrees"]
+        self.keys = [None if key is None else tuple(key) for key in manifest["tiles"]]  # tile id -> key
+        self.heuristic_scale = manifest["heuristic_scale"]
+        self.navairports = {name: NavAirport(name, sids, stars) for name, sids, stars in manifest["airports"]}
+        self.arrays = arrays  # Memory-mapped _TILED_ARRAYS by name
+        self.numbers = numbers  # Sorted numbers of every point
+        self.tiles = tiles  # Tile id of every point, aligned with numbers
+        self.name_count = manifest["name_count"]
+        self.names = None  # (sorted names, numbers), read on the first lookup by name
+        self.resident = OrderedDict()  # tile id -> Tile, LRU order
+        self.max_tiles = max_tiles
+        self.loads = 0  # Tiles copied from the files
+        self.evictions = 0  # Tiles dropped to stay within max_tiles
+
+
+def tile_key(latitude, longitude, tile_degrees):
+    return math.floor(latitude / tile_degrees), math.floor(longitude / tile_degrees)
+
+
+def _names_blob(names):
+    # ("\n"-joined UTF-8 bytes, offsets): name i is blob[offsets[i]:offsets[i + 1] - 1]
+    encoded = [name.encode("utf-8") + b"\n" for name in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(name) for name in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _decode_names(blob, start, end):
+    return blob[start:end - 1].tobytes().decode("utf-8").split("\n") if end > start else []
+
+
+def save_tiles(airspace, directory, tile_degrees=2.0):
+    # Splits the airspace into tile_degrees x tile_degrees tiles under directory, written
+    # to a scratch directory and renamed into place; that swap is not atomic, and for an
+    # instant directory is missing. Each tile holds its points, their rows of the
+    # search graph and the segments that start in it. Returns the number of tiles.
+    # Closures and distance overrides are not stored, so an airspace with any of them
+    # raises ValueError instead of saving tiles that route differently.
+    if has_closures(airspace):
+        raise ValueError("Reopen closed points and segments and drop distance overrides before saving tiles")
+    graph = airspace.graph if airspace.graph is not None else build_graph(airspace)
+    point_numbers, point_latitudes, point_longitudes = get_coordinate_arrays(airspace.navpoints.store)
+    order = np.argsort(point_numbers, kind="stable")
+    sorted_numbers = point_numbers[order]
+    names = airspace.navpoints.store.names
+
+    # Graph nodes in number order; segment endpoints that are not points get no coordinates
+    n = len(graph.numbers)
+    position = np.searchsorted(sorted_numbers, graph.numbers)
+    known = position < len(sorted_numbers)
+    known[known] = sorted_numbers[position[known]] == graph.numbers[known]
+    rows = np.full(n, -1, dtype=np.int64)
+    rows[known] = order[position[known]]
+    latitudes = np.full(n, np.nan)
+    longitudes = np.full(n, np.nan)
+    latitudes[known] = point_latitudes[rows[known]]
+    longitudes[known] = point_longitudes[rows[known]]
+
+    tile_rows = np.floor(np.where(known, latitudes, 0) / tile_degrees).astype(np.int64)
+    tile_columns = np.floor(np.where(known, longitudes, 0) / tile_degrees).astype(np.int64)
+    keys = sorted({(r, c) for r, c in zip(tile_rows[known].tolist(), tile_columns[known].tolist())})
+    if not known.all():
+        keys.append(None)
+    key_ids = {key: tile_id for tile_id, key in enumerate(keys)}
+    tiles = np.array([key_ids[(r, c) if k else None]
+                      for r, c, k in zip(tile_rows.tolist(), tile_columns.tolist(), known.tolist())],
+                     dtype=np.int32)
+
+    # Points grouped by tile, each tile in number order, with their graph rows
+    by_tile = np.argsort(tiles, kind="stable")
+    tile_points = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tiles, minlength=len(keys)), out=tile_points[1:])
+    starts = graph.offsets[by_tile]
+    counts = graph.offsets[by_tile + 1] - starts
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    edges = np.repeat(starts - offsets[:-1], counts) + np.arange(offsets[-1])
+    names_blob, name_offsets = _names_blob([names[row] if row >= 0 else "" for row in rows[by_tile].tolist()])
+
+    origins, destinations, distances = get_segment_arrays(airspace.navsegments.store)
+    segment_tiles = tiles[np.searchsorted(graph.numbers, origins)]
+    segment_order = np.argsort(segment_tiles, kind="stable")
+    tile_segments = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(segment_tiles, minlength=len(keys)), out=tile_segments[1:])
+
+    by_name = sorted(airspace.names.items())
+    sorted_names_blob, _ = _names_blob([name for name, _ in by_name])
+    arrays = {
+        "tile_points": tile_points, "tile_segments": tile_segments,
+        "numbers": graph.numbers[by_tile], "latitudes": latitudes[by_tile], "longitudes": longitudes[by_tile],
+        "names": names_blob, "name_offsets": name_offsets,
+        "offsets": offsets, "targets": graph.numbers[graph.targets[edges]], "weights": graph.weights[edges],
+        "origins": origins[segment_order], "destinations": destinations[segment_order],
+        "distances": distances[segment_order],
+        "index_numbers": graph.numbers, "index_tiles": tiles,
+        "sorted_names": sorted_names_blob,
+        "name_numbers": np.array([number for _, number in by_name], dtype=np.int64),
+    }
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    scratch = tempfile.mkdtemp(prefix=".tiles-", dir=parent)
+    aside = None
+    try:
+        for field, array in arrays.items():
+            np.save(os.path.join(scratch, f"{field}.npy"), array)
+
+        manifest = {
+            "version": TILES_VERSION,
+            "name": airspace.name,
+            "tile_degrees": tile_degrees,
+            "tiles": keys,
+            "name_count": len(by_name),
+            "airports": [[a.name, a.sids, a.stars] for a in airspace.navairports.values()],
+            "heuristic_scale": get_heuristic_scale(airspace),
+        }
+        with open(os.path.join(scratch, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+
+        # The old copy is moved aside, not deleted, until the new one is in place, and
+        # is moved back if that fails
+        if os.path.isdir(directory):
+            aside = scratch + ".old"
+            os.replace(directory, aside)
+        try:
+            os.replace(scratch, directory)
+        except BaseException:
+            if aside is not None:
+                os.replace(aside, directory)
+                aside = None
+            raise
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    finally:
+        # The replaced copy, or an orphan left by a failed move back
+        if aside is not None:
+            shutil.rmtree(aside, ignore_errors=True)
+    return len(keys)
+
+
+def open_tiles(directory, max_tiles=64):
+    # Raises ValueError for a missing or incompatible tile directory
+    try:
+        with open(os.path.join(directory, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"No usable airspace tiles in {directory}: {e}")
+    if manifest.get("version") != TILES_VERSION:
+        raise ValueError(f"Unsupported airspace tiles version in {directory}")
+
+    # Plain ndarray views of the mappings: slicing an np.memmap is much slower
+    arrays = {field: np.load(os.path.join(directory, f"{field}.npy"), mmap_mode="r").view(np.ndarray)
+              for field in _TILED_ARRAYS}
+    return TiledAirSpace(directory, manifest, arrays, np.load(os.path.join(directory, "index_numbers.npy")),
+                         np.load(os.path.join(directory, "index_tiles.npy")), max_tiles)
+
+
+def get_tile(tiled, tile_id):
+    tile = tiled.resident.get(tile_id)
+    if tile is not None:
+        tiled.resident.move_to_end(tile_id)
+        return tile
+
+    arrays = tiled.arrays
+    first, last = arrays["tile_points"][tile_id:tile_id + 2].tolist()
+    edge_first, edge_last = arrays["offsets"][[first, last]].tolist()
+    segment_first, segment_last = arrays["tile_segments"][tile_id:tile_id + 2].tolist()
+    name_first, name_last = arrays["name_offsets"][[first, last]].tolist()
+    tile = Tile(tiled.keys[tile_id],
+                arrays["numbers"][first:last].copy(),
+                _decode_names(arrays["names"], name_first, name_last),
+                arrays["latitudes"][first:last].copy(),
+                arrays["longitudes"][first:last].copy(),
+                arrays["offsets"][first:last + 1] - edge_first,
+                arrays["targets"][edge_first:edge_last].copy(),
+                arrays["weights"][edge_first:edge_last].copy(),
+                *(arrays[field][segment_first:segment_last].copy() for field in _SEGMENT_ARRAYS))
+    tiled.loads += 1
+    tiled.resident[tile_id] = tile
+    while len(tiled.resident) > tiled.max_tiles:
+        tiled.resident.popitem(last=False)
+        tiled.evictions += 1
+    return tile
+
+
+def _locate(tiled, number):
+    # (Tile, row) of a graph node, None when the number is unknown
+    i = int(np.searchsorted(tiled.numbers, number))
+    if i == len(tiled.numbers) or tiled.numbers[i] != number:
+        return None
+    tile = get_tile(tiled, int(tiled.tiles[i]))
+    return tile, int(np.searchsorted(tile.numbers, number))
+
+
+def get_tiled_navpoint(tiled, number):
+    found = _locate(tiled, number)
+    if found is None:
+        return None
+    tile, row = found
+    if tile.key is None:
+        return None  # Segment endpoint without a point
+    return NavPoint(number, tile.names[row], float(tile.latitudes[row]), float(tile.longitudes[row]))
+
+
+def get_tiled_navpoint_by_name(tiled, name):
+    if tiled.names is None:
+        blob = np.load(os.path.join(tiled.directory, "sorted_names.npy"))
+        tiled.names = (_decode_names(blob, 0, len(blob)) if tiled.name_count else [],
+                       np.load(os.path.join(tiled.directory, "name_numbers.npy")))
+    names, numbers = tiled.names
+    i = bisect.bisect_left(names, name)
+    if i == len(names) or names[i] != name:
+        return None
+    return get_tiled_navpoint(tiled, int(numbers[i]))
+
+
+def tiled_neighbors(tiled, number):
+    # [(neighbor number, distance)] as the search graph of the whole airspace has them
+    found = _locate(tiled, number)
+    if found is None:
+        return []
+    tile, row = found
+    start = tile.offsets[row]
+    end = tile.offsets[row + 1]
+    return list(zip(tile.targets[start:end].tolist(), tile.weights[start:end].tolist()))
+
+
+def _tiled_lower_bound(tiled):
+    coordinates = {}
+
+    def coords(number):
+        if number not in coordinates:
+            point = get_tiled_navpoint(tiled, number)
+            coordinates[number] = None if point is None else \
+                (math.radians(point.latitude), math.radians(point.longitude))
+        return coordinates[number]
+
+    def lower_bound(u, v):
+        a = coords(u)
+        b = coords(v)
+        if a is None or b is None:
+            return 0
+        h = math.sin((b[0] - a[0]) / 2) ** 2 + \
+            math.cos(a[0]) * math.cos(b[0]) * math.sin((b[1] - a[1]) / 2) ** 2
+        return tiled.heuristic_scale * 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+    return lower_bound
+
+
+def find_shortest_path_tiled(tiled, start_number, end_number, method="dijkstra", stats=None):
+    # Same (path, distance) as find_shortest_path on the airspace the tiles were saved
+    # from (save_tiles refuses airspaces with closures, so there are none here). Tiles
+    # are read as the search frontier reaches them, and may be evicted and read again
+    # when the search covers more than max_tiles.
+    if get_tiled_navpoint(tiled, start_number) is None or get_tiled_navpoint(tiled, end_number) is None:
+        return [], 0
+    if start_number == end_number:
+        return [], 0
+    return shortest_path(lambda number: tiled_neighbors(tiled, number), start_number, end_number, method,
+                         _tiled_lower_bound(tiled), stats)
+
+
+def _tile_ids_in_bbox(tiled, min_lat, min_lon, max_lat, max_lon):
+    low = tile_key(min_lat, min_lon, tiled.tile_degrees)
+    high = tile_key(max_lat, max_lon, tiled.tile_degrees)
+    return [tile_id for tile_id, key in enumerate(tiled.keys)
+            if key is not None and low[0] <= key[0] <= high[0] and low[1] <= key[1] <= high[1]]
+
+
+def find_tiled_navpoints_in_bbox(tiled, min_lat, min_lon, max_lat, max_lon):
+    # NavPoints inside the box, reading only the tiles it overlaps
+    found = []
+    for tile_id in _tile_ids_in_bbox(tiled, min_lat, min_lon, max_lat, max_lon):
+        tile = get_tile(tiled, tile_id)
+        inside = np.flatnonzero((tile.latitudes >= min_lat) & (tile.latitudes <= max_lat) &
+                                (tile.longitudes >= min_lon) & (tile.longitudes <= max_lon))
+        found.extend(NavPoint(number, tile.names[row], latitude, longitude)
+                     for row, number, latitude, longitude in zip(inside.tolist(), tile.numbers[inside].tolist(),
+                                                                 tile.latitudes[inside].tolist(),
+                                                                 tile.longitudes[inside].tolist()))
+    return found
+
+
+def region_airspace(tiled, min_lat, min_lon, max_lat, max_lon):
+    # AirSpace with the points of every tile the box overlaps and the segments between
+    # them, e.g. for draw_airspace on a map viewport. Airports are included when
+    # all their SID and STAR points are in the region.
+    tiles = [get_tile(tiled, tile_id) for tile_id in _tile_ids_in_bbox(tiled, min_lat, min_lon, max_lat, max_lon)]
+    airspace = AirSpace(tiled.name)
+    if not tiles:
+        return airspace
+
+    numbers = np.concatenate([tile.numbers for tile in tiles])
+    add_navpoints_bulk(airspace, numbers, [name for tile in tiles for name in tile.names],
+                       np.concatenate([tile.latitudes for tile in tiles]),
+                       np.concatenate([tile.longitudes for tile in tiles]))
+    origins = np.concatenate([tile.origins for tile in tiles])
+    destinations = np.concatenate([tile.destinations for tile in tiles])
+    distances = np.concatenate([tile.distances for tile in tiles])
+    inside = np.isin(destinations, numbers)
+    add_navsegments_bulk(airspace, origins[inside], destinations[inside], distances[inside])
+
+    for navairport in tiled.navairports.values():
+        if all(number in airspace.navpoints for number in navairport.sids + navairport.stars):
+            add_navairport(airspace, NavAirport(navairport.name, list(navairport.sids), list(navairport.stars)))
+    return airspace
+
+
+def tile_stats(tiled):
+    return {
+        "tiles": len(tiled.keys),
+        "resident": len(tiled.resident),
+        "resident_points": sum(len(tile.numbers) for tile in tiled.resident.values()),
+        "points": len(tiled.numbers),
+        "loads": tiled.loads,
+        "evictions": tiled.evictions,
+    }
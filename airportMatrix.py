@@ -0,0 +1,44 @@
+from airSpace import find_shortest_path, multi_source_tree, route_from_tree
+
+
+def best_procedure_route(airspace, origin, destination):
+    # Shortest route from any SID of origin to any STAR of destination, one search
+    # per SID x STAR pair. Kept as the reference airport_route_matrix must match.
+    best = None
+    for sid in origin.sids:
+        for star in destination.stars:
+            path, distance = find_shortest_path(airspace, sid, star)
+            if path and (best is None or distance < best[1]):
+                best = (path, distance)
+    return best
+
+
+def airport_route_matrix(airspace, airport_names=None, stats=None):
+    # {origin: {destination: (path, distance) or None}} with the best SID -> STAR route
+    # for every ordered pair of airports. Each origin is one Dijkstra seeded with all
+    # its SIDs, grown only until the farthest reachable STAR is settled.
+    if airport_names is None:
+        airport_names = list(airspace.navairports)
+    airports = [airspace.navairports[name] for name in airport_names]
+
+    matrix = {}
+    for origin in airports:
+        tree = multi_source_tree(airspace, origin.sids)
+        row = matrix[origin.name] = {}
+        for destination in airports:
+            if destination is origin:
+                continue
+            best = None
+            for star in destination.stars:
+                if star in origin.sids:
+                    # A source of the tree: it only has the empty route there, so the
+                    # routes from the other SIDs are searched one by one
+                    routes = [find_shortest_path(airspace, sid, star, stats=stats) for sid in origin.sids
+                              if sid != star]
+                else:
+                    routes = [route_from_tree(tree, star, stats)]
+                for path, distance in routes:
+                    if path and (best is None or distance < best[1]):
+                        best = (path, distance)
+            row[destination.name] = best
+    return matrix
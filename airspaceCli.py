@@ -0,0 +1,239 @@
+import argparse
+from contextlib import redirect_stdout
+import csv
+import json
+import math
+import sys
+import time
+
+from airSpace import AirSpace, find_nearest_navpoints, find_outgoing, get_navpoint_by_name, get_segment_distance
+from airSnapshot import load_from_files_cached
+from bulkLoader import load_from_files_bulk
+from pathSearch import SearchStats
+from perfStats import profile_to, start_trace, stats_dict, stop_trace, trace_event, write_trace
+from routeCache import RouteCache, find_shortest_path_cached, get_route_cache, route_cache_stats
+
+QUERY_TYPES = ("route", "neighbors", "nearest")
+OUTPUT_FORMATS = ("jsonl", "csv")
+CSV_COLUMNS = ("line", "query", "rank", "number", "name", "distance", "error")
+
+
+class QueryError(Exception):
+    pass
+
+
+def parse_query(text):
+    # "route A B", "neighbors A", "nearest LAT LON [K]" or the same as a JSON object:
+    # {"query": "route", "from": A, "to": B}, {"query": "neighbors", "point": A},
+    # {"query": "nearest", "latitude": LAT, "longitude": LON, "k": K}. Returns a dict.
+    if text.startswith("{"):
+        try:
+            query = json.loads(text)
+        except ValueError as e:
+            raise QueryError(f"Invalid JSON: {e}")
+        if not isinstance(query, dict):
+            raise QueryError("A JSON query must be an object")
+    else:
+        words = text.split()
+        kind, args = words[0].lower(), words[1:]
+        if kind == "route" and len(args) == 2:
+            query = {"query": kind, "from": args[0], "to": args[1]}
+        elif kind == "neighbors" and len(args) == 1:
+            query = {"query": kind, "point": args[0]}
+        elif kind == "nearest" and len(args) in (2, 3):
+            query = {"query": kind, "latitude": args[0], "longitude": args[1], "k": args[2] if len(args) == 3 else 1}
+        else:
+            raise QueryError(f"Cannot parse query '{text}', expected 'route A B', 'neighbors A' or 'nearest LAT LON [K]'")
+
+    if query.get("query") not in QUERY_TYPES:
+        raise QueryError(f"Unknown query type '{query.get('query')}', expected one of {QUERY_TYPES}")
+    return query
+
+
+def resolve_point(airspace, point):
+    # NavPoint by name, or by number when no point has that name
+    navpoint = get_navpoint_by_name(airspace, str(point))
+    if navpoint is None and str(point).isdigit():
+        navpoint = airspace.navpoints.get(int(point))
+    if navpoint is None:
+        raise QueryError(f"Navigation point '{point}' not found")
+    return navpoint
+
+
+def _number(value, name):
+    try:
+        number = float(value)
+    except (TypeError, ValueError, OverflowError):
+        raise QueryError(f"Invalid {name} '{value}'")
+    if not math.isfinite(number):
+        raise QueryError(f"Invalid {name} '{value}', it must be finite")
+    return number
+
+
+def _count(value, name):
+    number = _number(value, name)
+    if number < 0 or not number.is_integer():
+        raise QueryError(f"Invalid {name} '{value}', it must be a whole number >= 0")
+    return int(number)
+
+
+def _point_item(navpoint, distance):
+    return {"number": navpoint.number, "name": navpoint.name, "distance": distance}
+
+
+def answer_query(airspace, query, stats=None):
+    # Result dict for a parsed query; raises QueryError for unknown points or bad arguments.
+    # The search counters of route queries are added to stats (a pathSearch.SearchStats).
+    kind = query["query"]
+    if kind == "route":
+        origin = resolve_point(airspace, query.get("from"))
+        destination = resolve_point(airspace, query.get("to"))
+        path, distance = find_shortest_path_cached(airspace, origin.number, destination.number, stats=stats)
+        if not path:
+            raise QueryError(f"No route from {origin.name} to {destination.name}")
+        # Each point of the route with the distance flown to reach it
+        points = []
+        flown = 0
+        for i, number in enumerate(path):
+            if i:
+                flown += get_segment_distance(airspace, path[i - 1], number)
+            points.append(_point_item(airspace.navpoints[number], flown))
+        return {"query": kind, "from": origin.name, "to": destination.name, "distance": distance, "points": points}
+
+    if kind == "neighbors":
+        navpoint = resolve_point(airspace, query.get("point"))
+        points = [_point_item(airspace.navpoints[number], distance)
+                  for number, distance in find_outgoing(airspace, navpoint.number).items()
+                  if number in airspace.navpoints]
+        points.sort(key=lambda item: item["name"])
+        return {"query": kind, "point": navpoint.name, "points": points}
+
+    latitude = _number(query.get("latitude"), "latitude")
+    longitude = _number(query.get("longitude"), "longitude")
+    k = _count(query.get("k", 1), "k")
+    points = [_point_item(navpoint, distance)
+              for navpoint, distance in find_nearest_navpoints(airspace, latitude, longitude, k)]
+    return {"query": kind, "latitude": latitude, "longitude": longitude, "points": points}
+
+
+def answer_queries(airspace, lines, stats=None):
+    # Yields (line number, result) for every non-empty, non-comment line, one at a
+    # time, so memory stays bounded whatever the length of the input. A failed query,
+    # including a ValueError from the airspace for bad arguments, gives
+    # {"query": ..., "error": message} and does not stop the stream.
+    for line_number, line in enumerate(lines, 1):
+        text = line.strip()
+        if not text or text.startswith("#"):
+            continue
+        query = None
+        try:
+            query = parse_query(text)
+            yield line_number, answer_query(airspace, query, stats)
+        except (QueryError, ValueError) as e:
+            yield line_number, {"query": query["query"] if query else None, "error": str(e)}
+
+
+def write_jsonl(stream, line_number, result):
+    stream.write(json.dumps({"line": line_number, **result}) + "\n")
+
+
+def write_csv(writer, line_number, result):
+    # One row per point of a result; a route's distance column is the distance flown so far
+    if "error" in result:
+        writer.writerow((line_number, result["query"], "", "", "", "", result["error"]))
+        return
+    for rank, item in enumerate(result["points"]):
+        writer.writerow((line_number, result["query"], rank, item["number"], item["name"], item["distance"], ""))
+
+
+def load_airspace(nav_file, seg_file, aer_file, use_cache=True):
+    # Loader messages go to stderr so they never mix with results written to stdout
+    airspace = AirSpace()
+    with redirect_stdout(sys.stderr):
+        if use_cache:
+            loaded = load_from_files_cached(airspace, nav_file, seg_file, aer_file)
+        else:
+            loaded = load_from_files_bulk(airspace, nav_file, seg_file, aer_file)
+    return airspace if loaded else None
+
+
+def run_queries(airspace, lines, stream, output_format="jsonl", stats=None):
+    # Answers lines as they arrive and writes each result immediately.
+    # Returns (queries, errors, seconds).
+    if output_format == "csv":
+        writer = csv.writer(stream)
+        writer.writerow(CSV_COLUMNS)
+        write = lambda line_number, result: write_csv(writer, line_number, result)
+    else:
+        write = lambda line_number, result: write_jsonl(stream, line_number, result)
+
+    queries = errors = 0
+    start = time.perf_counter()
+    for line_number, result in answer_queries(airspace, lines, stats):
+        write(line_number, result)
+        stream.flush()
+        queries += 1
+        errors += "error" in result
+    return queries, errors, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Answer route, neighbor and nearest-fix queries without a display. One query per line: "
+                    "'route A B', 'neighbors A', 'nearest LAT LON [K]' or the same as a JSON object.")
+    parser.add_argument("nav_file")
+    parser.add_argument("seg_file")
+    parser.add_argument("aer_file")
+    parser.add_argument("--queries", default="-", help="file with one query per line (default stdin)")
+    parser.add_argument("--output", default="-", help="result file (default stdout)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl", help="result format (default jsonl)")
+    parser.add_argument("--no-cache", action="store_true", help="parse the files instead of using a snapshot")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the search counters and route cache statistics to stderr at the end")
+    parser.add_argument("--profile", help="write cProfile data of the whole run to this file")
+    parser.add_argument("--trace", help="write the loads and searches as Chrome trace events to this JSON file")
+    parser.add_argument("--max-trees", type=int, default=RouteCache().max_trees,
+                        help="search trees kept for repeated route origins; bounds memory (default %(default)s)")
+    args = parser.parse_args(argv)
+
+    if args.trace:
+        start_trace()
+    try:
+        if args.profile:
+            with profile_to(args.profile):
+                return _run(args)
+        return _run(args)
+    finally:
+        if args.trace:
+            write_trace(stop_trace(), args.trace)
+
+
+def _run(args):
+    start = time.perf_counter()
+    airspace = load_airspace(args.nav_file, args.seg_file, args.aer_file, not args.no_cache)
+    if airspace is None:
+        return 1
+    load_seconds = time.perf_counter() - start
+    trace_event("load_airspace", start, start + load_seconds, points=len(airspace.navpoints), cached=not args.no_cache)
+    get_route_cache(airspace).max_trees = args.max_trees
+
+    stats = SearchStats() if args.stats else None
+    source = sys.stdin if args.queries == "-" else open(args.queries, "r")
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+    try:
+        queries, errors, seconds = run_queries(airspace, source, output, args.format, stats)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+
+    rate = queries / seconds if seconds else 0.0
+    print(f"Loaded {len(airspace.navpoints)} points in {load_seconds:.2f} s; answered {queries} queries "
+          f"({errors} errors) in {seconds:.2f} s, {rate:.0f} queries/s", file=sys.stderr)
+    if stats is not None:
+        print(json.dumps({"search": stats_dict(stats), "route_cache": route_cache_stats(airspace)}), file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,590 @@
+from matplotlib.artist import Artist
+from matplotlib.collections import LineCollection
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.font_manager import FontProperties, findfont, get_font
+from matplotlib.path import Path
+from matplotlib.transforms import IdentityTransform
+import numpy as np
+import time
+
+from airSpace import get_segment_distance
+from airTiles import region_airspace
+from navPoint import get_coordinate_arrays
+from perfStats import trace_event
+from spatialIndex import segment_coordinates
+
+SEGMENT_COLOR = 'cyan'
+POINT_COLOR = 'black'
+HIGHLIGHT_COLOR = 'red'
+PATH_COLOR = '#00CCCC'
+
+LABEL_SPACING = (40, 16)  # Screen cell, in points, that holds at most one label when thinning
+LABEL_ROOM = 30  # Shortest segment, in points, that gets its distance written on it
+ROUTE_OVERLAY_COLOR = 'blue'
+
+# Text caches shared by every LabelCollection, keyed by (character or text, fontsize, dpi)
+_advances = {}  # Advance in pixels
+_glyphs = {}  # LabelCollection.glyph(), for Agg
+_bitmaps = {}  # LabelCollection.bitmap(), for Agg
+
+
+def _segment_columns(airspace):
+    # (origins, destinations, distances, lat1, lon1, lat2, lon2) of the segments whose
+    # two end points are known
+    store = airspace.navsegments.store
+    rows = np.arange(store.count)
+    lat1, lon1, lat2, lon2 = segment_coordinates(airspace.navpoints.store, store, rows)
+    known = ~(np.isnan(lat1) | np.isnan(lat2))
+    return (store.origins[rows][known], store.destinations[rows][known], store.distances[rows][known],
+            lat1[known], lon1[known], lat2[known], lon2[known])
+
+
+class ViewportDetail:
+    # Level of detail of a set of segments for the current view: which ones cross the
+    # viewport and how long they are on screen. Recomputed lazily after the axis limits
+    # or the axes size change, and shared by the segment lines and their labels.
+    def __init__(self, ax, lines, min_pixels=1.5):
+        self.ax = ax
+        self.lines = lines  # (n, 2, 2) array of ((lon1, lat1), (lon2, lat2))
+        self.min_pixels = min_pixels  # Shorter segments are dropped (0 keeps every one)
+        self.key = None
+        self.shown = np.ones(len(lines), dtype=bool)
+        self.pixel_lengths = np.zeros(len(lines))
+        longitudes, latitudes = lines[:, :, 0], lines[:, :, 1]
+        self.box = (longitudes.min(axis=1), longitudes.max(axis=1), latitudes.min(axis=1), latitudes.max(axis=1))
+
+        def forget(_ax):
+            self.key = None
+        ax.callbacks.connect('xlim_changed', forget)
+        ax.callbacks.connect('ylim_changed', forget)
+
+
+def refresh_detail(detail):
+    # Brings shown and pixel_lengths up to date; detail.key identifies the view they match
+    key = (tuple(detail.ax.viewLim.bounds), tuple(detail.ax.bbox.bounds))
+    if key == detail.key:
+        return
+    detail.key = key
+
+    (x0, x1), (y0, y1) = sorted(detail.ax.get_xlim()), sorted(detail.ax.get_ylim())
+    west, east, south, north = detail.box
+    shown = (west <= x1) & (east >= x0) & (south <= y1) & (north >= y0)
+
+    # Pixels per degree on each axis; segments that collapse to a dot at this zoom are
+    # hidden under the point markers anyway
+    x_scale = detail.ax.bbox.width / ((x1 - x0) or 1)
+    y_scale = detail.ax.bbox.height / ((y1 - y0) or 1)
+    delta = detail.lines[:, 1] - detail.lines[:, 0]
+    detail.pixel_lengths = np.hypot(delta[:, 0] * x_scale, delta[:, 1] * y_scale)
+    if detail.min_pixels:
+        shown &= detail.pixel_lengths >= detail.min_pixels
+    detail.shown = shown
+
+
+class SegmentLines(Artist):
+    # The segments ViewportDetail shows, drawn as one compound path: a LineCollection
+    # builds a Path object per segment every time its segments change
+    def __init__(self, detail, color, linewidth=1.0, zorder=1):
+        super().__init__()
+        self.detail = detail
+        self.color = color
+        self.linewidth = linewidth
+        self.path = None
+        self.path_key = None  # detail.key the path was built for
+        self.set_zorder(zorder)
+
+    def draw(self, renderer):
+        if not self.get_visible():
+            return
+        refresh_detail(self.detail)
+        if self.path_key != self.detail.key:
+            self.path_key = self.detail.key
+            lines = self.detail.lines[self.detail.shown]
+            self.path = Path(lines.reshape(-1, 2), np.tile([Path.MOVETO, Path.LINETO], len(lines)))
+        if len(self.path.vertices):
+            gc = renderer.new_gc()
+            gc.set_clip_rectangle(self.axes.bbox)
+            gc.set_foreground(self.color)
+            gc.set_linewidth(self.linewidth)
+            renderer.draw_path(gc, self.path, self.axes.transData)
+            gc.restore()
+        self.stale = False
+
+
+class LabelCollection(Artist):
+    # Many short labels drawn by one artist: positions are transformed in one call,
+    # labels outside the axes are skipped, crowded labels are thinned to one per screen
+    # cell of spacing points (earlier labels win, sort them by importance) and text widths
+    # come from cached per-character advances instead of a full text layout per label.
+    # where, if given, returns at draw time the boolean mask of labels allowed in the view.
+    def __init__(self, x, y, texts, fontsize=6, ha='left', va='bottom', background=False, zorder=2,
+                 spacing=None, where=None):
+        super().__init__()
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.texts = list(texts)
+        self.fontsize = fontsize
+        self.ha = ha
+        self.va = va
+        self.background = background  # White half-transparent box, like Text(bbox=...)
+        self.spacing = spacing  # (width, height) in points, None draws every label
+        self.where = where
+        self.set_zorder(zorder)
+
+    def advance(self, renderer, prop, character):
+        key = (character, self.fontsize, renderer.dpi)
+        advance = _advances.get(key)
+        if advance is None:
+            font = get_font(findfont(prop))
+            font.set_size(self.fontsize, renderer.dpi)
+            advance = _advances[key] = font.load_char(ord(character)).linearHoriAdvance / 65536
+        return advance
+
+    def text_width(self, renderer, prop, text):
+        total = 0.0
+        for character in text:
+            total += self.advance(renderer, prop, character)
+        return total
+
+    def glyph(self, renderer, prop, character):
+        # (alpha bitmap, columns right of the pen, rows below the baseline) of one
+        # character, rasterized once by Agg itself on a scratch canvas
+        key = (character, self.fontsize, renderer.dpi)
+        glyph = _glyphs.get(key)
+        if glyph is None:
+            size = int(np.ceil(4 * renderer.points_to_pixels(self.fontsize)))
+            pen_x, baseline = size // 4, 3 * size // 4
+            scratch = RendererAgg(size, size, renderer.dpi)
+            gc = scratch.new_gc()
+            gc.set_foreground('black')
+            scratch.draw_text(gc, pen_x, baseline, character, prop, 0)
+            alpha = np.asarray(scratch.buffer_rgba())[..., 3]
+            rows, columns = np.nonzero(alpha)
+            if len(rows):
+                glyph = (alpha[rows.min():rows.max() + 1, columns.min():columns.max() + 1].copy(),
+                         columns.min() - pen_x, rows.min() - baseline)
+            else:
+                glyph = (np.zeros((0, 0), dtype=np.uint8), 0, 0)  # Blank, e.g. a space
+            _glyphs[key] = glyph
+        return glyph
+
+    def bitmap(self, renderer, prop, text):
+        # Same as glyph() for a whole label, composed once from its characters
+        key = (text, self.fontsize, renderer.dpi)
+        bitmap = _bitmaps.get(key)
+        if bitmap is None:
+            placed = []
+            pen = 0.0
+            for character in text:
+                image, dx, dy = self.glyph(renderer, prop, character)
+                placed.append((image, round(pen) + dx, dy))
+                pen += self.advance(renderer, prop, character)
+            placed = [item for item in placed if item[0].size]
+            if not placed:
+                bitmap = (np.zeros((0, 0), dtype=np.uint8), 0, 0)
+            else:
+                c0 = min(dx for _, dx, _ in placed)
+                r0 = min(dy for _, _, dy in placed)
+                c1 = max(dx + image.shape[1] for image, dx, _ in placed)
+                r1 = max(dy + image.shape[0] for image, _, dy in placed)
+                composed = np.zeros((r1 - r0, c1 - c0), dtype=np.uint8)
+                for image, dx, dy in placed:
+                    target = composed[dy - r0:dy - r0 + image.shape[0], dx - c0:dx - c0 + image.shape[1]]
+                    np.maximum(target, image, out=target)
+                bitmap = (composed, c0, r0)
+            _bitmaps[key] = bitmap
+        return bitmap
+
+    def draw_layer(self, renderer, prop, visible, left, bottom, right, top, baselines):
+        # Agg only: pastes every label, from a per-label bitmap cache, into one alpha layer
+        # covering the labels inside the axes and draws it as a single image. Drawing
+        # thousands of labels through draw_text lays out and rasterizes each one again on
+        # every redraw.
+        box = self.axes.bbox
+        pad = renderer.points_to_pixels(self.fontsize)  # Room for glyphs past the text box
+        x0 = int(max(box.x0, left.min() - pad))
+        x1 = int(np.ceil(min(box.x1, right.max() + pad)))
+        y0 = int(max(box.y0, bottom.min() - pad))
+        y1 = int(np.ceil(min(box.y1, top.max() + pad)))
+        if x1 <= x0 or y1 <= y0:
+            return
+        canvas_height = renderer.get_canvas_width_height()[1]
+        top = int(canvas_height - y1)
+        layer = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        rows, columns = layer.shape
+        for i, x, y in zip(visible.tolist(), (left - x0).tolist(), (canvas_height - baselines - top).tolist()):
+            image, dx, dy = self.bitmap(renderer, prop, self.texts[i])
+            height, width = image.shape
+            c0, r0 = round(x) + dx, round(y) + dy
+            if c0 >= columns or r0 >= rows or c0 + width <= 0 or r0 + height <= 0:
+                continue
+            target = layer[max(r0, 0):min(r0 + height, rows), max(c0, 0):min(c0 + width, columns)]
+            np.maximum(target, image[max(-r0, 0):max(-r0, 0) + target.shape[0],
+                                     max(-c0, 0):max(-c0, 0) + target.shape[1]], out=target)
+
+        rgba = np.zeros(layer.shape + (4,), dtype=np.uint8)
+        rgba[..., 3] = layer
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(box)
+        renderer.draw_image(gc, x0, y0, rgba[::-1])
+        gc.restore()
+
+    def thin(self, renderer, xy, candidates):
+        # First candidate of every spacing-sized screen cell, cells anchored to the data
+        # origin so labels do not flicker while panning
+        cell = np.array([renderer.points_to_pixels(self.spacing[0]), renderer.points_to_pixels(self.spacing[1])])
+        origin = self.axes.transData.transform((0.0, 0.0))
+        cells = np.floor((xy[candidates] - origin) / cell).astype(np.int64)
+        _, first = np.unique(cells, axis=0, return_index=True)
+        return candidates[np.sort(first)]
+
+    def draw(self, renderer):
+        if not self.get_visible() or not self.texts:
+            return
+
+        axes_box = self.axes.bbox
+        xy = self.axes.transData.transform(np.column_stack((self.x, self.y)))
+        reach = 8 * renderer.points_to_pixels(self.fontsize)  # Labels starting just outside may still show
+        inside = ((xy[:, 0] >= axes_box.x0 - reach) & (xy[:, 0] <= axes_box.x1 + reach) &
+                  (xy[:, 1] >= axes_box.y0 - reach) & (xy[:, 1] <= axes_box.y1 + reach))
+        if self.where is not None:
+            inside &= self.where()
+        visible = np.flatnonzero(inside)
+        if self.spacing is not None and len(visible):
+            visible = self.thin(renderer, xy, visible)
+        if not len(visible):
+            self.stale = False
+            return
+
+        prop = FontProperties(size=self.fontsize)
+        _, height, descent = renderer.get_text_width_height_descent("lp", prop, False)
+        widths = np.array([self.text_width(renderer, prop, self.texts[i]) for i in visible.tolist()])
+        left = xy[visible, 0] - (widths / 2 if self.ha == 'center' else 0)
+        bottom = xy[visible, 1] - (height / 2 if self.va == 'center' else 0)
+
+        renderer.open_group('labels', self.get_gid())
+        if self.background:
+            pad = renderer.points_to_pixels(0.5)  # Text(bbox=dict(pad=0.5)) pads by 0.5 points
+            x0, y0, x1, y1 = left - pad, bottom - pad, left + widths + pad, bottom + height + pad
+            corners = np.stack((np.stack((x0, y0), 1), np.stack((x1, y0), 1), np.stack((x1, y1), 1),
+                                np.stack((x0, y1), 1), np.stack((x0, y0), 1)), axis=1)
+            codes = np.tile([Path.MOVETO, Path.LINETO, Path.LINETO, Path.LINETO, Path.CLOSEPOLY], len(visible))
+            gc = renderer.new_gc()
+            gc.set_clip_rectangle(axes_box)
+            gc.set_foreground('black')
+            gc.set_alpha(0.5)
+            gc.set_linewidth(1.0)
+            renderer.draw_path(gc, Path(corners.reshape(-1, 2), codes), IdentityTransform(), (1.0, 1.0, 1.0, 0.5))
+            gc.restore()
+
+        baselines = bottom + descent
+        if isinstance(renderer, RendererAgg):
+            self.draw_layer(renderer, prop, visible, left, bottom, left + widths, bottom + height, baselines)
+        else:
+            gc = renderer.new_gc()
+            gc.set_clip_rectangle(axes_box)
+            gc.set_foreground('black')
+            if renderer.flipy():
+                baselines = renderer.get_canvas_width_height()[1] - baselines
+            for i, x, y in zip(visible.tolist(), left.tolist(), baselines.tolist()):
+                renderer.draw_text(gc, x, y, self.texts[i], prop, 0)
+            gc.restore()
+        renderer.close_group('labels')
+        self.stale = False
+
+
+def _draw_segment_labels(ax, lat1, lon1, lat2, lon2, distances, detail=None):
+    # With a ViewportDetail, a distance is only written on segments shown and long
+    # enough on screen to hold it
+    where = spacing = None
+    if detail is not None:
+        room = LABEL_ROOM * ax.figure.dpi / 72
+
+        def where():
+            refresh_detail(detail)
+            return detail.shown & (detail.pixel_lengths >= room)
+        spacing = LABEL_SPACING
+    ax.add_artist(LabelCollection((lon1 + lon2) / 2, (lat1 + lat2) / 2,
+                                  [f"{distance:.1f}" for distance in distances.tolist()],
+                                  ha='center', va='center', background=True, zorder=2,
+                                  spacing=spacing, where=where))
+
+
+def _draw_point_labels(ax, names, latitudes, longitudes, important=None, level_of_detail=True):
+    # important points (highlight, neighbors, route) are labelled before the rest when thinning
+    order = np.arange(len(names))
+    if important is not None:
+        order = np.concatenate((np.flatnonzero(important), np.flatnonzero(~important)))
+    ax.add_artist(LabelCollection(longitudes[order] + 0.01, latitudes[order] + 0.01,
+                                  [names[i] for i in order.tolist()], zorder=6,
+                                  spacing=LABEL_SPACING if level_of_detail else None))
+
+
+def draw_airspace(ax, airspace, highlight=None, neighbors=None, route=None, level_of_detail=True):
+    # Draws the full map, the neighbors of highlight (neighbors as [(NavPoint, distance)])
+    # or route (list of NavPoints) with one collection per style and one LabelCollection
+    # per kind of label, instead of one artist per segment, point or label.
+    # With level_of_detail every redraw (pan, zoom, resize) only draws the segments and
+    # labels inside the view, drops segments shorter than a couple of pixels and thins
+    # crowded labels; without it everything is drawn as in the original map.
+    numbers, latitudes, longitudes = get_coordinate_arrays(airspace.navpoints.store)
+    names = airspace.navpoints.store.names
+
+    margin = 0.1
+    ax.set_xlim(longitudes.min() - margin, longitudes.max() + margin)
+    ax.set_ylim(latitudes.min() - margin, latitudes.max() + margin)
+    ax.set_autoscale_on(False)
+    ax.set_clip_on(True)
+
+    origins, destinations, distances, lat1, lon1, lat2, lon2 = _segment_columns(airspace)
+    is_neighbor_view = bool(highlight and neighbors)
+
+    if is_neighbor_view:
+        neighbor_numbers = {navpoint.number for navpoint, _ in neighbors}
+        center = highlight.number
+        shown = np.array([(o == center and d in neighbor_numbers) or (d == center and o in neighbor_numbers)
+                          for o, d in zip(origins.tolist(), destinations.tolist())], dtype=bool)
+    elif route:
+        # Every segment joining consecutive route points, drawn in route order
+        steps = {}
+        for i in range(len(route) - 1):
+            steps.setdefault((route[i].number, route[i + 1].number), True)
+            steps.setdefault((route[i + 1].number, route[i].number), False)
+        forward = [steps.get(pair) for pair in zip(origins.tolist(), destinations.tolist())]
+        shown = np.array([step is not None for step in forward], dtype=bool)
+    else:
+        shown = np.ones(len(origins), dtype=bool)
+
+    detail = None
+    if route and not is_neighbor_view:
+        for i in np.flatnonzero(shown).tolist():
+            start, end = ((lon1[i], lat1[i]), (lon2[i], lat2[i])) if forward[i] else \
+                ((lon2[i], lat2[i]), (lon1[i], lat1[i]))
+            ax.annotate("", xy=end, xytext=start,
+                        arrowprops=dict(arrowstyle='->', color=PATH_COLOR, lw=1.5, shrinkA=0, shrinkB=0,
+                                        clip_on=True),
+                        clip_on=True)
+    elif shown.any():
+        lines = np.stack((np.stack((lon1[shown], lat1[shown]), axis=1),
+                          np.stack((lon2[shown], lat2[shown]), axis=1)), axis=1)
+        if level_of_detail:
+            detail = ViewportDetail(ax, lines)
+            ax.add_artist(SegmentLines(detail, SEGMENT_COLOR))
+        else:
+            ax.add_collection(LineCollection(lines, colors=SEGMENT_COLOR, linewidths=1.0, clip_on=True),
+                              autolim=False)
+    _draw_segment_labels(ax, lat1[shown], lon1[shown], lat2[shown], lon2[shown], distances[shown], detail)
+
+    # One scatter per point class, drawn in the same stacking order as before
+    important = None
+    if route:
+        on_route = np.isin(numbers, [navpoint.number for navpoint in route])
+        classes = [(~on_route, POINT_COLOR, 4, 0.5, 10), (on_route, PATH_COLOR, 10, 1.0, 20)]
+        important = on_route
+    elif is_neighbor_view:
+        is_center = numbers == highlight.number
+        is_neighbor = np.isin(numbers, list(neighbor_numbers)) & ~is_center
+        classes = [(~(is_center | is_neighbor), 'gray', 5, 1.0, 10),
+                   (is_neighbor, HIGHLIGHT_COLOR, 20, 1.0, 10),
+                   (is_center, HIGHLIGHT_COLOR, 30, 1.0, 10)]
+        important = is_center | is_neighbor
+    else:
+        classes = [(np.ones(len(numbers), dtype=bool), POINT_COLOR, 5, 1.0, 10)]
+
+    for mask, color, size, alpha, zorder in classes:
+        if mask.any():
+            ax.scatter(longitudes[mask], latitudes[mask], color=color, s=size, alpha=alpha, zorder=zorder,
+                       clip_on=True)
+    _draw_point_labels(ax, names, latitudes, longitudes, important, level_of_detail)
+
+    if not is_neighbor_view and not route:
+        ax.grid(True, linestyle=':', alpha=0.7, color='red')
+
+    for spine in ax.spines.values():
+        spine.set_visible(True)
+        spine.set_edgecolor('black')
+        spine.set_linewidth(0.5)
+
+    _set_title(ax, airspace, highlight, neighbors, route)
+
+
+def _set_title(ax, airspace, highlight=None, neighbors=None, route=None):
+    if route and not (highlight and neighbors):
+        total_cost = 0
+        for previous, point in zip(route, route[1:]):
+            total_cost += (get_segment_distance(airspace, previous.number, point.number) or 0)
+        ax.set_title(f"Gráfico con camino. Coste = {total_cost:.8f}", pad=20, y=1.02)
+    elif highlight and neighbors:
+        ax.set_title(f"Grafico con los vecinos del nodo {highlight.name}", fontsize=14, pad=20, y=1.02)
+    else:
+        ax.set_title("Gráfico con nodos y segmentos", fontsize=14, pad=20, y=1.02)
+
+
+class MapView:
+    # A full map drawn once on a canvas plus a swappable overlay (neighbors or route).
+    # The rendered base is kept as a bitmap, so showing another overlay only restores
+    # it and draws the few overlay artists on top (blitting).
+    def __init__(self, ax, canvas, airspace):
+        self.ax = ax
+        self.canvas = canvas
+        self.airspace = airspace
+        self.version = airspace.version  # Base map is stale once the airspace changes
+        self.background = None  # canvas.copy_from_bbox of the figure without the overlay
+        self.background_size = None  # Canvas size in pixels when background was captured
+        self.overlay = []  # Animated artists of the current overlay
+        self.stats = RenderStats()
+
+
+class RenderStats:
+    # Seconds spent by a MapView; full draws triggered by the toolbar are not included
+    def __init__(self):
+        self.base_seconds = 0.0  # Building the artists and the first full draw
+        self.overlays = 0  # show_overlay calls
+        self.full_draws = 0  # show_overlay calls that had no usable background to blit onto
+        self.overlay_seconds = 0.0  # Total of the show_overlay calls
+        self.last_overlay_seconds = 0.0
+
+
+def open_map_view(ax, canvas, airspace):
+    # Draws the base map on ax and keeps its background up to date: every full redraw
+    # (zoom, pan, resize) re-captures it and puts the overlay back on top
+    start = time.perf_counter()
+    draw_airspace(ax, airspace)
+    ax.title.set_animated(True)  # The title changes with the overlay
+    view = MapView(ax, canvas, airspace)
+
+    def capture(_event):
+        view.background = canvas.copy_from_bbox(canvas.figure.bbox)
+        view.background_size = canvas.get_width_height(physical=True)
+        _draw_overlay(view)
+    canvas.mpl_connect('draw_event', capture)
+    canvas.draw()
+    end = time.perf_counter()
+    view.stats.base_seconds = end - start
+    trace_event("open_map_view", start, end, points=len(airspace.navpoints))
+    return view
+
+
+def _draw_overlay(view):
+    for artist in [view.ax.title] + view.overlay:
+        view.ax.draw_artist(artist)
+
+
+def show_overlay(view, highlight=None, neighbors=None, route=None):
+    # Replaces the overlay with the neighbors of highlight or a route (the same
+    # arguments as draw_airspace); with none of them only the base map is shown
+    started = time.perf_counter()
+    ax = view.ax
+    for artist in view.overlay:
+        artist.remove()
+    view.overlay = []
+
+    segments = []  # (start NavPoint, end NavPoint, distance)
+    points = []  # (NavPoints, color, size)
+    if highlight and neighbors:
+        for navpoint, distance in neighbors:
+            segments.append((highlight, navpoint, distance))
+        points = [([navpoint for navpoint, _ in neighbors], HIGHLIGHT_COLOR, 20), ([highlight], HIGHLIGHT_COLOR, 30)]
+    elif route:
+        for previous, point in zip(route, route[1:]):
+            segments.append((previous, point, get_segment_distance(view.airspace, previous.number, point.number)))
+        points = [(route, ROUTE_OVERLAY_COLOR, 15)]
+
+    overlay = view.overlay
+    if highlight and neighbors:
+        lines = [((start.longitude, start.latitude), (end.longitude, end.latitude)) for start, end, _ in segments]
+        overlay.append(ax.add_collection(LineCollection(lines, colors=HIGHLIGHT_COLOR, linewidths=2.0, zorder=3),
+                                         autolim=False))
+    else:
+        for start, end, _ in segments:
+            overlay.append(ax.annotate("", xy=(end.longitude, end.latitude), xytext=(start.longitude, start.latitude),
+                                       arrowprops=dict(arrowstyle='->', color=ROUTE_OVERLAY_COLOR, lw=2.0, shrinkA=0,
+                                                       shrinkB=0, clip_on=True),
+                                       clip_on=True, zorder=3))
+    known = [(start, end, distance) for start, end, distance in segments if distance is not None]
+    if known:
+        overlay.append(ax.add_artist(LabelCollection(
+            [(start.longitude + end.longitude) / 2 for start, end, _ in known],
+            [(start.latitude + end.latitude) / 2 for start, end, _ in known],
+            [f"{distance:.1f}" for _, _, distance in known],
+            ha='center', va='center', background=True, zorder=4)))
+    for navpoints, color, size in points:
+        overlay.append(ax.scatter([navpoint.longitude for navpoint in navpoints],
+                                  [navpoint.latitude for navpoint in navpoints],
+                                  color=color, s=size, zorder=20, clip_on=True))
+    labelled = [navpoint for navpoints, _, _ in points for navpoint in navpoints]
+    if labelled:
+        overlay.append(ax.add_artist(LabelCollection([navpoint.longitude + 0.01 for navpoint in labelled],
+                                                     [navpoint.latitude + 0.01 for navpoint in labelled],
+                                                     [navpoint.name for navpoint in labelled], zorder=21)))
+    for artist in overlay:
+        artist.set_animated(True)
+    _set_title(ax, view.airspace, highlight, neighbors, route)
+
+    # A savefig at another dpi also fires draw_event and leaves a background of the wrong size
+    if view.background is None or view.background_size != view.canvas.get_width_height(physical=True):
+        view.canvas.draw()
+        view.stats.full_draws += 1
+    else:
+        view.canvas.restore_region(view.background)
+        _draw_overlay(view)
+        view.canvas.blit(view.canvas.figure.bbox)
+
+    finished = time.perf_counter()
+    stats = view.stats
+    stats.overlays += 1
+    stats.overlay_seconds += finished - started
+    stats.last_overlay_seconds = finished - started
+    trace_event("show_overlay", started, finished, artists=len(view.overlay))
+
+
+class TiledMapView:
+    # Map of a TiledAirSpace: only the tiles around the view are read and drawn, and
+    # they are read again once a pan or zoom takes the view out of the drawn region
+    def __init__(self, ax, canvas, tiled):
+        self.ax = ax
+        self.canvas = canvas
+        self.tiled = tiled
+        self.region = None  # (min_lat, min_lon, max_lat, max_lon) drawn
+        self.airspace = None  # region_airspace of region
+        self.refreshes = 0
+
+
+def refresh_tiled_map(view):
+    # Redraws the region around the current view when the view is not inside the
+    # drawn one: the view plus half of it on every side. Returns whether it redrew.
+    (x0, x1), (y0, y1) = sorted(view.ax.get_xlim()), sorted(view.ax.get_ylim())
+    if view.region is not None:
+        min_lat, min_lon, max_lat, max_lon = view.region
+        if min_lat <= y0 and y1 <= max_lat and min_lon <= x0 and x1 <= max_lon:
+            return False
+
+    start = time.perf_counter()
+    width = x1 - x0
+    height = y1 - y0
+    view.region = (y0 - height / 2, x0 - width / 2, y1 + height / 2, x1 + width / 2)
+    view.airspace = region_airspace(view.tiled, *view.region)
+    ax = view.ax
+    ax.clear()
+    if view.airspace.navpoints:
+        draw_airspace(ax, view.airspace)
+    else:
+        _set_title(ax, view.airspace)
+    ax.set_xlim(x0, x1)
+    ax.set_ylim(y0, y1)
+    ax.set_autoscale_on(False)
+    view.refreshes += 1
+    view.canvas.draw_idle()
+    trace_event("refresh_tiled_map", start, time.perf_counter(), points=len(view.airspace.navpoints))
+    return True
+
+
+def open_tiled_map_view(ax, canvas, tiled, min_lat, min_lon, max_lat, max_lon):
+    # Shows the box of a TiledAirSpace; the drawn region follows the toolbar's pan
+    # and zoom, which end with the mouse button release
+    ax.set_xlim(min_lon, max_lon)
+    ax.set_ylim(min_lat, max_lat)
+    view = TiledMapView(ax, canvas, tiled)
+    refresh_tiled_map(view)
+    canvas.mpl_connect('button_release_event', lambda _event: refresh_tiled_map(view))
+    return view
@@ -0,0 +1,186 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+
+import numpy as np
+
+from airSpace import add_navairport, airspace_name_for, clear_airspace
+from bulkLoader import add_navpoints_bulk, add_navsegments_bulk, read_aer_airports, read_nav_columns, \
+    read_seg_columns
+from geoDistance import haversine
+from navAirport import NavAirport, add_sid, add_star
+from navPoint import NavPoint, get_coordinate_arrays
+from navSegment import get_segment_arrays
+
+
+class MergeReport:
+    # What merge_airspaces and merge_files kept and dropped. Sources are numbered in
+    # the order given; on a clash the earliest source wins.
+    def __init__(self, sources):
+        self.sources = sources  # Name of every source airspace
+        self.points = 0  # Points in the merged airspace
+        self.segments = 0  # Segments in the merged airspace
+        self.duplicate_points = 0  # Repeated points dropped that matched the kept one
+        self.duplicate_segments = 0  # Repeated (origin, destination) segments dropped with the same distance
+        # (number, kept source, dropped source, kept NavPoint, dropped NavPoint, km apart)
+        # for repeated points with another name or more than tolerance_km apart
+        self.point_conflicts = []
+        # (origin, destination, kept source, dropped source, kept distance, dropped distance)
+        # for repeated segments whose distances differ by more than tolerance_km
+        self.segment_conflicts = []
+        self.merged_airports = []  # Airports in several sources with different SIDs or STARs, now their union
+
+
+def _file_source_name(nav_file):
+    name = os.path.basename(nav_file)
+    return airspace_name_for(name) or name.rsplit("_nav", 1)[0]
+
+
+def _first_rows(order, first):
+    # For rows grouped by key (order, first = start of each group): the first row of
+    # the group of every sorted position
+    return order[first][np.cumsum(first) - 1]
+
+
+def _airspace_columns(airspace):
+    numbers, latitudes, longitudes = get_coordinate_arrays(airspace.navpoints.store)
+    return (numbers, airspace.navpoints.store.names[:len(numbers)], latitudes, longitudes,
+            *get_segment_arrays(airspace.navsegments.store), list(airspace.navairports.values()))
+
+
+def _read_columns(nav_file, seg_file, aer_file):
+    numbers, names, latitudes, longitudes = read_nav_columns(nav_file)
+    origins, destinations, distances = read_seg_columns(seg_file)
+
+    # SIDs and STARs are resolved by name within their own files, first point with a name wins
+    by_name = dict(zip(reversed(names), reversed(numbers.tolist())))
+    airports = []
+    for navairport, sid_names, star_names in read_aer_airports(aer_file):
+        for name in sid_names:
+            if name in by_name:
+                add_sid(navairport, by_name[name])
+        for name in star_names:
+            if name in by_name:
+                add_star(navairport, by_name[name])
+        airports.append(navairport)
+    return numbers, names, latitudes, longitudes, origins, destinations, distances, airports
+
+
+def _merge_columns(airspace, sources, report, tolerance_km):
+    airspace.name = airspace.name or " + ".join(report.sources)
+    counts = [len(source[0]) for source in sources]
+    point_sources = np.repeat(np.arange(len(sources)), counts)
+    numbers = np.concatenate([source[0] for source in sources]).astype(np.int64)
+    names = [name for source in sources for name in source[1]]
+    latitudes = np.concatenate([source[2] for source in sources]).astype(np.float64)
+    longitudes = np.concatenate([source[3] for source in sources]).astype(np.float64)
+
+    # Points: one stable sort by number puts every repeat right after the row it repeats
+    order = np.argsort(numbers, kind="stable")
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = numbers[order[1:]] != numbers[order[:-1]]
+    kept = _first_rows(order, first)[~first]
+    dropped = order[~first]
+    apart = haversine(latitudes[kept], longitudes[kept], latitudes[dropped], longitudes[dropped])
+    for k, d, km in zip(kept.tolist(), dropped.tolist(), apart.tolist()):
+        if names[k] != names[d] or km > tolerance_km:
+            report.point_conflicts.append((int(numbers[k]), int(point_sources[k]), int(point_sources[d]),
+                                           NavPoint(int(numbers[k]), names[k], float(latitudes[k]), float(longitudes[k])),
+                                           NavPoint(int(numbers[d]), names[d], float(latitudes[d]), float(longitudes[d])),
+                                           km))
+    report.duplicate_points = len(dropped) - len(report.point_conflicts)
+    rows = np.sort(order[first])
+    add_navpoints_bulk(airspace, numbers[rows], [names[row] for row in rows.tolist()], latitudes[rows],
+                       longitudes[rows])
+
+    # Segments: the same with (origin, destination) as the key
+    segment_sources = np.repeat(np.arange(len(sources)), [len(source[4]) for source in sources])
+    origins = np.concatenate([source[4] for source in sources]).astype(np.int64)
+    destinations = np.concatenate([source[5] for source in sources]).astype(np.int64)
+    distances = np.concatenate([source[6] for source in sources]).astype(np.float64)
+    order = np.lexsort((destinations, origins))
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (origins[order[1:]] != origins[order[:-1]]) | (destinations[order[1:]] != destinations[order[:-1]])
+    kept = _first_rows(order, first)[~first]
+    dropped = order[~first]
+    clash = np.abs(distances[kept] - distances[dropped]) > tolerance_km
+    report.segment_conflicts = list(zip(origins[dropped[clash]].tolist(), destinations[dropped[clash]].tolist(),
+                                        segment_sources[kept[clash]].tolist(), segment_sources[dropped[clash]].tolist(),
+                                        distances[kept[clash]].tolist(), distances[dropped[clash]].tolist()))
+    report.duplicate_segments = len(dropped) - len(report.segment_conflicts)
+    rows = np.sort(order[first])
+    add_navsegments_bulk(airspace, origins[rows], destinations[rows], distances[rows])
+
+    # Airports: the union of the procedures of every source that lists the airport
+    for source in sources:
+        for navairport in source[7]:
+            merged = airspace.navairports.get(navairport.name)
+            if merged is None:
+                add_navairport(airspace, NavAirport(navairport.name, list(navairport.sids), list(navairport.stars)))
+                continue
+            if merged.sids == navairport.sids and merged.stars == navairport.stars:
+                continue
+            for number in navairport.sids:
+                add_sid(merged, number)
+            for number in navairport.stars:
+                add_star(merged, number)
+            if navairport.name not in report.merged_airports:
+                report.merged_airports.append(navairport.name)
+
+    report.points = len(airspace.navpoints)
+    report.segments = len(airspace.navsegments)
+    return report
+
+
+def merge_airspaces(airspace, sources, tolerance_km=0.01):
+    # Fills airspace with the union of the source airspaces, built in one pass over
+    # their columns instead of point by point. Points are deduplicated by number and
+    # segments by (origin, destination); the earliest source wins, and a point or
+    # segment whose coordinates or distance disagree by more than tolerance_km is
+    # reported as a conflict. Whatever airspace already holds is merged first; its
+    # closures, distance overrides and cached routes are dropped. Returns a MergeReport.
+    sources = list(sources)
+    if len(airspace.navpoints) or len(airspace.navsegments) or airspace.navairports:
+        sources.insert(0, airspace)
+    columns = [_airspace_columns(source) for source in sources]
+    report = MergeReport([source.name or f"airspace {i + 1}" for i, source in enumerate(sources)])
+    clear_airspace(airspace)
+    return _merge_columns(airspace, columns, report, tolerance_km)
+
+
+def merge_files(airspace, file_triples, tolerance_km=0.01):
+    # merge_airspaces for (nav_file, seg_file, aer_file) triples, read concurrently
+    # and merged straight from their columns. Returns the MergeReport, or None when a
+    # file cannot be read; airspace is left untouched in that case. file_triples may
+    # be any iterable, e.g. a generator.
+    file_triples = list(file_triples)
+    try:
+        with ThreadPoolExecutor(max_workers=len(file_triples) or 1) as executor:
+            columns = list(executor.map(lambda files: _read_columns(*files), file_triples))
+    except Exception as e:
+        print(f"Error loading airspace data: {e}")
+        return None
+
+    report = MergeReport([_file_source_name(files[0]) for files in file_triples])
+    if len(airspace.navpoints) or len(airspace.navsegments) or airspace.navairports:
+        columns.insert(0, _airspace_columns(airspace))
+        report.sources.insert(0, airspace.name or "airspace")
+    clear_airspace(airspace)
+    return _merge_columns(airspace, columns, report, tolerance_km)
+
+
+def print_merge_report(report, limit=10):
+    print(f"Merged {', '.join(report.sources)}: {report.points} points, {report.segments} segments "
+          f"({report.duplicate_points} repeated points and {report.duplicate_segments} repeated segments dropped)")
+    for number, kept_source, source, kept, dropped, km in report.point_conflicts[:limit]:
+        print(f"  Point {number}: {kept.name} ({kept.latitude}, {kept.longitude}) from "
+              f"{report.sources[kept_source]} kept, {dropped.name} ({dropped.latitude}, {dropped.longitude}) "
+              f"from {report.sources[source]} is {km:.3f} km away")
+    if len(report.point_conflicts) > limit:
+        print(f"  ... and {len(report.point_conflicts) - limit} more point conflicts")
+    for origin, destination, kept_source, source, kept, dropped in report.segment_conflicts[:limit]:
+        print(f"  Segment {origin} -> {destination}: {kept:.2f} km from {report.sources[kept_source]} kept, "
+              f"{dropped:.2f} km from {report.sources[source]}")
+    if len(report.segment_conflicts) > limit:
+        print(f"  ... and {len(report.segment_conflicts) - limit} more segment conflicts")
+    if report.merged_airports:
+        print(f"  SIDs and STARs combined for {', '.join(report.merged_airports)}")
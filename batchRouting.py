@@ -0,0 +1,137 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import os
+
+import numpy as np
+
+from airSpace import closure_nodes, get_navpoint_by_name, has_closures, open_neighbors
+from airGraph import AirGraph, build_graph, get_index, graph_neighbors
+from pathSearch import ShortestPathTree, grow_tree, tree_path
+
+_GRAPH_ARRAYS = ("numbers", "offsets", "targets", "weights")
+
+_worker_graph = None  # AirGraph over the shared blocks, one per worker process
+_worker_blocks = []  # Keeps the worker's SharedMemory handles open
+_worker_closures = None  # closure_nodes of the airspace in graph indices, None when there are none
+
+
+class SharedGraph:
+    # AirGraph arrays copied once into shared memory; workers map them read-only
+    def __init__(self, graph):
+        self.blocks = []
+        self.layout = []  # (field, block name, dtype, shape) sent to the workers
+        try:
+            for field in _GRAPH_ARRAYS:
+                array = getattr(graph, field)
+                block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                self.blocks.append(block)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                self.layout.append((field, block.name, array.dtype.str, array.shape))
+        except BaseException:
+            close_shared_graph(self)
+            raise
+
+
+def close_shared_graph(shared):
+    for block in shared.blocks:
+        block.close()
+        block.unlink()
+    shared.blocks = []
+
+
+def _attach(layout, closures=None):
+    global _worker_graph, _worker_closures
+    _worker_closures = closures
+    arrays = {}
+    for field, name, dtype, shape in layout:
+        block = shared_memory.SharedMemory(name=name)
+        _worker_blocks.append(block)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[field] = array
+    _worker_graph = AirGraph(*(arrays[field] for field in _GRAPH_ARRAYS))
+
+
+def route_chunk(graph, pairs, closures=None):
+    # (path numbers, distance) for every (origin index, destination index) pair, with
+    # one resumable tree per origin so repeated origins share their search. closures
+    # is closure_nodes in graph indices.
+    neighbors = lambda index: graph_neighbors(graph, index)
+    if closures is not None:
+        neighbors = open_neighbors(neighbors, *closures)
+    trees = {}
+    results = []
+    for origin, destination in pairs:
+        if origin < 0 or destination < 0 or origin == destination:
+            results.append(([], 0))
+            continue
+        tree = trees.get(origin)
+        if tree is None:
+            tree = trees[origin] = ShortestPathTree(neighbors, [origin])
+        grow_tree(tree, destination)
+        path, distance = tree_path(tree, destination)
+        results.append((graph.numbers[path].tolist(), distance))
+    return results
+
+
+def _route_chunk_worker(pairs):
+    return route_chunk(_worker_graph, pairs, _worker_closures)
+
+
+def _resolve(airspace, graph, point):
+    # NavPoint number or name -> graph index, -1 when unknown
+    if isinstance(point, str):
+        navpoint = get_navpoint_by_name(airspace, point)
+        if navpoint is None:
+            return -1
+        point = navpoint.number
+    if point not in airspace.navpoints:
+        return -1
+    index = get_index(graph, point)
+    return -1 if index is None else index
+
+
+def _chunks(airspace, graph, pairs, chunk_size):
+    chunk = []
+    for origin, destination in pairs:
+        chunk.append((_resolve(airspace, graph, origin), _resolve(airspace, graph, destination)))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def route_batch(airspace, pairs, workers=None, chunk_size=256):
+    # Yields find_shortest_path's (path, distance) for every (origin, destination) pair,
+    # in input order. Points are NavPoint numbers or names; unknown ones give ([], 0).
+    # The CSR graph is shared with a process pool through shared memory, so only the
+    # pairs and the results are pickled. pairs is consumed lazily. Closed points and
+    # segments and distance overrides apply as in find_shortest_path.
+    graph = airspace.graph if airspace.graph is not None else build_graph(airspace)
+    closures = None
+    if has_closures(airspace):
+        closures = closure_nodes(airspace, lambda number: get_index(graph, number))
+    chunks = _chunks(airspace, graph, pairs, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for chunk in chunks:
+            yield from route_chunk(graph, chunk, closures)
+        return
+
+    shared = SharedGraph(graph)
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach,
+                                 initargs=(shared.layout, closures)) as executor:
+            # Keep a few chunks per worker in flight and hand results back in order
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_route_chunk_worker, chunk))
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    finally:
+        close_shared_graph(shared)
@@ -0,0 +1,491 @@
+import argparse
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+from airSpace import AirSpace, add_navsegment, find_outgoing, find_shortest_path, get_navpoint_by_name, \
+    load_from_files
+from airGraph import build_graph, build_graph_from_arrays, graph_nbytes
+from airspaceMap import draw_airspace, open_map_view, open_tiled_map_view, refresh_tiled_map, show_overlay
+from airportMatrix import airport_route_matrix, best_procedure_route
+from airSnapshot import load_from_files_cached
+from airTiles import find_shortest_path_tiled, open_tiles, save_tiles, tile_stats
+from batchRouting import route_batch
+from contractionHierarchy import build_hierarchy, hierarchy_nbytes, hierarchy_path, load_hierarchy, save_hierarchy
+from geoDistance import haversine
+from bulkLoader import add_navpoints_bulk, add_navsegments_bulk, load_from_files_bulk
+from navPoint import NavPoint, NavPointMap, get_coordinate_arrays
+from navSegment import NavSegment
+from pathSearch import SEARCH_METHODS, SearchStats
+
+
+class DictNavPoint:
+    """NavPoint as it was before the columnar store: a plain object with a __dict__."""
+
+    def __init__(self, number, name, latitude, longitude):
+        self.number = number
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+def synthetic_segments(n_segments, n_points=None, seed=0):
+    """Random segment arrays with Spain-like degree (about 3 segments per point)."""
+    rng = np.random.default_rng(seed)
+    if n_points is None:
+        n_points = max(2, n_segments // 3)
+    origins = rng.integers(0, n_points, n_segments)
+    destinations = (origins + rng.integers(1, n_points, n_segments)) % n_points
+    distances = rng.uniform(5.0, 150.0, n_segments)
+    return np.arange(n_points), origins, destinations, distances
+
+
+def synthetic_airway_arrays(n_points=20_000, seed=0):
+    """Points and segments of a jittered lattice covering Europe: (numbers, latitudes,
+    longitudes, origins, destinations, distances), segments as point indices. Three
+    quarters of the east and north lattice links are kept, which gives Spain's degree
+    of about 3 segments per point, with distances 0-10% above the great circle."""
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n_points)))
+    rows, columns = np.divmod(np.arange(side * side), side)
+    latitudes = 35.0 + 35.0 * (rows + rng.uniform(-0.3, 0.3, side * side)) / side
+    longitudes = -10.0 + 40.0 * (columns + rng.uniform(-0.3, 0.3, side * side)) / side
+    numbers = np.arange(side * side, dtype=np.int64)
+
+    east = numbers[columns < side - 1]
+    north = numbers[rows < side - 1]
+    origins = np.concatenate((east, north))
+    destinations = np.concatenate((east + 1, north + side))
+    kept = rng.random(len(origins)) < 0.75
+    origins = origins[kept]
+    destinations = destinations[kept]
+    distances = haversine(latitudes[origins], longitudes[origins], latitudes[destinations],
+                          longitudes[destinations]) * rng.uniform(1.0, 1.1, len(origins))
+    return numbers, latitudes, longitudes, origins, destinations, distances
+
+
+def synthetic_airway_airspace(n_points=20_000, seed=0):
+    """AirSpace over synthetic_airway_arrays, with points named P0, P1, ..."""
+    numbers, latitudes, longitudes, origins, destinations, distances = synthetic_airway_arrays(n_points, seed)
+    airspace = AirSpace()
+    add_navpoints_bulk(airspace, numbers, [f"P{i}" for i in range(len(numbers))], latitudes, longitudes)
+    add_navsegments_bulk(airspace, origins, destinations, distances)
+    return airspace
+
+
+def measure(build):
+    """Return (result, bytes still allocated by build, seconds)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def graph_memory_spain(directory="."):
+    airspace = AirSpace()
+    load_from_files(airspace, os.path.join(directory, "Spain_nav.txt"),
+                    os.path.join(directory, "Spain_seg.txt"),
+                    os.path.join(directory, "Spain_aer.txt"))
+    segments = [(s.origin_number, s.destination_number, s.distance) for s in airspace.navsegments]
+
+    def object_model():
+        objects = AirSpace()
+        for origin, destination, distance in segments:
+            add_navsegment(objects, NavSegment(origin, destination, distance))
+        return objects
+
+    _, object_bytes, object_seconds = measure(object_model)
+    graph, _, graph_seconds = measure(lambda: build_graph(airspace))
+    return "Spain_seg.txt", len(segments), object_bytes, object_seconds, graph_nbytes(graph), graph_seconds
+
+
+def graph_memory_synthetic(n_segments=1_000_000):
+    points, origins, destinations, distances = synthetic_segments(n_segments)
+    segments = list(zip(origins.tolist(), destinations.tolist(), distances.tolist()))
+
+    def object_model():
+        objects = AirSpace()
+        for origin, destination, distance in segments:
+            add_navsegment(objects, NavSegment(origin, destination, distance))
+        return objects
+
+    _, object_bytes, object_seconds = measure(object_model)
+    graph, _, graph_seconds = measure(
+        lambda: build_graph_from_arrays(points, origins, destinations, distances))
+    return f"synthetic {n_segments}", n_segments, object_bytes, object_seconds, graph_nbytes(graph), graph_seconds
+
+
+def point_memory(n_points=100_000, seed=0):
+    """Bytes per point for a dict of DictNavPoint vs NavPointMap, parsing the same lines."""
+    rng = np.random.default_rng(seed)
+    lines = [f"{1000 + 7 * i} P{i:06d} {lat} {lon}"
+             for i, (lat, lon) in enumerate(zip(rng.uniform(36, 44, n_points).tolist(),
+                                                rng.uniform(-9, 4, n_points).tolist()))]
+
+    def build(container, point_class):
+        points = container()
+        for line in lines:
+            parts = line.split()
+            points[int(parts[0])] = point_class(int(parts[0]), parts[1], float(parts[2]), float(parts[3]))
+        return points
+
+    _, dict_bytes, _ = measure(lambda: build(dict, DictNavPoint))
+    _, store_bytes, _ = measure(lambda: build(NavPointMap, NavPoint))
+    return n_points, dict_bytes / n_points, store_bytes / n_points
+
+
+def search_methods_spain(directory="."):
+    """Settled nodes and time per search method, BCN.D to every other airport arrival point."""
+    airspace = AirSpace()
+    load_from_files(airspace, os.path.join(directory, "Spain_nav.txt"),
+                    os.path.join(directory, "Spain_seg.txt"),
+                    os.path.join(directory, "Spain_aer.txt"))
+    origin = get_navpoint_by_name(airspace, "BCN.D").number
+    targets = [p.number for p in airspace.navpoints.values() if p.name.endswith(".A") and p.name != "BCN.A"]
+
+    rows = []
+    for method in SEARCH_METHODS:
+        settled = 0
+        start = time.perf_counter()
+        for target in targets:
+            stats = SearchStats()
+            find_shortest_path(airspace, origin, target, method, stats)
+            settled += stats.settled
+        rows.append((method, len(targets), settled, time.perf_counter() - start))
+    return rows
+
+
+def airport_matrix_spain(directory="."):
+    """Best SID -> STAR route for every airport pair: one search per pair vs airport_route_matrix."""
+    airspace = AirSpace()
+    load_from_files(airspace, os.path.join(directory, "Spain_nav.txt"),
+                    os.path.join(directory, "Spain_seg.txt"),
+                    os.path.join(directory, "Spain_aer.txt"))
+    airports = list(airspace.navairports.values())
+    pairs = [(o, d) for o in airports for d in airports if o is not d]
+
+    start = time.perf_counter()
+    for origin, destination in pairs:
+        best_procedure_route(airspace, origin, destination)
+    pairwise_seconds = time.perf_counter() - start
+    pairwise_searches = sum(len(o.sids) * len(d.stars) for o, d in pairs)
+
+    start = time.perf_counter()
+    airport_route_matrix(airspace)
+    matrix_seconds = time.perf_counter() - start
+    return len(pairs), pairwise_searches, pairwise_seconds, len(airports), matrix_seconds
+
+
+def batch_routing_spain(worker_counts, n_pairs=5000, seed=0, directory="."):
+    """Random Spain origin/destination pairs per second through route_batch for each worker count."""
+    airspace = AirSpace()
+    load_from_files_bulk(airspace, os.path.join(directory, "Spain_nav.txt"),
+                         os.path.join(directory, "Spain_seg.txt"),
+                         os.path.join(directory, "Spain_aer.txt"))
+    numbers = get_coordinate_arrays(airspace.navpoints.store)[0]
+    rng = np.random.default_rng(seed)
+    pairs = rng.choice(numbers, size=(n_pairs, 2)).tolist()
+
+    rows = []
+    for workers in worker_counts:
+        start = time.perf_counter()
+        for _ in route_batch(airspace, pairs, workers=workers):
+            pass
+        rows.append((workers, n_pairs / (time.perf_counter() - start)))
+    return rows
+
+
+def contraction_hierarchy(airspace, name, n_queries=200, seed=0):
+    """Preprocessing time, array memory and mean query latency of the contraction hierarchy vs Dijkstra."""
+    if airspace.graph is None:
+        build_graph(airspace)
+    start = time.perf_counter()
+    hierarchy = build_hierarchy(airspace)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hierarchy.npz")
+        save_hierarchy(hierarchy, path)
+        start = time.perf_counter()
+        hierarchy = load_hierarchy(airspace, path)
+        load_seconds = time.perf_counter() - start
+
+    numbers = get_coordinate_arrays(airspace.navpoints.store)[0]
+    pairs = np.random.default_rng(seed).choice(numbers, size=(n_queries, 2)).tolist()
+
+    start = time.perf_counter()
+    for origin, destination in pairs:
+        find_shortest_path(airspace, origin, destination)
+    dijkstra_ms = 1000 * (time.perf_counter() - start) / n_queries
+
+    start = time.perf_counter()
+    for origin, destination in pairs:
+        hierarchy_path(airspace, hierarchy, origin, destination)
+    hierarchy_ms = 1000 * (time.perf_counter() - start) / n_queries
+
+    return (name, len(numbers), len(hierarchy.targets), build_seconds, hierarchy_nbytes(hierarchy), load_seconds,
+            dijkstra_ms, hierarchy_ms)
+
+
+def render_times_spain(directory="."):
+    """Seconds to build and rasterize (Agg, 1500x1200) the full, neighbor and route map views."""
+    airspace = AirSpace()
+    load_from_files_bulk(airspace, os.path.join(directory, "Spain_nav.txt"),
+                         os.path.join(directory, "Spain_seg.txt"),
+                         os.path.join(directory, "Spain_aer.txt"))
+    center = get_navpoint_by_name(airspace, "GODOX")
+    neighbors = [(airspace.navpoints[number], distance)
+                 for number, distance in find_outgoing(airspace, center.number).items()]
+    path, _ = find_shortest_path(airspace, get_navpoint_by_name(airspace, "BCN.D").number,
+                                 get_navpoint_by_name(airspace, "MAD.A").number)
+    route = [airspace.navpoints[number] for number in path]
+
+    rows = []
+    for view, arguments in (("full", ()), ("neighbors", (center, neighbors)), ("route", (None, None, route))):
+        def render():
+            fig = Figure(figsize=(15, 12), dpi=100)
+            draw_airspace(fig.add_subplot(111), airspace, *arguments)
+            FigureCanvasAgg(fig).draw()
+        rows.append((view, best_time(render)))
+    return rows
+
+
+def overlay_times_spain(directory="."):
+    """Seconds to show a neighbor or route result on Spain (Agg, 1500x1200): full
+    draw_airspace render vs show_overlay on a MapView whose base map is already drawn."""
+    airspace = AirSpace()
+    load_from_files_bulk(airspace, os.path.join(directory, "Spain_nav.txt"),
+                         os.path.join(directory, "Spain_seg.txt"),
+                         os.path.join(directory, "Spain_aer.txt"))
+    center = get_navpoint_by_name(airspace, "GODOX")
+    neighbors = [(airspace.navpoints[number], distance)
+                 for number, distance in find_outgoing(airspace, center.number).items()]
+    path, _ = find_shortest_path(airspace, get_navpoint_by_name(airspace, "BCN.D").number,
+                                 get_navpoint_by_name(airspace, "MAD.A").number)
+    route = [airspace.navpoints[number] for number in path]
+
+    fig = Figure(figsize=(15, 12), dpi=100)
+    view = open_map_view(fig.add_subplot(111), FigureCanvasAgg(fig), airspace)
+    rows = []
+    for name, arguments in (("neighbors", (center, neighbors)), ("route", (None, None, route))):
+        def render():
+            full = Figure(figsize=(15, 12), dpi=100)
+            draw_airspace(full.add_subplot(111), airspace, *arguments)
+            FigureCanvasAgg(full).draw()
+        rows.append((name, best_time(render), best_time(lambda: show_overlay(view, *arguments))))
+    return rows
+
+
+def map_redraw_times(n_points=10_000):
+    """Seconds per Agg redraw (1500x1200) of the full map of a synthetic airspace after
+    zooming to a fraction of its width, as NavigationToolbar2Tk triggers them."""
+    airspace = synthetic_airway_airspace(n_points)
+    fig = Figure(figsize=(15, 12), dpi=100)
+    ax = fig.add_subplot(111)
+    canvas = FigureCanvasAgg(fig)
+    start = time.perf_counter()
+    draw_airspace(ax, airspace)
+    canvas.draw()
+    rows = [("first draw", time.perf_counter() - start)]
+
+    (x0, x1), (y0, y1) = ax.get_xlim(), ax.get_ylim()
+    for fraction in (1, 0.5, 0.2, 0.05):
+        def redraw():
+            center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+            ax.set_xlim(center_x - (x1 - x0) * fraction / 2, center_x + (x1 - x0) * fraction / 2)
+            ax.set_ylim(center_y - (y1 - y0) * fraction / 2, center_y + (y1 - y0) * fraction / 2)
+            canvas.draw()
+        rows.append((f"zoom {fraction:g}", best_time(redraw)))
+    return rows
+
+
+def tiled_times(n_points=100_000, max_tiles=64, n_queries=50, seed=0):
+    """Mean route time in memory vs from tiles with max_tiles resident, the points kept
+    resident after the routes, and the seconds to draw the whole airspace vs to open a
+    2x2 degree map of the tiles and, on average, to pan it by half a view (Agg, 1500x1200)."""
+    airspace = synthetic_airway_airspace(n_points, seed)
+    build_graph(airspace)
+    numbers = get_coordinate_arrays(airspace.navpoints.store)[0]
+    pairs = np.random.default_rng(seed).choice(numbers, size=(n_queries, 2)).tolist()
+
+    with tempfile.TemporaryDirectory() as directory:
+        save_tiles(airspace, os.path.join(directory, "tiles"))
+        tiled = open_tiles(os.path.join(directory, "tiles"), max_tiles=max_tiles)
+
+        start = time.perf_counter()
+        for origin, destination in pairs:
+            find_shortest_path(airspace, origin, destination)
+        full_ms = 1000 * (time.perf_counter() - start) / n_queries
+
+        start = time.perf_counter()
+        for origin, destination in pairs:
+            find_shortest_path_tiled(tiled, origin, destination)
+        tiled_ms = 1000 * (time.perf_counter() - start) / n_queries
+        resident_points = tile_stats(tiled)["resident_points"]
+
+        fig = Figure(figsize=(15, 12), dpi=100)
+        ax = fig.add_subplot(111)
+        canvas = FigureCanvasAgg(fig)
+        start = time.perf_counter()
+        draw_airspace(ax, airspace)
+        canvas.draw()
+        full_map_seconds = time.perf_counter() - start
+
+        fig.clear()
+        ax = fig.add_subplot(111)
+        start = time.perf_counter()
+        view = open_tiled_map_view(ax, canvas, tiled, 50.0, 10.0, 52.0, 12.0)
+        canvas.draw()
+        open_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for step in range(1, 9):
+            ax.set_xlim(10.0 + step, 12.0 + step)
+            refresh_tiled_map(view)
+            canvas.draw()
+        pan_seconds = (time.perf_counter() - start) / 8
+
+    return len(numbers), full_ms, tiled_ms, resident_points, full_map_seconds, open_seconds, pan_seconds
+
+
+def write_scaled_dataset(prefix, factor, directory, source="."):
+    """Write factor shifted copies of prefix_nav/seg/aer.txt as one dataset; returns the three paths."""
+    with open(os.path.join(source, f"{prefix}_nav.txt")) as f:
+        nav_rows = [line.split() for line in f if line.strip()]
+    with open(os.path.join(source, f"{prefix}_seg.txt")) as f:
+        seg_rows = [line.split() for line in f if line.strip()]
+    offset = 10 ** len(str(max(int(row[0]) for row in nav_rows)))
+
+    paths = [os.path.join(directory, f"{prefix}x{factor}_{kind}.txt") for kind in ("nav", "seg", "aer")]
+    with open(paths[0], "w") as f:
+        for copy in range(factor):
+            for number, name, latitude, longitude in nav_rows:
+                f.write(f"{int(number) + copy * offset} {name}{copy or ''} "
+                        f"{float(latitude) + 0.01 * copy:.10f} {float(longitude) + 0.01 * copy:.10f}\n")
+    with open(paths[1], "w") as f:
+        for copy in range(factor):
+            for origin, destination, distance in seg_rows:
+                f.write(f"{int(origin) + copy * offset} {int(destination) + copy * offset} {distance}\n")
+    shutil.copyfile(os.path.join(source, f"{prefix}_aer.txt"), paths[2])
+    return paths
+
+
+def best_time(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def load_times(directory="."):
+    """Best-of-3 seconds for load_from_files, load_from_files_bulk and a warm snapshot (Cat, Spain, 10x Spain)."""
+    rows = []
+    with tempfile.TemporaryDirectory() as scratch:
+        datasets = [("Cat", [os.path.join(directory, f"Cat_{k}.txt") for k in ("nav", "seg", "aer")]),
+                    ("Spain", [os.path.join(directory, f"Spain_{k}.txt") for k in ("nav", "seg", "aer")]),
+                    ("Spain x10", write_scaled_dataset("Spain", 10, scratch, directory))]
+        for name, paths in datasets:
+            airspace = AirSpace()
+            load_from_files(airspace, *paths)
+            seconds = best_time(lambda: load_from_files(AirSpace(), *paths))
+            bulk_seconds = best_time(lambda: load_from_files_bulk(AirSpace(), *paths))
+            cache = os.path.join(scratch, f"cache-{len(rows)}")
+            load_from_files_cached(AirSpace(), *paths, cache_directory=cache)
+            snapshot_seconds = best_time(lambda: load_from_files_cached(AirSpace(), *paths, cache_directory=cache))
+            rows.append((name, len(airspace.navpoints), len(airspace.navsegments), seconds, bulk_seconds,
+                         snapshot_seconds))
+    return rows
+
+
+def print_graph_memory(rows):
+    print(f"{'dataset':<20}{'segments':>10}{'objects MB':>12}{'CSR MB':>10}{'ratio':>8}"
+          f"{'objects s':>11}{'CSR s':>8}")
+    for name, n, object_bytes, object_seconds, graph_bytes, graph_seconds in rows:
+        print(f"{name:<20}{n:>10}{object_bytes / 1e6:>12.2f}{graph_bytes / 1e6:>10.2f}"
+              f"{object_bytes / graph_bytes:>8.1f}{object_seconds:>11.2f}{graph_seconds:>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Airspace performance benchmarks")
+    parser.add_argument("--segments", type=int, default=1_000_000,
+                        help="size of the synthetic graph (default 1000000)")
+    parser.add_argument("--ch-points", type=int, default=20_000,
+                        help="points in the synthetic Europe graph for the contraction hierarchy (default 20000)")
+    parser.add_argument("--map-points", type=int, default=10_000,
+                        help="points in the synthetic airspace for the map redraw timings (default 10000)")
+    parser.add_argument("--tile-points", type=int, default=100_000,
+                        help="points in the synthetic airspace for the tiled store timings (default 100000)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4],
+                        help="process counts for the batch routing benchmark (default 1 2 4)")
+    args = parser.parse_args()
+
+    print("Graph memory: NavSegment objects + adjacency dicts vs CSR arrays")
+    print_graph_memory([graph_memory_spain(), graph_memory_synthetic(args.segments)])
+
+    print("\nSearch methods on Spain, BCN.D -> every *.A airport point")
+    print(f"{'method':<22}{'queries':>8}{'settled':>10}{'seconds':>10}")
+    for method, queries, settled, seconds in search_methods_spain():
+        print(f"{method:<22}{queries:>8}{settled:>10}{seconds:>10.3f}")
+
+    pairs, pairwise_searches, pairwise_seconds, matrix_searches, matrix_seconds = airport_matrix_spain()
+    print(f"\nAirport SID -> STAR matrix on Spain ({pairs} pairs): {pairwise_searches} searches "
+          f"{pairwise_seconds:.3f} s, airport_route_matrix {matrix_searches} searches {matrix_seconds:.3f} s")
+
+    spain = AirSpace()
+    load_from_files_bulk(spain, "Spain_nav.txt", "Spain_seg.txt", "Spain_aer.txt")
+    print("\nContraction hierarchy: preprocessing, memory and mean query time vs Dijkstra")
+    print(f"{'graph':<18}{'points':>8}{'edges':>8}{'build s':>9}{'MB':>7}{'load s':>8}"
+          f"{'dijkstra ms':>13}{'ch ms':>8}")
+    for name, points, edges, build_seconds, nbytes, load_seconds, dijkstra_ms, hierarchy_ms in (
+            contraction_hierarchy(spain, "Spain"),
+            contraction_hierarchy(synthetic_airway_airspace(args.ch_points), f"synthetic {args.ch_points}")):
+        print(f"{name:<18}{points:>8}{edges:>8}{build_seconds:>9.2f}{nbytes / 1e6:>7.2f}"
+              f"{load_seconds:>8.3f}{dijkstra_ms:>13.2f}{hierarchy_ms:>8.2f}")
+
+    print("\nBatch routing on Spain, random pairs (route_batch)")
+    print(f"{'workers':<10}{'pairs/s':>10}")
+    for workers, rate in batch_routing_spain(args.workers):
+        print(f"{workers:<10}{rate:>10.0f}")
+
+    print("\nMap rendering on Spain (draw_airspace + Agg, best of 3)")
+    for view, seconds in render_times_spain():
+        print(f"{view:<10}{seconds:>8.2f} s")
+
+    print("\nShowing a result on Spain: full render vs overlay on the open map (best of 3)")
+    print(f"{'view':<10}{'render s':>10}{'overlay s':>11}")
+    for view, render_seconds, overlay_seconds in overlay_times_spain():
+        print(f"{view:<10}{render_seconds:>10.3f}{overlay_seconds:>11.3f}")
+
+    print(f"\nMap redraws on a synthetic {args.map_points}-point airspace (level of detail, best of 3)")
+    for view, seconds in map_redraw_times(args.map_points):
+        print(f"{view:<12}{seconds:>8.2f} s")
+
+    points, full_ms, tiled_ms, resident_points, full_map_seconds, open_seconds, pan_seconds = \
+        tiled_times(args.tile_points)
+    print(f"\nTiled airspace ({points} points, 2 degree tiles, 64 resident): route {full_ms:.1f} ms in memory, "
+          f"{tiled_ms:.1f} ms from tiles with {resident_points} points resident; map of everything "
+          f"{full_map_seconds:.2f} s, tiled map {open_seconds:.2f} s to open and {pan_seconds:.2f} s per pan")
+
+    print("\nLoading: load_from_files vs load_from_files_bulk vs snapshot (best of 3)")
+    print(f"{'dataset':<12}{'points':>8}{'segments':>10}{'per line s':>12}{'bulk s':>9}{'snapshot s':>12}")
+    for name, points, segments, seconds, bulk_seconds, snapshot_seconds in load_times():
+        print(f"{name:<12}{points:>8}{segments:>10}{seconds:>12.4f}{bulk_seconds:>9.4f}{snapshot_seconds:>12.4f}")
+
+    n, dict_per_point, store_per_point = point_memory()
+    print(f"\nPoint memory ({n} points): dict of objects {dict_per_point:.0f} B/point, "
+          f"NavPointMap {store_per_point:.0f} B/point ({dict_per_point / store_per_point:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
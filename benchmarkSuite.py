@@ -0,0 +1,233 @@
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+
+from airSpace import AirSpace, find_neighbors, find_shortest_path, get_navpoint_by_name, load_from_files
+from airspaceMap import draw_airspace
+from benchmark import best_time, synthetic_airway_arrays
+from geoDistance import haversine
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def _code(index, length):
+    """index written in base 26 with length letters: 0 -> AAAAA."""
+    letters = []
+    for _ in range(length):
+        index, digit = divmod(index, 26)
+        letters.append(LETTERS[digit])
+    return "".join(reversed(letters))
+
+
+def write_synthetic_dataset(directory, n_points, prefix=None, seed=0):
+    """Write prefix_nav/seg/aer.txt in the format of Spain_*.txt and return the three paths.
+
+    Fixes are synthetic_airway_arrays' lattice over Europe with five-letter names. About
+    two fifths of the airways are listed in both directions, as in Spain_seg.txt, and one
+    point in 35 is an airport (LExx/LFxx) with a departure point linked to the lattice
+    (XXX.D) and an arrival point linked from it (XXX.A)."""
+    prefix = prefix or f"Synth{n_points}"
+    rng = np.random.default_rng(seed)
+    numbers, latitudes, longitudes, origins, destinations, distances = synthetic_airway_arrays(n_points, seed)
+    n = len(numbers)
+
+    both = rng.random(len(origins)) < 0.4
+    flipped = ~both & (rng.random(len(origins)) < 0.5)
+    origins, destinations = np.where(flipped, destinations, origins), np.where(flipped, origins, destinations)
+    origins, destinations, distances = (np.concatenate((origins, destinations[both])),
+                                        np.concatenate((destinations, origins[both])),
+                                        np.concatenate((distances, distances[both])))
+
+    n_airports = min(max(1, n // 35), 2 * 26 * 26)
+    fixes = rng.choice(n, n_airports, replace=False)
+    departures = n + 2 * np.arange(n_airports)
+    arrivals = departures + 1
+    next_fixes = (fixes + 1) % n
+    airport_origins = np.concatenate((departures, departures, fixes, next_fixes))
+    airport_destinations = np.concatenate((fixes, next_fixes, arrivals, arrivals))
+    point_latitudes = np.concatenate((latitudes, np.repeat(latitudes[fixes], 2) + 0.01))
+    point_longitudes = np.concatenate((longitudes, np.repeat(longitudes[fixes], 2) + 0.01))
+    airport_distances = haversine(point_latitudes[airport_origins], point_longitudes[airport_origins],
+                                  point_latitudes[airport_destinations], point_longitudes[airport_destinations])
+
+    paths = [os.path.join(directory, f"{prefix}_{kind}.txt") for kind in ("nav", "seg", "aer")]
+    codes = [_code(i, 3) for i in range(n_airports)]
+    with open(paths[0], "w") as f:
+        f.writelines(f"{number + 1} {_code(number, 5)} {latitude:.10f} {longitude:.10f}\n"
+                     for number, latitude, longitude in zip(range(n), latitudes.tolist(), longitudes.tolist()))
+        for i, code in enumerate(codes):
+            for suffix, row in ((".D", n + 2 * i), (".A", n + 2 * i + 1)):
+                f.write(f"{row + 1} {code}{suffix} {point_latitudes[row]:.10f} {point_longitudes[row]:.10f}\n")
+    with open(paths[1], "w") as f:
+        f.writelines(f"{origin + 1} {destination + 1} {distance:.6f}\n"
+                     for origin, destination, distance in zip(
+                         np.concatenate((origins, airport_origins)).tolist(),
+                         np.concatenate((destinations, airport_destinations)).tolist(),
+                         np.concatenate((distances, airport_distances)).tolist()))
+    with open(paths[2], "w") as f:
+        for i, code in enumerate(codes):
+            f.write(f"{'LE' if i < 26 * 26 else 'LF'}{_code(i % (26 * 26), 2)}\n{code}.D\n{code}.A\n")
+    return paths
+
+
+def _mean_time(function, arguments):
+    start = time.perf_counter()
+    for argument in arguments:
+        function(*argument)
+    return (time.perf_counter() - start) / len(arguments)
+
+
+def benchmark_dataset(paths, n_lookups=10_000, n_routes=None, render=True, seed=0):
+    """Metrics for one dataset: load_from_files seconds and peak traced MB, mean
+    microseconds per get_navpoint_by_name and find_neighbors, mean milliseconds per
+    find_shortest_path between random points and seconds to draw the map with Agg
+    (best of 3 up to 100k points)."""
+    start = time.perf_counter()
+    airspace = AirSpace()
+    load_from_files(airspace, *paths)
+    load_seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    load_from_files(AirSpace(), *paths)
+    _, load_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    n_points = len(airspace.navpoints)
+    if n_routes is None:
+        n_routes = max(5, min(200, 2_000_000 // n_points))
+    rng = np.random.default_rng(seed)
+    points = list(airspace.navpoints.values())
+    names = [(airspace, points[i].name) for i in rng.integers(0, n_points, n_lookups).tolist()]
+    numbers = [(airspace, points[i].number) for i in rng.integers(0, n_points, n_lookups).tolist()]
+    pairs = [(airspace, points[i].number, points[j].number)
+             for i, j in rng.integers(0, n_points, (n_routes, 2)).tolist()]
+
+    result = {
+        "points": n_points,
+        "segments": len(airspace.navsegments),
+        "load_from_files_s": load_seconds,
+        "load_peak_mb": load_peak / 1e6,
+        "get_navpoint_by_name_us": 1e6 * _mean_time(get_navpoint_by_name, names),
+        "find_neighbors_us": 1e6 * _mean_time(find_neighbors, numbers),
+        "find_shortest_path_ms": 1e3 * _mean_time(find_shortest_path, pairs),
+    }
+    if render:
+        def draw():
+            fig = Figure(figsize=(15, 12), dpi=100)
+            draw_airspace(fig.add_subplot(111), airspace)
+            FigureCanvasAgg(fig).draw()
+        result["render_s"] = best_time(draw, repeat=3 if n_points <= 100_000 else 1)
+    return result
+
+
+def max_rss_mb():
+    """Peak resident memory of this process, None where the resource module is missing."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 1e6
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(sizes=DEFAULT_SIZES, data_directory=None, render=True, seed=0):
+    """Generate a synthetic dataset per size and benchmark it; returns the results document."""
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = data_directory or scratch
+        for size in sizes:
+            paths = write_synthetic_dataset(directory, size, seed=seed)
+            result = benchmark_dataset(paths, render=render, seed=seed)
+            result["dataset"] = os.path.basename(paths[0])[:-len("_nav.txt")]
+            results.append(result)
+            print(f"{result['dataset']}: " + ", ".join(f"{key} {value:.4g}" for key, value in result.items()
+                                                       if isinstance(value, float)))
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": matplotlib.__version__,
+        "machine": platform.platform(),
+        "max_rss_mb": max_rss_mb(),
+        "results": results,
+    }
+
+
+def compare_results(baseline, current, threshold=0.1):
+    """[(dataset, metric, baseline, current, ratio, regressed)] for the metrics both
+    documents measured on the same dataset. Every metric is a time or a size, so
+    regressed means current is more than threshold above baseline."""
+    previous = {result["dataset"]: result for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        old = previous.get(result["dataset"])
+        if old is None:
+            continue
+        for metric, value in result.items():
+            if metric in ("dataset", "points", "segments") or not old.get(metric):
+                continue
+            ratio = value / old[metric]
+            rows.append((result["dataset"], metric, old[metric], value, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite over synthetic airspaces of growing size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                        help="navpoints per synthetic dataset (default 1000 10000 100000 1000000)")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON results file")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative slowdown reported as a regression (default 0.1)")
+    parser.add_argument("--data-dir", help="keep the generated *_nav/seg/aer.txt files in this directory")
+    parser.add_argument("--no-render", action="store_true", help="skip the map rendering timing")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+    document = run_suite(args.sizes, args.data_dir, not args.no_render, args.seed)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(baseline, document, args.threshold)
+        print(f"\nCompared with {args.compare} (commit {baseline.get('commit')})")
+        print(f"{'dataset':<16}{'metric':<26}{'before':>11}{'after':>11}{'ratio':>8}")
+        for dataset, metric, before, after, ratio, regressed in rows:
+            print(f"{dataset:<16}{metric:<26}{before:>11.4g}{after:>11.4g}{ratio:>8.2f}"
+                  f"{'  REGRESSION' if regressed else ''}")
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+import sys
+
+import numpy as np
+
+from airSpace import add_navairport, airspace_name_for, is_nav_header, is_seg_header, read_airports, \
+    resolve_procedures, print_segment_outliers, validate_segment_distances
+from airGraph import build_graph_from_arrays
+from loadProgress import LoadCancelled, read_text, set_stage
+from navPoint import get_coordinate_arrays, store_points
+from navSegment import get_segment_arrays, store_segments
+
+
+def _body_lines(text, is_header):
+    # Lines after the header line, if any, mirroring load_from_files
+    lines = text.splitlines()
+    if lines and is_header(lines[0].strip()):
+        lines = lines[1:]
+    return lines
+
+
+def _rows(lines, width):
+    # Tokens of every line with at least width fields, cut to width fields
+    tokens = []
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= width:
+            tokens.extend(parts[:width])
+    return tokens
+
+
+def _tokens(lines, width):
+    # Fast path when every non-blank line is exactly width fields: then one split of
+    # the whole text gives the table row by row. With spaces as the only separator a
+    # line with width - 1 spaces splits into at most width fields, so if those lines
+    # add up to width fields each, none of them has fewer and the rows cannot shift.
+    text = "\n".join(lines)
+    if text.isascii() and "\t" not in text and "\x1f" not in text and \
+            all(line.count(" ") == width - 1 for line in lines if line):
+        tokens = text.split()
+        if len(tokens) == width * sum(1 for line in lines if line):
+            return tokens
+    return _rows(lines, width)
+
+
+def read_nav_columns(nav_file, progress=None):
+    tokens = _tokens(_body_lines(read_text(nav_file, progress), is_nav_header), 4)
+
+    numbers = np.array(list(map(int, tokens[0::4])), dtype=np.int64)
+    names = [sys.intern(name) for name in tokens[1::4]]
+    latitudes = np.array(tokens[2::4], dtype=np.float64)
+    longitudes = np.array(tokens[3::4], dtype=np.float64)
+    return numbers, names, latitudes, longitudes
+
+
+def read_seg_columns(seg_file, progress=None):
+    tokens = _tokens(_body_lines(read_text(seg_file, progress), is_seg_header), 3)
+
+    origins = np.array(list(map(int, tokens[0::3])), dtype=np.int64)
+    destinations = np.array(list(map(int, tokens[1::3])), dtype=np.int64)
+    distances = np.array(tokens[2::3], dtype=np.float64)
+    return origins, destinations, distances
+
+
+def read_aer_airports(aer_file, progress=None):
+    return read_airports(read_text(aer_file, progress).splitlines(True))
+
+
+def load_from_files_bulk(airspace, nav_file, seg_file, aer_file, validate=False, progress=None):
+    # Same result as load_from_files, but the three files are read concurrently and
+    # parsed column-wise straight into the point and segment stores. The CSR graph is
+    # built from the same columns; the adjacency dicts are filled on first use.
+    # With a loadProgress.LoadProgress, reading is reported per file and cancel_load
+    # raises LoadCancelled.
+    try:
+        airspace.name = airspace_name_for(nav_file) or airspace.name
+
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            nav_future = executor.submit(read_nav_columns, nav_file, progress)
+            seg_future = executor.submit(read_seg_columns, seg_file, progress)
+            aer_future = executor.submit(read_aer_airports, aer_file, progress)
+            numbers, names, latitudes, longitudes = nav_future.result()
+            origins, destinations, distances = seg_future.result()
+            airports = aer_future.result()
+
+        set_stage(progress, "points")
+        add_navpoints_bulk(airspace, numbers, names, latitudes, longitudes)
+        set_stage(progress, "segments")
+        add_navsegments_bulk(airspace, origins, destinations, distances)
+        set_stage(progress, "airports")
+        for navairport, sid_names, star_names in airports:
+            resolve_procedures(airspace, navairport, sid_names, star_names)
+            add_navairport(airspace, navairport)
+
+        if validate:
+            print_segment_outliers(validate_segment_distances(airspace))
+
+        return True
+
+    except LoadCancelled:
+        raise
+    except Exception as e:
+        print(f"Error loading airspace data: {e}")
+        return False
+
+
+def add_navpoints_bulk(airspace, numbers, names, latitudes, longitudes):
+    store = airspace.navpoints.store
+    store_points(store, numbers, names, latitudes, longitudes)
+    airspace.version += 1
+
+    # Rebuild the first-name-wins index add_navpoint keeps in one C-level pass
+    point_numbers = get_coordinate_arrays(store)[0].tolist()
+    airspace.names = dict(zip(reversed(store.names), reversed(point_numbers)))
+
+    airspace.sorted_names = None
+    airspace.name_trie = None
+    airspace.point_grid = None
+    airspace.segment_grid = None
+    airspace.graph = None
+    airspace.heuristic_scale = None
+
+
+def add_navsegments_bulk(airspace, origins, destinations, distances):
+    store_segments(airspace.navsegments.store, origins, destinations, distances)
+    airspace.version += 1
+    airspace.heuristic_scale = None
+    airspace.segment_grid = None
+    airspace.graph = build_graph_from_arrays(get_coordinate_arrays(airspace.navpoints.store)[0],
+                                             *get_segment_arrays(airspace.navsegments.store))
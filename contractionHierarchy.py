@@ -0,0 +1,296 @@
+import hashlib
+import heapq
+
+import numpy as np
+
+from airGraph import build_graph, get_index
+from airSpace import has_closures
+
+HIERARCHY_VERSION = 1
+
+_ARRAYS = ("numbers", "ranks", "offsets", "targets", "weights", "middles")
+
+
+class ContractionHierarchy:
+    def __init__(self, numbers, ranks, offsets, targets, weights, middles, signature):
+        self.numbers = numbers  # Same index -> NavPoint number table as the AirGraph it was built from
+        self.ranks = ranks  # Contraction order of every index
+        self.offsets = offsets  # Upward edges of index i are targets[offsets[i]:offsets[i + 1]]
+        self.targets = targets  # Higher-ranked neighbor indices
+        self.weights = weights  # Edge or shortcut lengths, aligned with targets
+        self.middles = middles  # Contracted index a shortcut bypasses, -1 for a real segment
+        self.signature = signature  # graph_signature of the source graph
+        self.version = None  # AirSpace.version the hierarchy belongs to
+        self.upward = None  # Per index [(target, weight, middle)] lists, built on the first query
+
+
+def graph_signature(graph):
+    digest = hashlib.sha256()
+    for array in (graph.numbers, graph.offsets, graph.targets, graph.weights):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+
+def _witness_distances(adjacency, source, skipped, targets, limit, max_settled):
+    # Dijkstra from source that never enters skipped, stopped once every target is
+    # settled, past distance limit or after max_settled nodes. Distances are upper
+    # bounds for nodes it did not settle.
+    distances = {source: 0}
+    queue = [(0, source)]
+    remaining = len(targets)
+    settled = 0
+    while queue and settled < max_settled:
+        distance, node = heapq.heappop(queue)
+        if distance > distances[node]:
+            continue
+        if distance > limit:
+            break
+        settled += 1
+        if node in targets:
+            remaining -= 1
+            if not remaining:
+                break
+        for neighbor, weight in adjacency[node].items():
+            if neighbor == skipped:
+                continue
+            candidate = distance + weight
+            if candidate < distances.get(neighbor, float('infinity')):
+                distances[neighbor] = candidate
+                heapq.heappush(queue, (candidate, neighbor))
+    return distances
+
+
+def _shortcuts(adjacency, node, max_settled):
+    # (u, x, length) for every neighbor pair whose only shortest connection goes through node
+    neighbors = list(adjacency[node].items())
+    shortcuts = []
+    for i, (u, to_u) in enumerate(neighbors[:-1]):
+        others = neighbors[i + 1:]
+        limit = to_u + max(weight for _, weight in others)
+        witness = _witness_distances(adjacency, u, node, {x for x, _ in others}, limit, max_settled)
+        for x, to_x in others:
+            length = to_u + to_x
+            if witness.get(x, float('infinity')) > length:
+                shortcuts.append((u, x, length))
+    return shortcuts
+
+
+def _priority(adjacency, node, contracted_neighbors, max_settled):
+    # Edge difference plus the number of already contracted neighbors, which spreads
+    # the contraction evenly over the network
+    return len(_shortcuts(adjacency, node, max_settled)) - len(adjacency[node]) + contracted_neighbors[node]
+
+
+def build_hierarchy(airspace, max_settled=64):
+    # Contracts every node of the airspace's CSR graph in order of importance and
+    # keeps, for each node, its edges and shortcuts towards higher-ranked nodes
+    graph = airspace.graph if airspace.graph is not None else build_graph(airspace)
+    n = len(graph.numbers)
+
+    adjacency = [{} for _ in range(n)]
+    offsets = graph.offsets.tolist()
+    targets = graph.targets.tolist()
+    weights = graph.weights.tolist()
+    for u in range(n):
+        for k in range(offsets[u], offsets[u + 1]):
+            if targets[k] != u:
+                adjacency[u][targets[k]] = weights[k]
+    middles = {}  # (u, x) -> bypassed node, for both directions of every shortcut
+
+    contracted_neighbors = [0] * n
+    queue = [(_priority(adjacency, node, contracted_neighbors, max_settled), node) for node in range(n)]
+    heapq.heapify(queue)
+
+    ranks = np.empty(n, dtype=np.int32)
+    upward = [None] * n
+    rank = 0
+    while queue:
+        _, node = heapq.heappop(queue)
+        # Lazy update: contract node only if it is still the cheapest choice. Refreshing
+        # only the popped node costs far fewer witness searches than updating every
+        # neighbor after each contraction, for hierarchies of the same size.
+        priority = _priority(adjacency, node, contracted_neighbors, max_settled)
+        if queue and priority > queue[0][0]:
+            heapq.heappush(queue, (priority, node))
+            continue
+
+        shortcuts = _shortcuts(adjacency, node, max_settled)
+        ranks[node] = rank
+        rank += 1
+        upward[node] = [(x, weight, middles.get((node, x), -1)) for x, weight in adjacency[node].items()]
+
+        for x in adjacency[node]:
+            del adjacency[x][node]
+            contracted_neighbors[x] += 1
+        adjacency[node] = {}
+        for u, x, length in shortcuts:
+            if length < adjacency[u].get(x, float('infinity')):
+                adjacency[u][x] = length
+                adjacency[x][u] = length
+                middles[(u, x)] = middles[(x, u)] = node
+
+    counts = np.array([len(edges) for edges in upward], dtype=np.int64)
+    up_offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(counts, out=up_offsets[1:])
+    edges = [edge for node_edges in upward for edge in node_edges]
+    hierarchy = ContractionHierarchy(
+        graph.numbers,
+        ranks,
+        up_offsets,
+        np.array([edge[0] for edge in edges], dtype=graph.targets.dtype),
+        np.array([edge[1] for edge in edges], dtype=np.float64),
+        np.array([edge[2] for edge in edges], dtype=graph.targets.dtype),
+        graph_signature(graph))
+    hierarchy.version = airspace.version
+    return hierarchy
+
+
+def hierarchy_nbytes(hierarchy):
+    return sum(getattr(hierarchy, field).nbytes for field in _ARRAYS)
+
+
+def save_hierarchy(hierarchy, path):
+    with open(path, "wb") as f:
+        np.savez(f, version=np.array(HIERARCHY_VERSION), signature=np.array(hierarchy.signature),
+                 **{field: getattr(hierarchy, field) for field in _ARRAYS})
+
+
+def load_hierarchy(airspace, path):
+    # Raises ValueError unless the file was built from the airspace's current graph
+    with np.load(path) as data:
+        if int(data["version"]) != HIERARCHY_VERSION:
+            raise ValueError(f"Unsupported contraction hierarchy version in {path}")
+        arrays = {field: data[field] for field in _ARRAYS}
+        signature = str(data["signature"])
+
+    graph = airspace.graph if airspace.graph is not None else build_graph(airspace)
+    if signature != graph_signature(graph):
+        raise ValueError(f"Contraction hierarchy in {path} was built from a different airspace")
+
+    hierarchy = ContractionHierarchy(signature=signature, **arrays)
+    hierarchy.version = airspace.version
+    return hierarchy
+
+
+def _upward_lists(hierarchy):
+    # The upward edges as plain lists: slicing the arrays on every settled node costs
+    # more than the whole relaxation
+    if hierarchy.upward is None:
+        edges = list(zip(hierarchy.targets.tolist(), hierarchy.weights.tolist(), hierarchy.middles.tolist()))
+        offsets = hierarchy.offsets.tolist()
+        hierarchy.upward = [edges[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+    return hierarchy.upward
+
+
+def _upward(hierarchy, node):
+    return _upward_lists(hierarchy)[node]
+
+
+def _edge(hierarchy, u, v):
+    # (length, middle) of the edge between u and v, stored with the lower-ranked end
+    low, high = (u, v) if hierarchy.ranks[u] < hierarchy.ranks[v] else (v, u)
+    for target, weight, middle in _upward(hierarchy, low):
+        if target == high:
+            return weight, middle
+    raise KeyError((u, v))
+
+
+def _unpack(hierarchy, u, v, middle, path, lengths):
+    # Appends the real segments of edge u -> v (without u) to path and their lengths
+    stack = [(u, v, middle)]
+    while stack:
+        a, b, m = stack.pop()
+        if m < 0:
+            path.append(b)
+            lengths.append(_edge(hierarchy, a, b)[0])
+        else:
+            stack.append((m, b, _edge(hierarchy, m, b)[1]))
+            stack.append((a, m, _edge(hierarchy, a, m)[1]))
+
+
+def _chain(previous, node):
+    # [(u, v, middle), ...] edges from the search origin down to node
+    edges = []
+    while previous[node] is not None:
+        parent, middle = previous[node]
+        edges.append((parent, node, middle))
+        node = parent
+    edges.reverse()
+    return edges
+
+
+def hierarchy_path(airspace, hierarchy, start_number, end_number, stats=None):
+    # Same (path, distance) as find_shortest_path, answered by a bidirectional upward
+    # search. Pass a pathSearch.SearchStats to get the number of nodes settled.
+    # Shortcuts are contracted over the open graph, so closures are refused rather
+    # than ignored; reopen them or use find_shortest_path.
+    if hierarchy.version != airspace.version:
+        raise ValueError("Contraction hierarchy is out of date, rebuild it after changing the airspace")
+    if has_closures(airspace):
+        raise ValueError("Contraction hierarchies do not support closed points, closed segments or distance overrides")
+    if start_number not in airspace.navpoints or end_number not in airspace.navpoints:
+        return [], 0
+    if start_number == end_number:
+        return [], 0
+
+    graph = airspace.graph if airspace.graph is not None else build_graph(airspace)
+    start = get_index(graph, start_number)
+    end = get_index(graph, end_number)
+    if stats is not None:
+        stats.method = "contraction_hierarchy"
+
+    upward = _upward_lists(hierarchy)
+    infinity = float('infinity')
+    distances = ({start: 0}, {end: 0})
+    previous = ({start: None}, {end: None})
+    queues = ([(0, start)], [(0, end)])
+    best = float('infinity')
+    meeting = None
+
+    # Both searches only climb the hierarchy; each one stops once its queue
+    # minimum can no longer improve the best meeting distance
+    while True:
+        open_sides = [side for side in (0, 1) if queues[side] and queues[side][0][0] < best]
+        if not open_sides:
+            break
+        side = min(open_sides, key=lambda side: queues[side][0][0])
+        distance, node = heapq.heappop(queues[side])
+        own = distances[side]
+        if distance > own[node]:
+            continue
+        if stats is not None:
+            stats.settled += 1
+
+        other = distances[1 - side].get(node)
+        if other is not None and distance + other < best:
+            best = distance + other
+            meeting = node
+
+        # Stall on demand: a higher neighbor already reached by a shorter way means
+        # node is not on a shortest upward path, so its edges need not be relaxed
+        edges = upward[node]
+        if any(own.get(target, infinity) + weight < distance for target, weight, _ in edges):
+            continue
+
+        for target, weight, middle in edges:
+            candidate = distance + weight
+            if candidate < own.get(target, infinity):
+                own[target] = candidate
+                previous[side][target] = (node, middle)
+                heapq.heappush(queues[side], (candidate, target))
+
+    if meeting is None:
+        return [], 0
+
+    path = [start]
+    lengths = []
+    for u, v, middle in _chain(previous[0], meeting):
+        _unpack(hierarchy, u, v, middle, path, lengths)
+    for u, v, middle in reversed(_chain(previous[1], meeting)):
+        _unpack(hierarchy, v, u, middle, path, lengths)
+
+    # Sum the segments in path order, as find_shortest_path does
+    total = 0
+    for length in lengths:
+        total += length
+    return hierarchy.numbers[path].tolist(), total
@@ -0,0 +1,27 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0  # Segment distances in the *_seg.txt files are kilometres
+EARTH_RADIUS_NM = 3440.065
+
+
+def haversine(lat1, lon1, lat2, lon2, radius=EARTH_RADIUS_KM):
+    # Great-circle distance between element-wise pairs of points given in degrees;
+    # inputs broadcast like any NumPy expression
+    lat1 = np.radians(lat1)
+    lon1 = np.radians(lon1)
+    lat2 = np.radians(lat2)
+    lon2 = np.radians(lon2)
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * radius * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+def distances_one_to_many(latitude, longitude, latitudes, longitudes, radius=EARTH_RADIUS_KM):
+    return haversine(latitude, longitude, np.asarray(latitudes), np.asarray(longitudes), radius)
+
+
+def distances_many_to_many(latitudes1, longitudes1, latitudes2, longitudes2, radius=EARTH_RADIUS_KM):
+    # Matrix with one row per point of the first set and one column per point of the second
+    latitudes1 = np.asarray(latitudes1)[:, np.newaxis]
+    longitudes1 = np.asarray(longitudes1)[:, np.newaxis]
+    return haversine(latitudes1, longitudes1, np.asarray(latitudes2), np.asarray(longitudes2), radius)
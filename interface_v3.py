@@ -1,9 +1,20 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
 from matplotlib.figure import Figure
-from airSpace import AirSpace, get_navpoint_by_name, load_from_files, find_shortest_path
-from navSegment import get_origin_number, get_destination_number, get_distance
+from airSpace import AirSpace, get_navpoint_by_name, find_navpoints_by_prefix, find_navpoints_fuzzy, \
+    find_nearest_navpoints, calculate_distance, find_outgoing, get_segment_distance
+from airSnapshot import load_from_files_cached
+from airspaceMap import open_map_view, open_tiled_map_view, show_overlay
+from airTiles import open_tiles
+from loadProgress import LoadCancelled, LoadProgress, cancel_load, progress_fraction
+from pathSearch import SearchCancelled, SearchStats
+from perfStats import profile_to, start_trace, stop_trace, trace_event, write_trace
+from routeCache import find_shortest_path_cached
 
 espacio_aereo = None
 
@@ -30,33 +41,142 @@ def explorar_archivo_aer(app, archivo_aer):
     explorar_archivo(archivo_aer)
 
 
-def cargar_datos_wrapper(app, archivo_nav, archivo_seg, archivo_aer, ventana):
+def cargar_datos_wrapper(app, archivo_nav, archivo_seg, archivo_aer, ventana, controles):
     nav = archivo_nav.get()
     seg = archivo_seg.get()
     aer = archivo_aer.get()
-    cargar_datos(app, nav, seg, aer, ventana)
+    cargar_datos(app, nav, seg, aer, ventana, controles)
 
 
-def cargar_datos(app, archivo_nav, archivo_seg, archivo_aer, ventana):
-    global espacio_aereo
+ETAPAS_CARGA = {"points": "Creando puntos de navegación", "segments": "Creando segmentos y grafo",
+                "airports": "Leyendo aeropuertos", "snapshot": "Guardando instantánea"}
 
-    try:
-        espacio_aereo = AirSpace()
 
-        exito = load_from_files(espacio_aereo, archivo_nav, archivo_seg, archivo_aer)
+def describir_progreso(progreso):
+    lineas = []
+    for ruta, (leido, total) in list(progreso.files.items()):
+        lineas.append(f"{os.path.basename(ruta)}: {min(leido, total) / 1024:.0f} / {total / 1024:.0f} KB")
+    if progreso.stage is not None:
+        lineas.append(ETAPAS_CARGA[progreso.stage] + "...")
+    return "\n".join(lineas)
+
 
-        if exito:
-            messagebox.showinfo("Éxito",
-                                f"Datos cargados correctamente.\n\nPuntos de navegación: {len(espacio_aereo.navpoints)}\nSegmentos: {len(espacio_aereo.navsegments)}\nAeropuertos: {len(espacio_aereo.navairports)}",
-                                parent=ventana)
-            ventana.destroy()
+def cargar_datos(app, archivo_nav, archivo_seg, archivo_aer, ventana, controles):
+    # La carga se hace en un hilo sobre un AirSpace nuevo; el anterior sigue en uso hasta
+    # que el nuevo está completo y se sustituye desde el bucle de Tk
+    boton_cargar, etiqueta_progreso, boton_cancelar = controles
+    progreso = LoadProgress()
+    resultado = {}
+
+    def trabajar():
+        nuevo = AirSpace()
+        try:
+            if load_from_files_cached(nuevo, archivo_nav, archivo_seg, archivo_aer, progress=progreso):
+                resultado["espacio"] = nuevo
+        except LoadCancelled:
+            pass
+        except Exception as e:
+            resultado["error"] = e
+
+    def cancelar():
+        cancel_load(progreso)
+        boton_cancelar.config(state=tk.DISABLED)
+        etiqueta_progreso.config(text="Cancelando...")
+
+    def cerrar():
+        cancel_load(progreso)
+        ventana.destroy()
+
+    def revisar():
+        if hilo.is_alive():
+            if ventana.winfo_exists():
+                etiqueta_progreso.config(text=describir_progreso(progreso))
+            app.status.config(text=f"Cargando datos... {progress_fraction(progreso) * 100:.0f} %")
+            app.after(100, revisar)
+        else:
+            terminar()
 
+    def terminar():
+        global espacio_aereo
+        abierta = bool(ventana.winfo_exists())
+        if abierta:
+            boton_cargar.config(state=tk.NORMAL)
+            boton_cancelar.config(state=tk.DISABLED)
+            etiqueta_progreso.config(text="")
+
+        if progreso.cancelled:
+            app.status.config(text="Carga cancelada")
+        elif "espacio" in resultado:
+            espacio_aereo = resultado["espacio"]
             app.status.config(
                 text=f"Datos cargados: {len(espacio_aereo.navpoints)} puntos, {len(espacio_aereo.navsegments)} segmentos, {len(espacio_aereo.navairports)} aeropuertos")
+            if abierta:
+                messagebox.showinfo("Éxito",
+                                    f"Datos cargados correctamente.\n\nPuntos de navegación: {len(espacio_aereo.navpoints)}\nSegmentos: {len(espacio_aereo.navsegments)}\nAeropuertos: {len(espacio_aereo.navairports)}",
+                                    parent=ventana)
+                ventana.destroy()
         else:
-            messagebox.showerror("Error", "No se pudieron cargar los datos correctamente.", parent=ventana)
-    except Exception as e:
-        messagebox.showerror("Error", f"Error al cargar datos: {str(e)}", parent=ventana)
+            app.status.config(text="Error al cargar datos")
+            if "error" in resultado:
+                messagebox.showerror("Error", f"Error al cargar datos: {str(resultado['error'])}",
+                                     parent=ventana if abierta else app)
+            else:
+                messagebox.showerror("Error", "No se pudieron cargar los datos correctamente.",
+                                     parent=ventana if abierta else app)
+
+    boton_cargar.config(state=tk.DISABLED)
+    boton_cancelar.config(state=tk.NORMAL, command=cancelar)
+    ventana.protocol("WM_DELETE_WINDOW", cerrar)
+
+    hilo = threading.Thread(target=trabajar, daemon=True)
+    hilo.start()
+    revisar()
+
+
+def activar_autocompletado(entry, variable, max_sugerencias=8):
+    sugerencias = tk.Listbox(entry.winfo_toplevel(), height=max_sugerencias)
+
+    def ocultar(event=None):
+        sugerencias.place_forget()
+
+    def elegir(event=None):
+        seleccion = sugerencias.curselection()
+        if seleccion:
+            variable.set(sugerencias.get(seleccion[0]))
+            entry.icursor(tk.END)
+        ocultar()
+
+    def actualizar(event):
+        if event.keysym in ("Return", "Escape", "Up", "Down"):
+            return
+        texto = variable.get().strip()
+        if not espacio_aereo or not texto:
+            ocultar()
+            return
+
+        puntos = find_navpoints_by_prefix(espacio_aereo, texto, limit=max_sugerencias)
+        if not puntos or (len(puntos) == 1 and puntos[0].name == texto):
+            ocultar()
+            return
+
+        sugerencias.delete(0, tk.END)
+        for punto in puntos:
+            sugerencias.insert(tk.END, punto.name)
+        sugerencias.config(height=len(puntos))
+        sugerencias.place(in_=entry, x=0, rely=1.0, relwidth=1.0)
+        sugerencias.lift()
+
+    entry.bind("<KeyRelease>", actualizar)
+    entry.bind("<Escape>", ocultar)
+    entry.bind("<FocusOut>", lambda event: entry.after(150, ocultar))
+    sugerencias.bind("<<ListboxSelect>>", elegir)
+
+
+def sugerir_nombres(nombre):
+    parecidos = find_navpoints_fuzzy(espacio_aereo, nombre, max_distance=2, limit=5)
+    if not parecidos:
+        return ""
+    return " ¿Quiso decir: " + ", ".join(punto.name for punto, _ in parecidos) + "?"
 
 
 def limpiar_contenido(app):
@@ -71,7 +191,7 @@ def cargar_espacio_aereo(app):
 
     load_window = tk.Toplevel(app)
     load_window.title("Cargar Datos de Espacio Aéreo")
-    load_window.geometry("450x250")
+    load_window.geometry("450x330")
 
     file_frame = tk.Frame(load_window)
     file_frame.pack(fill=tk.X, pady=10, padx=10)
@@ -109,177 +229,30 @@ def cargar_espacio_aereo(app):
                            command=lambda: explorar_archivo_aer(app, air_file))
     air_browse.grid(row=2, column=2, padx=5, pady=5)
 
-    load_button = tk.Button(load_window, text="Cargar Datos",
-                            command=lambda: cargar_datos_wrapper(app, nav_file, seg_file, air_file, load_window))
-    load_button.pack(pady=10)
-
+    progress_label = tk.Label(load_window, text="", justify=tk.LEFT)
+    cancel_button = tk.Button(load_window, text="Cancelar", state=tk.DISABLED)
 
-def mostrar_espacio_aereo(app, punto_destacado=None, vecinos=None, ruta=None):
-    global espacio_aereo
+    load_button = tk.Button(load_window, text="Cargar Datos")
+    load_button.config(command=lambda: cargar_datos_wrapper(app, nav_file, seg_file, air_file, load_window,
+                                                            (load_button, progress_label, cancel_button)))
+    load_button.pack(pady=10)
+    progress_label.pack(pady=5)
+    cancel_button.pack(pady=5)
 
-    if not espacio_aereo or not espacio_aereo.navpoints:
-        messagebox.showwarning("Advertencia",
-                               "No hay datos de espacio aéreo cargados. Por favor cargue los datos primero.")
-        return
 
+def abrir_ventana_mapa(app):
+    # Ventana del mapa con el espacio aéreo dibujado una sola vez; las consultas
+    # posteriores solo cambian la capa superpuesta (vecinos o ruta)
     map_window = tk.Toplevel(app)
     map_window.title("Mapa de Espacio Aéreo")
     map_window.geometry("1200x900")
 
     fig = Figure(figsize=(15, 12), dpi=100)
     ax = fig.add_subplot(111)
-
-    is_neighbor_view = bool(punto_destacado and vecinos)
-
-    lon_values = []
-    lat_values = []
-
-    point_cache = {}
-
-    for num, point in espacio_aereo.navpoints.items():
-        lon_values.append(point.longitude)
-        lat_values.append(point.latitude)
-        point_cache[point.number] = point
-
-    margin = 0.1
-    lon_min = min(lon_values) - margin
-    lon_max = max(lon_values) + margin
-    lat_min = min(lat_values) - margin
-    lat_max = max(lat_values) + margin
-
-    ax.set_xlim(lon_min, lon_max)
-    ax.set_ylim(lat_min, lat_max)
-    ax.set_autoscale_on(False)  # Disable autoscaling
-    ax.set_clip_on(True)
-
-    segment_color = 'cyan'
-    point_color = 'black'
-    highlight_color = 'red'
-    neighbor_color = highlight_color
-    path_color = '#00CCCC'
-
-    for segment in espacio_aereo.navsegments:
-        point1 = point_cache.get(segment.origin_number)
-        point2 = point_cache.get(segment.destination_number)
-
-        if point1 and point2:
-            draw_this_segment = False
-            current_line_color = segment_color
-            current_line_width = 1.0
-
-            if is_neighbor_view:
-                neighbor_numbers = [n[0].number for n in vecinos]
-                if (point1.number == punto_destacado.number and point2.number in neighbor_numbers) or \
-                        (point2.number == punto_destacado.number and point1.number in neighbor_numbers):
-                    current_line_color = segment_color
-                    current_line_width = 1.0
-                    draw_this_segment = True
-            else:
-                if ruta:
-                    draw_this_segment = False
-                    for i in range(len(ruta) - 1):
-                        if ((ruta[i].number == point1.number and ruta[i + 1].number == point2.number) or
-                                (ruta[i].number == point2.number and ruta[i + 1].number == point1.number)):
-                            draw_this_segment = True
-                            current_line_color = '#00CCCC'
-                            current_line_width = 1.5
-
-                            if ruta[i].number == point1.number and ruta[i + 1].number == point2.number:
-                                start_point = (point1.longitude, point1.latitude)
-                                end_point = (point2.longitude, point2.latitude)
-                            else:
-                                start_point = (point2.longitude, point2.latitude)
-                                end_point = (point1.longitude, point1.latitude)
-                            break
-                else:
-                    draw_this_segment = True
-                    current_line_color = segment_color
-                    current_line_width = 1.0
-
-            if draw_this_segment:
-                if ruta and 'start_point' in locals() and 'end_point' in locals():
-                    ax.annotate("",
-                                xy=end_point,
-                                xytext=start_point,
-                                arrowprops=dict(arrowstyle='->', color=current_line_color,
-                                                lw=current_line_width, shrinkA=0, shrinkB=0, clip_on=True),
-                                clip_on=True)
-                else:
-                    ax.plot([point1.longitude, point2.longitude],
-                            [point1.latitude, point2.latitude],
-                            color=current_line_color,
-                            linewidth=current_line_width,
-                            clip_on=True)
-
-                mid_x = (point1.longitude + point2.longitude) / 2
-                mid_y = (point1.latitude + point2.latitude) / 2
-                ax.text(mid_x, mid_y, f"{segment.distance:.1f}",
-                        fontsize=6, ha='center', va='center',
-                        bbox=dict(facecolor='white', alpha=0.5, pad=0.5), zorder=2, clip_on=True)
-
-    for num, point in espacio_aereo.navpoints.items():
-        this_color = point_color
-        this_size = 5
-        this_alpha = 1.0
-        this_zorder = 10
-
-        if ruta and any(p.number == point.number for p in ruta):
-            this_color = '#00CCCC'
-            this_size = 10
-            this_zorder = 20
-        elif ruta:
-            this_alpha = 0.5
-            this_size = 4
-        elif is_neighbor_view:
-            neighbor_numbers = [n[0].number for n in vecinos]
-            if point.number == punto_destacado.number:
-                this_color = highlight_color
-                this_size = 30
-            elif point.number in neighbor_numbers:
-                this_color = neighbor_color
-                this_size = 20
-            else:
-                this_color = 'gray'
-                this_size = 5
-
-        ax.scatter(point.longitude, point.latitude, color=this_color, s=this_size, alpha=this_alpha, zorder=this_zorder,
-                   clip_on=True)
-
-        ax.text(point.longitude + 0.01, point.latitude + 0.01, point.name,
-                fontsize=6, ha='left', va='bottom', zorder=6, clip_on=True)
-
-    if not is_neighbor_view and not ruta:
-        ax.grid(True, linestyle=':', alpha=0.7, color='red')
-
-    for spine in ax.spines.values():
-        spine.set_visible(True)
-        spine.set_edgecolor('black')
-        spine.set_linewidth(0.5)
-
-    if ruta:
-        total_cost = 0
-        for i in range(len(ruta)):
-            point = ruta[i]
-            if i > 0:
-                prev_point = ruta[i - 1]
-                for segment in espacio_aereo.navsegments:
-                    if ((get_origin_number(segment) == prev_point.number and get_destination_number(
-                            segment) == point.number) or
-                            (get_origin_number(segment) == point.number and get_destination_number(
-                                segment) == prev_point.number)):
-                        total_cost += get_distance(segment)
-                        break
-
-        ax.set_title(f"Gráfico con camino. Coste = {total_cost:.8f}", pad=20, y=1.02)
-    elif is_neighbor_view:
-        ax.set_title(f"Grafico con los vecinos del nodo {punto_destacado.name}", fontsize=14, pad=20, y=1.02)
-    else:
-        ax.set_title("Gráfico con nodos y segmentos", fontsize=14, pad=20, y=1.02)
-
     fig.subplots_adjust(left=0.05, right=0.95, top=0.92, bottom=0.05)
 
     canvas = FigureCanvasTkAgg(fig, master=map_window)  # A tk.DrawingArea.
-    canvas.draw()
+    mapa = open_map_view(ax, canvas, espacio_aereo)
 
     # Create a proper layout for the canvas and toolbar
     canvas_frame = tk.Frame(map_window)
@@ -290,10 +263,96 @@ def mostrar_espacio_aereo(app, punto_destacado=None, vecinos=None, ruta=None):
 
     canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
 
-    instructions_text = "Utilice la barra de herramientas para navegar por el mapa."
+    def seleccionar_punto(event):
+        # Clic fuera de los modos de zoom/desplazamiento: punto más cercano al clic
+        if event.inaxes is not ax or toolbar.mode:
+            return
+        cercanos = find_nearest_navpoints(espacio_aereo, event.ydata, event.xdata)
+        if cercanos:
+            punto, distancia = cercanos[0]
+            app.status.config(text=f"Punto seleccionado: {punto.name} ({punto.latitude:.4f}, "
+                                   f"{punto.longitude:.4f}), a {distancia:.1f} km del clic")
+
+    canvas.mpl_connect('button_press_event', seleccionar_punto)
+
+    instructions_text = "Utilice la barra de herramientas para navegar por el mapa. Haga clic para seleccionar un punto."
     instructions_label = tk.Label(map_window, text=instructions_text, font=("Arial", 10))
     instructions_label.pack(pady=5)
 
+    def cerrar():
+        app.mapa = None
+        app.ventana_mapa = None
+        map_window.destroy()
+
+    map_window.protocol("WM_DELETE_WINDOW", cerrar)
+    app.mapa = mapa
+    app.ventana_mapa = map_window
+
+
+def abrir_mapa_teselas(app):
+    # Mapa de un directorio de airTiles.save_tiles: solo se leen las teselas que
+    # rodean la vista, empezando por las de la tesela central
+    directorio = filedialog.askdirectory(title="Seleccione el directorio de teselas")
+    if not directorio:
+        return
+    try:
+        teselas = open_tiles(directorio)
+    except ValueError as e:
+        messagebox.showerror("Error", str(e))
+        return
+
+    claves = [clave for clave in teselas.keys if clave is not None]
+    if not claves:
+        messagebox.showwarning("Advertencia", "El directorio no tiene puntos de navegación.")
+        return
+    fila = sorted(clave[0] for clave in claves)[len(claves) // 2]
+    columna = sorted(clave[1] for clave in claves)[len(claves) // 2]
+    lado = teselas.tile_degrees
+
+    map_window = tk.Toplevel(app)
+    map_window.title(f"Mapa por Teselas - {teselas.name}")
+    map_window.geometry("1200x900")
+
+    fig = Figure(figsize=(15, 12), dpi=100)
+    ax = fig.add_subplot(111)
+    fig.subplots_adjust(left=0.05, right=0.95, top=0.92, bottom=0.05)
+
+    canvas = FigureCanvasTkAgg(fig, master=map_window)
+    canvas_frame = tk.Frame(map_window)
+    canvas_frame.pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+    toolbar = NavigationToolbar2Tk(canvas, canvas_frame)
+    toolbar.update()
+    canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=True)
+
+    map_window.mapa = open_tiled_map_view(ax, canvas, teselas, fila * lado, columna * lado,
+                                          (fila + 1) * lado, (columna + 1) * lado)
+    tk.Label(map_window, text="Desplace o aleje el mapa con la barra de herramientas para leer más teselas.",
+             font=("Arial", 10)).pack(pady=5)
+
+
+def mostrar_espacio_aereo(app, punto_destacado=None, vecinos=None, ruta=None):
+    global espacio_aereo
+
+    if not espacio_aereo or not espacio_aereo.navpoints:
+        messagebox.showwarning("Advertencia",
+                               "No hay datos de espacio aéreo cargados. Por favor cargue los datos primero.")
+        return
+
+    inicio = time.perf_counter()
+    # Se reutiliza la ventana abierta salvo que los datos hayan cambiado desde que se dibujó
+    if app.mapa is not None and (app.mapa.airspace is not espacio_aereo or
+                                 app.mapa.version != espacio_aereo.version):
+        app.ventana_mapa.destroy()
+        app.mapa = None
+    if app.mapa is None:
+        abrir_ventana_mapa(app)
+    else:
+        app.ventana_mapa.lift()
+
+    show_overlay(app.mapa, punto_destacado, vecinos, ruta)
+    fin = time.perf_counter()
+    trace_event("mostrar_espacio_aereo", inicio, fin, ventana_nueva=app.mapa.stats.overlays == 1)
+
     status_message = "Mostrando mapa de espacio aéreo"
     if punto_destacado:
         status_message += f" - Destacando punto: {punto_destacado.name}"
@@ -301,10 +360,57 @@ def mostrar_espacio_aereo(app, punto_destacado=None, vecinos=None, ruta=None):
         status_message += f" - Mostrando {len(vecinos)} vecinos"
     elif ruta:
         status_message += f" - Mostrando ruta con {len(ruta)} puntos"
+    status_message += f" ({(fin - inicio) * 1000:.0f} ms)"
 
     app.status.config(text=status_message)
 
-    return canvas, ax
+    return app.mapa.canvas, app.mapa.ax
+
+
+SPINNER = "|/-\\"
+
+
+def ejecutar_consulta(app, trabajo, al_terminar, indicador):
+    # Ejecuta trabajo(stats) en el hilo de consultas sin bloquear la ventana. Una consulta
+    # nueva cancela la que esté en curso (stats.cancelled); el resultado se entrega a
+    # al_terminar desde el bucle de Tk, y solo si los datos no han cambiado entretanto.
+    if app.consulta is not None:
+        app.consulta.cancelled = True
+    stats = SearchStats()
+    app.consulta = stats
+    espacio = espacio_aereo
+    futuro = app.ejecutor.submit(trabajo, stats)
+
+    def mostrar_indicador(texto):
+        if indicador.winfo_exists():
+            indicador.config(text=texto)
+
+    def revisar(paso=0):
+        if app.consulta is not stats:
+            mostrar_indicador("")  # Sustituida por otra consulta
+            return
+        if not futuro.done():
+            mostrar_indicador(f"{SPINNER[paso % len(SPINNER)]} Calculando...")
+            app.after(100, revisar, paso + 1)
+            return
+
+        app.consulta = None
+        mostrar_indicador("")
+        try:
+            resultado = futuro.result()
+        except SearchCancelled:
+            return
+        except Exception as e:
+            messagebox.showerror("Error", f"Error en la consulta: {str(e)}")
+            return
+        if espacio is not espacio_aereo:
+            app.status.config(text="Los datos cambiaron durante la consulta; repítala")
+            return
+        if indicador.winfo_exists():
+            al_terminar(resultado)
+
+    app.status.config(text="Calculando...")
+    revisar()
 
 
 def mostrar_vecinos(app):
@@ -328,6 +434,7 @@ def mostrar_vecinos(app):
     nav_point = tk.StringVar()
     point_entry = tk.Entry(input_frame, textvariable=nav_point, width=20)
     point_entry.grid(row=0, column=1, padx=5, pady=5)
+    activar_autocompletado(point_entry, nav_point)
 
     results_text = tk.Text(neighbors_window, width=50, height=15)
     results_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -338,12 +445,15 @@ def mostrar_vecinos(app):
     results_text.config(yscrollcommand=scrollbar.set)
     scrollbar.config(command=results_text.yview)
 
+    spinner_label = tk.Label(neighbors_window, text="")
+
     find_button = tk.Button(neighbors_window, text="Encontrar Vecinos",
-                            command=lambda: encontrar_y_mostrar_vecinos(app, results_text, nav_point))
+                            command=lambda: encontrar_y_mostrar_vecinos(app, results_text, nav_point, spinner_label))
     find_button.pack(pady=10)
+    spinner_label.pack()
 
 
-def encontrar_y_mostrar_vecinos(app, results_text, nav_point):
+def encontrar_y_mostrar_vecinos(app, results_text, nav_point, indicador):
     global espacio_aereo
 
     results_text.delete(1.0, tk.END)
@@ -357,20 +467,26 @@ def encontrar_y_mostrar_vecinos(app, results_text, nav_point):
     found_point = get_navpoint_by_name(espacio_aereo, nav_name)
 
     if not found_point:
-        results_text.insert(tk.END, f"Punto de navegación '{nav_name}' no encontrado.")
+        results_text.insert(tk.END, f"Punto de navegación '{nav_name}' no encontrado." + sugerir_nombres(nav_name))
         return
 
-    vecinos = []
-    for segment in espacio_aereo.navsegments:
-        if get_origin_number(segment) == found_point.number:
-            destination_number = get_destination_number(segment)
-            if destination_number in espacio_aereo.navpoints:
-                vecino = espacio_aereo.navpoints[destination_number]
-                distancia = get_distance(segment)
+    espacio = espacio_aereo
+
+    def buscar(stats):
+        vecinos = []
+        for destination_number, distancia in find_outgoing(espacio, found_point.number).items():
+            if destination_number in espacio.navpoints:
+                vecino = espacio.navpoints[destination_number]
                 vecinos.append((vecino, distancia))
 
-    vecinos.sort(key=lambda x: x[0].name)
+        vecinos.sort(key=lambda x: x[0].name)
+        return vecinos
 
+    ejecutar_consulta(app, buscar, lambda vecinos: mostrar_resultado_vecinos(app, results_text, found_point, vecinos),
+                      indicador)
+
+
+def mostrar_resultado_vecinos(app, results_text, found_point, vecinos):
     result_text = f"Vecinos de {found_point.name} (Número: {found_point.number}):\n"
     result_text += f"Ubicación: ({found_point.latitude}, {found_point.longitude})\n\n"
 
@@ -410,6 +526,7 @@ def encontrar_ruta(app):
     origin_point = tk.StringVar()
     origin_entry = tk.Entry(input_frame, textvariable=origin_point, width=20)
     origin_entry.grid(row=0, column=1, padx=5, pady=5)
+    activar_autocompletado(origin_entry, origin_point)
 
     dest_label = tk.Label(input_frame, text="Punto de Destino:")
     dest_label.grid(row=1, column=0, sticky=tk.W, padx=5, pady=5)
@@ -417,6 +534,7 @@ def encontrar_ruta(app):
     dest_point = tk.StringVar()
     dest_entry = tk.Entry(input_frame, textvariable=dest_point, width=20)
     dest_entry.grid(row=1, column=1, padx=5, pady=5)
+    activar_autocompletado(dest_entry, dest_point)
 
     path_text = tk.Text(path_window, width=50, height=15)
     path_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -427,12 +545,16 @@ def encontrar_ruta(app):
     path_text.config(yscrollcommand=scrollbar.set)
     scrollbar.config(command=path_text.yview)
 
+    spinner_label = tk.Label(path_window, text="")
+
     find_button = tk.Button(path_window, text="Encontrar Ruta",
-                            command=lambda: encontrar_y_mostrar_ruta(app, path_text, origin_point, dest_point))
+                            command=lambda: encontrar_y_mostrar_ruta(app, path_text, origin_point, dest_point,
+                                                                     spinner_label))
     find_button.pack(pady=10)
+    spinner_label.pack()
 
 
-def encontrar_y_mostrar_ruta(app, path_text, origin_point, dest_point):
+def encontrar_y_mostrar_ruta(app, path_text, origin_point, dest_point, indicador):
     global espacio_aereo
 
     path_text.delete(1.0, tk.END)
@@ -448,15 +570,23 @@ def encontrar_y_mostrar_ruta(app, path_text, origin_point, dest_point):
     destination = get_navpoint_by_name(espacio_aereo, dest_name)
 
     if not origin:
-        path_text.insert(tk.END, f"Punto de origen '{origin_name}' no encontrado.\n")
+        path_text.insert(tk.END, f"Punto de origen '{origin_name}' no encontrado." + sugerir_nombres(origin_name) + "\n")
         return
 
     if not destination:
-        path_text.insert(tk.END, f"Punto de destino '{dest_name}' no encontrado.\n")
+        path_text.insert(tk.END, f"Punto de destino '{dest_name}' no encontrado." + sugerir_nombres(dest_name) + "\n")
         return
 
-    resultado_ruta = find_shortest_path(espacio_aereo, origin.number, destination.number)
+    espacio = espacio_aereo
+    ejecutar_consulta(app,
+                      lambda stats: find_shortest_path_cached(espacio, origin.number, destination.number,
+                                                              stats=stats),
+                      lambda resultado_ruta: mostrar_resultado_ruta(app, path_text, origin, destination,
+                                                                    resultado_ruta),
+                      indicador)
 
+
+def mostrar_resultado_ruta(app, path_text, origin, destination, resultado_ruta):
     if resultado_ruta and resultado_ruta[0]:
         lista_numeros, distancia_total = resultado_ruta
 
@@ -472,13 +602,9 @@ def encontrar_y_mostrar_ruta(app, path_text, origin_point, dest_point):
 
             if i < len(ruta) - 1:
                 next_punto = ruta[i + 1]
-                for segment in espacio_aereo.navsegments:
-                    if ((get_origin_number(segment) == punto.number and get_destination_number(
-                            segment) == next_punto.number) or
-                            (get_destination_number(segment) == punto.number and get_origin_number(
-                                segment) == next_punto.number)):
-                        result_text += f"   Distancia al siguiente punto: {get_distance(segment):.2f}\n"
-                        break
+                distancia = get_segment_distance(espacio_aereo, punto.number, next_punto.number)
+                if distancia is not None:
+                    result_text += f"   Distancia al siguiente punto: {distancia:.2f}\n"
 
         result_text += f"\nDistancia total: {distancia_total:.2f}\n"
 
@@ -499,26 +625,11 @@ def calcular_distancia_ruta(ruta):
 
 
 def calcular_distancia_entre_puntos(point1, point2):
-    for segment in espacio_aereo.navsegments:
-        if (segment.origin_number == point1.number and segment.destination_number == point2.number) or \
-                (segment.origin_number == point2.number and segment.destination_number == point1.number):
-            return segment.distance
-
-    from math import radians, sin, cos, sqrt, atan2
-    R = 3440.065
-
-    lat1 = radians(point1.latitude)
-    lon1 = radians(point1.longitude)
-    lat2 = radians(point2.latitude)
-    lon2 = radians(point2.longitude)
+    distancia = get_segment_distance(espacio_aereo, point1.number, point2.number)
+    if distancia is not None:
+        return distancia
 
-    dlon = lon2 - lon1
-    dlat = lat2 - lat1
-    a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-    distance = R * c
-
-    return distance
+    return calculate_distance(espacio_aereo, point1, point2)
 
 
 class AplicacionNavegacionEspacioAereo(tk.Tk):
@@ -547,6 +658,10 @@ class AplicacionNavegacionEspacioAereo(tk.Tk):
                                 command=lambda: mostrar_espacio_aereo(self))
         button_show.grid(row=0, column=1, padx=5, pady=5)
 
+        button_tiles = tk.Button(load_frame, text="Mapa por Teselas",
+                                 command=lambda: abrir_mapa_teselas(self))
+        button_tiles.grid(row=0, column=2, padx=5, pady=5)
+
         analysis_frame = tk.LabelFrame(self.main_frame, text="Análisis de Espacio Aéreo")
         analysis_frame.pack(fill="x", pady=5)
 
@@ -567,13 +682,32 @@ class AplicacionNavegacionEspacioAereo(tk.Tk):
         self.status = tk.Label(self.main_frame, text="Listo", bd=1, relief=tk.SUNKEN, anchor=tk.W)
         self.status.pack(side=tk.BOTTOM, fill=tk.X)
 
+        self.mapa = None  # MapView de la ventana del mapa abierta
+        self.ejecutor = ThreadPoolExecutor(max_workers=1)  # Hilo de las consultas de vecinos y rutas
+        self.consulta = None  # SearchStats de la consulta en curso
+        self.ventana_mapa = None
+
         global espacio_aereo
         espacio_aereo = None
 
 
 def main():
-    app = AplicacionNavegacionEspacioAereo()
-    app.mainloop()
+    # AIRSPACE_PROFILE=fichero.prof guarda un perfil de cProfile del hilo de la interfaz, y
+    # AIRSPACE_TRACE=fichero.json las cargas, búsquedas y dibujos como trace events
+    ruta_traza = os.environ.get("AIRSPACE_TRACE")
+    if ruta_traza:
+        start_trace()
+    try:
+        app = AplicacionNavegacionEspacioAereo()
+        ruta_perfil = os.environ.get("AIRSPACE_PROFILE")
+        if ruta_perfil:
+            with profile_to(ruta_perfil):
+                app.mainloop()
+        else:
+            app.mainloop()
+    finally:
+        if ruta_traza:
+            write_trace(stop_trace(), ruta_traza)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,67 @@
+import os
+
+
+class LoadCancelled(Exception):
+    pass
+
+
+class LoadProgress:
+    # Shared between a loading thread and whoever watches it: bytes read per file and a
+    # cancel flag the loaders check between blocks of lines
+    def __init__(self):
+        self.files = {}  # path -> [bytes read, file size in bytes]
+        self.stage = None  # What the loader is doing once files are read, see set_stage
+        self.cancelled = False
+
+
+def start_file(progress, path):
+    if progress is not None:
+        progress.files[path] = [0, os.path.getsize(path)]
+
+
+def set_file_read(progress, path, position):
+    # position: bytes of path read so far, e.g. f.buffer.tell() of a text file
+    if progress is not None:
+        progress.files[path][0] = position
+
+
+def finish_file(progress, path):
+    if progress is not None:
+        progress.files[path][0] = progress.files[path][1]
+
+
+def set_stage(progress, stage):
+    # stage: "points", "segments", "airports" or "snapshot"; also a cancel point
+    check_cancelled(progress)
+    if progress is not None:
+        progress.stage = stage
+
+
+def check_cancelled(progress):
+    # Raises LoadCancelled once cancel_load has been called
+    if progress is not None and progress.cancelled:
+        raise LoadCancelled()
+
+
+def cancel_load(progress):
+    progress.cancelled = True
+
+
+def progress_fraction(progress):
+    # Share of the bytes of every started file read so far, 0 to 1
+    done = sum(min(read, size) for read, size in progress.files.values())
+    total = sum(size for _, size in progress.files.values())
+    return done / total if total else 0.0
+
+
+def read_text(path, progress=None, block_size=1 << 20):
+    # Whole text of path, read in blocks so progress is reported and cancel is honored
+    start_file(progress, path)
+    blocks = []
+    with open(path, 'r') as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            check_cancelled(progress)
+            blocks.append(block)
+            set_file_read(progress, path, f.buffer.tell())
+    finish_file(progress, path)
+    return "".join(blocks)
@@ -1,4 +1,12 @@
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+
 class NavPoint:
+    __slots__ = ("number", "name", "latitude", "longitude")
+
     def __init__(self, number, name, latitude, longitude):
         self.number = number
         self.name = name
@@ -6,6 +14,176 @@ class NavPoint:
         self.longitude = longitude
 
 
+class NavPointStore:
+    # Struct-of-arrays storage, row i holds one point. Number -> row lookups use
+    # sorted index arrays plus a small dict of rows added since the last re-sort.
+    def __init__(self, capacity=64):
+        self.numbers = np.empty(capacity, dtype=np.int64)
+        self.latitudes = np.empty(capacity, dtype=np.float64)
+        self.longitudes = np.empty(capacity, dtype=np.float64)
+        self.names = []  # Interned names, one per row
+        self.count = 0
+        self.sorted_numbers = np.empty(0, dtype=np.int64)
+        self.sorted_rows = np.empty(0, dtype=np.int64)
+        self.recent_rows = {}  # number -> row, not yet in sorted_numbers
+
+
+class StoredNavPoint:
+    # Lightweight view of one NavPointStore row; reads and writes go to the store
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def number(self):
+        return int(self.store.numbers[self.row])
+
+    @property
+    def name(self):
+        return self.store.names[self.row]
+
+    @name.setter
+    def name(self, value):
+        self.store.names[self.row] = sys.intern(value)
+
+    @property
+    def latitude(self):
+        return float(self.store.latitudes[self.row])
+
+    @latitude.setter
+    def latitude(self, value):
+        self.store.latitudes[self.row] = value
+
+    @property
+    def longitude(self):
+        return float(self.store.longitudes[self.row])
+
+    @longitude.setter
+    def longitude(self, value):
+        self.store.longitudes[self.row] = value
+
+
+class NavPointMap(Mapping):
+    # Dict-like access (number -> NavPoint) over a NavPointStore; views are created on demand
+    def __init__(self, store=None):
+        self.store = store if store is not None else NavPointStore()
+
+    def __getitem__(self, number):
+        row = find_row(self.store, number)
+        if row is None:
+            raise KeyError(number)
+        return StoredNavPoint(self.store, row)
+
+    def __setitem__(self, number, navpoint):
+        store_point(self.store, number, navpoint.name, navpoint.latitude, navpoint.longitude)
+
+    def __contains__(self, number):
+        return find_row(self.store, number) is not None
+
+    def __iter__(self):
+        return iter(self.store.numbers[:self.store.count].tolist())
+
+    def __len__(self):
+        return self.store.count
+
+    def get(self, number, default=None):
+        row = find_row(self.store, number)
+        if row is None:
+            return default
+        return StoredNavPoint(self.store, row)
+
+
+def reserve_rows(store, count):
+    if count <= len(store.numbers):
+        return
+    capacity = max(count, 2 * len(store.numbers))
+    for field in ("numbers", "latitudes", "longitudes"):
+        old = getattr(store, field)
+        new = np.empty(capacity, dtype=old.dtype)
+        new[:store.count] = old[:store.count]
+        setattr(store, field, new)
+
+
+def reindex_rows(store):
+    numbers = store.numbers[:store.count]
+    order = np.argsort(numbers, kind="stable")
+    store.sorted_numbers = numbers[order]
+    store.sorted_rows = order
+    store.recent_rows = {}
+
+
+def find_row(store, number):
+    row = store.recent_rows.get(number)
+    if row is not None:
+        return row
+
+    i = int(np.searchsorted(store.sorted_numbers, number))
+    if i < len(store.sorted_numbers) and store.sorted_numbers[i] == number:
+        return int(store.sorted_rows[i])
+    return None
+
+
+def find_rows(store, numbers):
+    # Vectorized find_row: array of rows, -1 where the number is not stored
+    if store.recent_rows:
+        reindex_rows(store)
+    numbers = np.asarray(numbers, dtype=np.int64)
+    if len(store.sorted_numbers) == 0:
+        return np.full(len(numbers), -1, dtype=np.int64)
+
+    positions = np.minimum(np.searchsorted(store.sorted_numbers, numbers), len(store.sorted_numbers) - 1)
+    return np.where(store.sorted_numbers[positions] == numbers, store.sorted_rows[positions], -1)
+
+
+def store_point(store, number, name, latitude, longitude):
+    row = find_row(store, number)
+    if row is None:
+        row = store.count
+        reserve_rows(store, row + 1)
+        store.recent_rows[number] = row
+        store.names.append(sys.intern(name))
+        store.numbers[row] = number
+        store.count += 1
+        if len(store.recent_rows) > max(256, len(store.sorted_numbers) // 4):
+            reindex_rows(store)
+    else:
+        store.names[row] = sys.intern(name)
+
+    store.latitudes[row] = latitude
+    store.longitudes[row] = longitude
+    return row
+
+
+def store_points(store, numbers, names, latitudes, longitudes):
+    # Bulk store_point. Columns are copied in one go when the numbers are new and
+    # distinct; otherwise rows are stored one by one so overwrites keep their row.
+    numbers = np.asarray(numbers, dtype=np.int64)
+    ordered = np.sort(numbers)
+    if (ordered[1:] == ordered[:-1]).any() or (find_rows(store, numbers) >= 0).any():
+        for number, name, latitude, longitude in zip(numbers.tolist(), names, latitudes, longitudes):
+            store_point(store, number, name, latitude, longitude)
+        return
+
+    start = store.count
+    end = start + len(numbers)
+    reserve_rows(store, end)
+    store.numbers[start:end] = numbers
+    store.latitudes[start:end] = latitudes
+    store.longitudes[start:end] = longitudes
+    store.names.extend(map(sys.intern, names))
+    store.count = end
+    reindex_rows(store)
+
+
+def get_coordinate_arrays(store):
+    # (numbers, latitudes, longitudes) views of the used rows, no copy
+    return (store.numbers[:store.count],
+            store.latitudes[:store.count],
+            store.longitudes[:store.count])
+
+
 def navpoint_to_str(navpoint):
     return f"{navpoint.name}: ({navpoint.latitude}, {navpoint.longitude})"
 
@@ -1,10 +1,111 @@
+from collections.abc import Sequence
+
+import numpy as np
+
+
 class NavSegment:
+    __slots__ = ("origin_number", "destination_number", "distance")
+
     def __init__(self, origin_number, destination_number, distance):
         self.origin_number = origin_number
         self.destination_number = destination_number
         self.distance = distance
 
 
+class NavSegmentStore:
+    # Struct-of-arrays storage, row i holds one segment in load order
+    def __init__(self, capacity=64):
+        self.origins = np.empty(capacity, dtype=np.int64)
+        self.destinations = np.empty(capacity, dtype=np.int64)
+        self.distances = np.empty(capacity, dtype=np.float64)
+        self.count = 0
+
+
+class StoredNavSegment:
+    # Lightweight view of one NavSegmentStore row
+    __slots__ = ("store", "row")
+
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    @property
+    def origin_number(self):
+        return int(self.store.origins[self.row])
+
+    @property
+    def destination_number(self):
+        return int(self.store.destinations[self.row])
+
+    @property
+    def distance(self):
+        return float(self.store.distances[self.row])
+
+
+class NavSegmentList(Sequence):
+    # List-like access to a NavSegmentStore; views are created on demand
+    def __init__(self, store=None):
+        self.store = store if store is not None else NavSegmentStore()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [StoredNavSegment(self.store, row) for row in range(*index.indices(self.store.count))]
+        if index < 0:
+            index += self.store.count
+        if not 0 <= index < self.store.count:
+            raise IndexError("segment index out of range")
+        return StoredNavSegment(self.store, index)
+
+    def __iter__(self):
+        store = self.store
+        for row in range(store.count):
+            yield StoredNavSegment(store, row)
+
+    def __len__(self):
+        return self.store.count
+
+    def append(self, navsegment):
+        store_segment(self.store, navsegment.origin_number, navsegment.destination_number,
+                      navsegment.distance)
+
+
+def reserve_segment_rows(store, count):
+    if count <= len(store.origins):
+        return
+    capacity = max(count, 2 * len(store.origins))
+    for field in ("origins", "destinations", "distances"):
+        old = getattr(store, field)
+        new = np.empty(capacity, dtype=old.dtype)
+        new[:store.count] = old[:store.count]
+        setattr(store, field, new)
+
+
+def store_segment(store, origin_number, destination_number, distance):
+    row = store.count
+    reserve_segment_rows(store, row + 1)
+    store.origins[row] = origin_number
+    store.destinations[row] = destination_number
+    store.distances[row] = distance
+    store.count = row + 1
+    return row
+
+
+def store_segments(store, origins, destinations, distances):
+    count = store.count + len(origins)
+    reserve_segment_rows(store, count)
+    store.origins[store.count:count] = origins
+    store.destinations[store.count:count] = destinations
+    store.distances[store.count:count] = distances
+    store.count = count
+
+
+def get_segment_arrays(store):
+    # (origins, destinations, distances) views of the used rows, no copy
+    return (store.origins[:store.count],
+            store.destinations[:store.count],
+            store.distances[:store.count])
+
+
 def navsegment_to_str(navsegment):
     return f"Segment: {navsegment.origin_number} -> {navsegment.destination_number}, Distance: {navsegment.distance} km"
 
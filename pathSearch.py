@@ -0,0 +1,245 @@
+import heapq
+
+SEARCH_METHODS = ("dijkstra", "astar", "bidirectional", "bidirectional_astar")
+
+
+class SearchCancelled(Exception):
+    pass
+
+
+class SearchStats:
+    def __init__(self):
+        self.method = None
+        self.settled = 0  # Nodes expanded (forward + backward for bidirectional searches)
+        self.pops = 0  # Heap entries popped, settled plus stale
+        self.stale = 0  # Popped entries skipped because a shorter distance was already found
+        self.pushes = 0  # Heap entries added by edge relaxations (start entries excluded)
+        self.relaxed = 0  # Edges examined from settled nodes
+        self.cancelled = False  # Set from another thread to stop the search with SearchCancelled
+
+
+def _count(stats, pops, stale, pushes, relaxed):
+    # The loops count in locals and add them up once, so the counters cost next to nothing
+    stats.pops += pops
+    stats.stale += stale
+    stats.pushes += pushes
+    stats.relaxed += relaxed
+
+
+def _reconstruct(previous, node):
+    path = []
+    while node is not None:
+        path.append(node)
+        node = previous[node]
+    path.reverse()
+    return path
+
+
+def _path_cost(neighbors, path):
+    # Sum the edges in path order so every method reports bit-identical costs
+    total = 0
+    for u, v in zip(path, path[1:]):
+        for neighbor, weight in neighbors(u):
+            if neighbor == v:
+                total += weight
+                break
+    return total
+
+
+def _unidirectional(neighbors, start, end, heuristic, stats):
+    distances = {start: 0}
+    previous = {start: None}
+    priority_queue = [(heuristic(start), 0, start)]
+    pops = stale = pushes = relaxed = 0
+
+    while priority_queue:
+        if stats.cancelled:
+            _count(stats, pops, stale, pushes, relaxed)
+            raise SearchCancelled()
+        _, current_distance, current_node = heapq.heappop(priority_queue)
+        pops += 1
+
+        if current_distance > distances[current_node]:
+            stale += 1
+            continue
+
+        stats.settled += 1
+        if current_node == end:
+            break
+
+        for neighbor, segment_distance in neighbors(current_node):
+            distance = current_distance + segment_distance
+            relaxed += 1
+
+            if distance < distances.get(neighbor, float('infinity')):
+                distances[neighbor] = distance
+                previous[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance + heuristic(neighbor), distance, neighbor))
+                pushes += 1
+
+    _count(stats, pops, stale, pushes, relaxed)
+    if end not in distances:
+        return []
+    return _reconstruct(previous, end)
+
+
+def _bidirectional(neighbors, start, end, potential, stats):
+    # Forward keys are g + potential, backward keys g - potential (average potentials),
+    # so the search can stop once the two queue minima add up to the best meeting cost.
+    distances = ({start: 0}, {end: 0})
+    previous = ({start: None}, {end: None})
+    queues = ([(potential(start), 0, start)], [(-potential(end), 0, end)])
+    signs = (1, -1)
+
+    best = float('infinity')
+    meeting = None
+    pops = stale = pushes = relaxed = 0
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best:
+            break
+
+        if stats.cancelled:
+            _count(stats, pops, stale, pushes, relaxed)
+            raise SearchCancelled()
+        side = 0 if len(queues[0]) <= len(queues[1]) else 1
+        _, current_distance, current_node = heapq.heappop(queues[side])
+        pops += 1
+
+        if current_distance > distances[side][current_node]:
+            stale += 1
+            continue
+
+        stats.settled += 1
+        own_distances = distances[side]
+        other_distances = distances[1 - side]
+
+        for neighbor, segment_distance in neighbors(current_node):
+            distance = current_distance + segment_distance
+            relaxed += 1
+
+            if distance < own_distances.get(neighbor, float('infinity')):
+                own_distances[neighbor] = distance
+                previous[side][neighbor] = current_node
+                heapq.heappush(queues[side], (distance + signs[side] * potential(neighbor), distance, neighbor))
+                pushes += 1
+
+            other = other_distances.get(neighbor)
+            if other is not None and distance + other < best:
+                best = distance + other
+                meeting = (current_node, neighbor) if side == 0 else (neighbor, current_node)
+
+    _count(stats, pops, stale, pushes, relaxed)
+    if meeting is None:
+        return []
+
+    forward_node, backward_node = meeting
+    path = _reconstruct(previous[0], forward_node)
+    backward_path = _reconstruct(previous[1], backward_node)
+    backward_path.reverse()
+    if path[-1] == backward_path[0]:
+        backward_path = backward_path[1:]
+    return path + backward_path
+
+
+class ShortestPathTree:
+    # Resumable Dijkstra from one or more sources (all at distance 0). to_node/to_number
+    # translate between the caller's ids (NavPoint numbers) and the nodes neighbors() works on.
+    def __init__(self, neighbors, sources, to_node=None, to_number=None):
+        self.neighbors = neighbors
+        self.sources = list(dict.fromkeys(sources))
+        self.distances = {source: 0 for source in self.sources}
+        self.previous = {source: None for source in self.sources}
+        self.settled = set()
+        self.queue = sorted((0, source) for source in self.sources)
+        self.to_node = to_node if to_node is not None else (lambda number: number)
+        self.to_number = to_number if to_number is not None else (lambda node: node)
+
+
+def grow_tree(tree, end=None, stats=None):
+    # Continues the search until end is settled, or every reachable node when end is
+    # None. Settled nodes are final, so the tree can be resumed for any later target,
+    # also after a SearchCancelled raised because stats.cancelled was set.
+    # Returns whether end is settled.
+    if end is not None and end in tree.settled:
+        return True
+
+    distances = tree.distances
+    previous = tree.previous
+    settled = tree.settled
+    priority_queue = tree.queue
+    pops = stale = pushes = relaxed = 0
+
+    while priority_queue:
+        if stats is not None and stats.cancelled:
+            _count(stats, pops, stale, pushes, relaxed)
+            raise SearchCancelled()
+        current_distance, current_node = heapq.heappop(priority_queue)
+        pops += 1
+
+        if current_distance > distances[current_node]:
+            stale += 1
+            continue
+
+        settled.add(current_node)
+
+        for neighbor, segment_distance in tree.neighbors(current_node):
+            distance = current_distance + segment_distance
+            relaxed += 1
+
+            if distance < distances.get(neighbor, float('infinity')):
+                distances[neighbor] = distance
+                previous[neighbor] = current_node
+                heapq.heappush(priority_queue, (distance, neighbor))
+                pushes += 1
+
+        if current_node == end:
+            break
+
+    if stats is not None:
+        stats.method = "dijkstra"
+        stats.settled += pops - stale
+        _count(stats, pops, stale, pushes, relaxed)
+    return end is None or end in settled
+
+
+def tree_path(tree, end):
+    # (path, cost) in tree nodes, ([], 0) unless end is settled
+    if end not in tree.settled:
+        return [], 0
+    return _reconstruct(tree.previous, end), tree.distances[end]
+
+
+def shortest_path(neighbors, start, end, method="dijkstra", lower_bound=None, stats=None):
+    # neighbors(node) yields (node, weight); lower_bound(u, v) must never exceed the
+    # true distance between u and v and is required by the A* methods.
+    # Returns (path, cost), ([], 0) when end cannot be reached.
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"Unknown search method '{method}', expected one of {SEARCH_METHODS}")
+    if method.endswith("astar") and lower_bound is None:
+        raise ValueError(f"Search method '{method}' needs a lower_bound function")
+
+    if stats is None:
+        stats = SearchStats()
+    stats.method = method
+
+    if method == "dijkstra":
+        path = _unidirectional(neighbors, start, end, lambda node: 0, stats)
+    elif method == "astar":
+        path = _unidirectional(neighbors, start, end, lambda node: lower_bound(node, end), stats)
+    elif method == "bidirectional":
+        path = _bidirectional(neighbors, start, end, lambda node: 0, stats)
+    else:
+        cache = {}
+
+        def potential(node):
+            value = cache.get(node)
+            if value is None:
+                value = cache[node] = (lower_bound(node, end) - lower_bound(start, node)) / 2
+            return value
+
+        path = _bidirectional(neighbors, start, end, potential, stats)
+
+    if not path:
+        return [], 0
+    return path, _path_cost(neighbors, path)
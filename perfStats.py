@@ -0,0 +1,77 @@
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import threading
+import time
+
+active_trace = None  # TraceRecorder between start_trace and stop_trace; instrumented code checks it once per call
+
+
+class TraceRecorder:
+    # Complete events in the Chrome trace-event format, viewable in Perfetto or chrome://tracing
+    def __init__(self):
+        self.events = []
+        self.origin = time.perf_counter()
+
+
+class LoadTimings:
+    # Filled by load_from_files(..., timings=LoadTimings())
+    def __init__(self):
+        self.phases = {}  # "nav.sniff", "nav.parse", "nav.construct", "seg.*", "aer.*" -> seconds
+        self.lines = {}  # "nav", "seg", "aer" -> lines read
+
+
+def add_phase(timings, name, seconds):
+    timings.phases[name] = timings.phases.get(name, 0.0) + seconds
+
+
+def start_trace():
+    global active_trace
+    active_trace = TraceRecorder()
+    return active_trace
+
+
+def stop_trace():
+    global active_trace
+    recorder, active_trace = active_trace, None
+    return recorder
+
+
+def trace_event(name, start, end, **args):
+    # Records a span measured with time.perf_counter; does nothing unless a trace is active
+    recorder = active_trace
+    if recorder is None:
+        return
+    recorder.events.append({"name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                            "ts": (start - recorder.origin) * 1e6, "dur": (end - start) * 1e6, "args": args})
+
+
+def trace_search(name, start, stats, before, **args):
+    # Records a search that started at start, with how much each SearchStats counter
+    # grew since before = stats_dict(stats), so callers may keep accumulating in stats
+    counters = {key: value - before[key] for key, value in vars(stats).items()
+                if isinstance(value, int) and not isinstance(value, bool)}
+    trace_event(name, start, time.perf_counter(), method=stats.method, **counters, **args)
+
+
+def write_trace(recorder, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": recorder.events, "displayTimeUnit": "ms"}, f)
+
+
+def stats_dict(stats):
+    # Plain dict of a SearchStats, LoadTimings or RenderStats, for logging or JSON
+    return {key: dict(value) if isinstance(value, dict) else value for key, value in vars(stats).items()}
+
+
+@contextmanager
+def profile_to(path):
+    # Runs the block under cProfile and writes pstats data to path (read it with pstats or snakeviz)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
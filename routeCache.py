@@ -0,0 +1,317 @@
+from collections import OrderedDict
+import heapq
+import math
+import time
+
+from navSegment import get_segment_arrays
+from airSpace import calculate_distance, get_heuristic_scale, multi_source_tree, route_from_tree, search_space
+from pathSearch import SearchStats
+from perfStats import stats_dict, trace_event, trace_search
+import perfStats
+
+COST_MODELS = ("distance",)  # Segment distance is the only edge cost find_shortest_path supports
+
+
+class RouteCache:
+    def __init__(self, max_routes=4096, max_trees=32):
+        self.max_routes = max_routes
+        self.max_trees = max_trees
+        self.routes = OrderedDict()  # (start, end, cost model) -> (path tuple, distance), LRU order
+        self.trees = OrderedDict()  # (start, cost model) -> ShortestPathTree, LRU order
+        self.version = None  # AirSpace.version the cached results belong to
+        self.hits = 0  # Answered from a stored route
+        self.tree_hits = 0  # Answered by resuming a stored tree from the same origin
+        self.misses = 0  # Needed a new search
+        self.evictions = 0  # Routes and trees dropped to stay within the bounds
+        self.invalidations = 0  # Times the cache was emptied because the graph changed
+        self.graph = None  # AirSpace.graph the trees search, trees over another backend cannot be repaired
+        self.closures_applied = 0  # Entries of AirSpace.closure_log the cached results reflect
+        self.trees_repaired = 0  # Trees patched by apply_closures instead of searched again
+        self.trees_reset = 0  # Trees apply_closures sent back to their sources, most of them being affected
+        self.routes_invalidated = 0  # Routes dropped by apply_closures because a closure may change them
+
+
+def get_route_cache(airspace):
+    if airspace.route_cache is None:
+        airspace.route_cache = RouteCache()
+    return airspace.route_cache
+
+
+def clear_route_cache(cache):
+    if cache.routes or cache.trees:
+        cache.invalidations += 1
+    cache.routes.clear()
+    cache.trees.clear()
+
+
+def _sync_cache(airspace, cache):
+    # Empties the cache after a graph change, then brings it up to date with the closures
+    if cache.version != airspace.version or cache.graph is not airspace.graph:
+        clear_route_cache(cache)
+        cache.version = airspace.version
+        cache.graph = airspace.graph
+        cache.closures_applied = len(airspace.closure_log)
+    if cache.closures_applied != len(airspace.closure_log):
+        apply_closures(airspace)
+
+
+def _remember(cache, table, key, value, bound):
+    table[key] = value
+    table.move_to_end(key)
+    while len(table) > bound:
+        table.popitem(last=False)
+        cache.evictions += 1
+
+
+def find_shortest_path_cached(airspace, start_number, end_number, cost_model="distance", stats=None):
+    # find_shortest_path through the airspace's RouteCache. Results are dropped as
+    # soon as airspace.version changes, i.e. after any add_navpoint/add_navsegment,
+    # and repaired by apply_closures after closures and distance changes.
+    # Setting stats.cancelled stops the search with pathSearch.SearchCancelled; the
+    # partly grown tree stays cached and is resumed by the next query from start_number.
+    # While a perfStats trace is active every search (not the stored-route hits) is recorded.
+    if cost_model not in COST_MODELS:
+        raise ValueError(f"Unknown cost model '{cost_model}', expected one of {COST_MODELS}")
+
+    if start_number not in airspace.navpoints or end_number not in airspace.navpoints:
+        return [], 0
+
+    cache = get_route_cache(airspace)
+    _sync_cache(airspace, cache)
+
+    key = (start_number, end_number, cost_model)
+    route = cache.routes.get(key)
+    if route is not None:
+        cache.routes.move_to_end(key)
+        cache.hits += 1
+        return list(route[0]), route[1]
+
+    traced = perfStats.active_trace is not None
+    if traced:
+        start = time.perf_counter()
+        stats = stats if stats is not None else SearchStats()
+        before = stats_dict(stats)
+
+    tree_key = (start_number, cost_model)
+    tree = cache.trees.get(tree_key)
+    resumed = tree is not None
+    if resumed:
+        cache.trees.move_to_end(tree_key)
+        cache.tree_hits += 1
+    else:
+        cache.misses += 1
+        tree = multi_source_tree(airspace, [start_number])
+        _remember(cache, cache.trees, tree_key, tree, cache.max_trees)
+
+    path, distance = route_from_tree(tree, end_number, stats)
+    if traced:
+        trace_search("find_shortest_path_cached", start, stats, before, origin=start_number,
+                     destination=end_number, resumed=resumed)
+    _remember(cache, cache.routes, key, (tuple(path), distance), cache.max_routes)
+    return path, distance
+
+
+def route_cache_stats(airspace):
+    cache = get_route_cache(airspace)
+    return {
+        "routes": len(cache.routes),
+        "trees": len(cache.trees),
+        "hits": cache.hits,
+        "tree_hits": cache.tree_hits,
+        "misses": cache.misses,
+        "evictions": cache.evictions,
+        "invalidations": cache.invalidations,
+        "trees_repaired": cache.trees_repaired,
+        "trees_reset": cache.trees_reset,
+        "routes_invalidated": cache.routes_invalidated,
+    }
+
+
+def _route_affected(path, distance, cut_points, cut_pairs, shortcuts, bound):
+    # Whether a cached route may change: it uses a closed or longer connection, or a
+    # shorter or reopened one could beat it even at the great-circle lower bound
+    if not path:
+        return bool(shortcuts)  # Only something reopened or shortened can make a route appear
+    if any(number in cut_points for number in path) or any(pair in cut_pairs for pair in zip(path, path[1:])):
+        return True
+    start, end = path[0], path[-1]
+    return any(min(bound(start, a) + bound(b, end), bound(start, b) + bound(a, end)) + weight < distance
+               for a, b, weight in shortcuts)
+
+
+def _best_settled(neighbors, distances, settled, node):
+    # (distance, previous) for node from its settled neighbors, (inf, None) without any
+    best = math.inf
+    via = None
+    for neighbor, weight in neighbors(node):
+        if neighbor in settled and distances[neighbor] + weight < best:
+            best = distances[neighbor] + weight
+            via = neighbor
+    return best, via
+
+
+def _repair_tree(tree, neighbors, base_neighbors, cut_nodes, cut_edges, shortcuts, touched, closed, longest):
+    # Patches a ShortestPathTree after closures (cut_nodes, cut_edges) and reopened or
+    # shortened connections (shortcuts, (node, node, distance)) instead of searching
+    # again. Settled nodes whose distance may change lose their settled state: the
+    # subtrees below cut connections, and every node farther than the nearest
+    # shortcut could reach (longest is the longest connection). The tentative
+    # distances around them are then recomputed from the settled nodes left.
+    # Returns "unaffected", "repaired", or "reset" when most of the tree had to go.
+    tree.neighbors = neighbors
+    distances = tree.distances
+    previous = tree.previous
+    settled = tree.settled
+    queue = tree.queue
+
+    roots = [node for node in cut_nodes if node in distances]
+    roots += [b for a, b in cut_edges if previous.get(b) == a] + [a for a, b in cut_edges if previous.get(a) == b]
+    far = []
+    if shortcuts:
+        # Lower bounds of the distances before the changes: exact when settled, at
+        # least the smallest tentative distance otherwise
+        while queue and (queue[0][1] in settled or queue[0][0] > distances[queue[0][1]]):
+            heapq.heappop(queue)
+        frontier = queue[0][0] if queue else math.inf
+        bound = lambda node: distances[node] if node in settled else frontier
+        reach = min(min(bound(a), bound(b)) + weight for a, b, weight in shortcuts)
+        far = [node for node in settled if distances[node] > reach]
+        if 2 * len(far) > len(settled):
+            # Most of the tree would go: start again from the sources, grown on demand
+            sources = [source for source in tree.sources if source not in closed]
+            tree.distances = {source: 0 for source in sources}
+            tree.previous = {source: None for source in sources}
+            tree.settled = set()
+            tree.queue = [(0, source) for source in sources]
+            return "reset"
+    touched = {node for node in touched if node not in settled}
+    if not roots and not far and not touched:
+        return "unaffected"
+
+    # Subtrees below the cuts; a node's children are the neighbors it is previous of,
+    # also across closed connections
+    removed = set()
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        if node not in removed:
+            removed.add(node)
+            stack.extend(neighbor for neighbor, _ in base_neighbors(node) if previous.get(neighbor) == node)
+    for node in removed:
+        distances.pop(node, None)
+        previous.pop(node, None)
+        settled.discard(node)
+
+    if far:
+        # Everything beyond reach goes; what lies past it is only reachable through the
+        # settled nodes within one connection of reach, so those are relaxed again
+        for node in far:
+            if node in settled:
+                settled.discard(node)
+                del distances[node]
+                del previous[node]
+        for node in [node for node, distance in distances.items() if distance > reach and node not in settled]:
+            del distances[node]
+            del previous[node]
+        for node in [node for node in settled if distances[node] > reach - longest]:
+            distance = distances[node]
+            for neighbor, weight in neighbors(node):
+                if neighbor not in settled and distance + weight < distances.get(neighbor, math.inf):
+                    distances[neighbor] = distance + weight
+                    previous[neighbor] = node
+
+    recomputed = {node for node in removed | touched if node not in settled}
+    for node in recomputed:
+        best, via = _best_settled(neighbors, distances, settled, node)
+        if via is None:
+            distances.pop(node, None)
+            previous.pop(node, None)
+        else:
+            distances[node] = best
+            previous[node] = via
+    for source in tree.sources:
+        if source not in closed and source not in settled:
+            distances[source] = 0
+            previous[source] = None
+            recomputed.add(source)
+
+    if far:
+        queue = [(distance, node) for node, distance in distances.items() if node not in settled]
+    else:
+        queue = [entry for entry in queue if entry[1] not in recomputed]
+        queue.extend((distances[node], node) for node in recomputed if node in distances)
+    heapq.heapify(queue)
+    tree.queue = queue
+    return "repaired"
+
+
+def apply_closures(airspace):
+    # Brings the RouteCache up to date with the closures and distance changes made
+    # since it was last used (find_shortest_path_cached calls it). Stored trees are
+    # repaired, and only the routes a change may affect are dropped. Returns the
+    # counts for this call: changes, routes_invalidated, routes_kept, trees_repaired,
+    # trees_reset (searched again from scratch on demand) and trees_unaffected.
+    cache = get_route_cache(airspace)
+    changes = airspace.closure_log[cache.closures_applied:]
+    counts = {"changes": len(changes), "routes_invalidated": 0, "routes_kept": 0,
+              "trees_repaired": 0, "trees_reset": 0, "trees_unaffected": 0}
+    if cache.version != airspace.version or cache.graph is not airspace.graph:
+        _sync_cache(airspace, cache)  # Nothing cached survives a graph change
+        return counts
+    cache.closures_applied = len(airspace.closure_log)
+    if not changes:
+        return counts
+    start = time.perf_counter()
+
+    # The changes as closed points, closed or longer connections and reopened or shorter ones
+    neighbors, to_node, to_number = search_space(airspace)
+    base_neighbors = search_space(airspace, closures=False)[0]
+    cut_points = set()
+    cut_pairs = set()
+    shortcuts = []
+    touched = set()
+    for kind, subject, before, after in changes:
+        if kind == "point":
+            node = to_node(subject)
+            if after:
+                cut_points.add(subject)
+            elif node is not None:
+                touched.add(node)
+                shortcuts.extend((subject, to_number(neighbor), weight) for neighbor, weight in neighbors(node))
+        elif after > before:
+            cut_pairs.update((subject, subject[::-1]))
+        else:
+            shortcuts.append((*subject, after))
+
+    scale = get_heuristic_scale(airspace)
+
+    def bound(number1, number2):
+        point1 = airspace.navpoints.get(number1)
+        point2 = airspace.navpoints.get(number2)
+        if point1 is None or point2 is None:
+            return 0
+        return scale * calculate_distance(airspace, point1, point2)
+
+    for key, (path, distance) in list(cache.routes.items()):
+        if _route_affected(path, distance, cut_points, cut_pairs, shortcuts, bound):
+            del cache.routes[key]
+            counts["routes_invalidated"] += 1
+        else:
+            counts["routes_kept"] += 1
+
+    cut_nodes = {to_node(number) for number in cut_points} - {None}
+    cut_edges = [(to_node(a), to_node(b)) for a, b in cut_pairs]
+    node_shortcuts = [(to_node(a), to_node(b), weight) for a, b, weight in shortcuts]
+    touched.update(node for a, b, _ in node_shortcuts for node in (a, b))
+    closed = {to_node(number) for number in airspace.closed_points} - {None}
+    distances = get_segment_arrays(airspace.navsegments.store)[2]
+    longest = max([float(distances.max()) if len(distances) else 0.0, *airspace.segment_distances.values()])
+    for tree in cache.trees.values():
+        counts["trees_" + _repair_tree(tree, neighbors, base_neighbors, cut_nodes, cut_edges, node_shortcuts,
+                                       touched, closed, longest)] += 1
+
+    cache.routes_invalidated += counts["routes_invalidated"]
+    cache.trees_repaired += counts["trees_repaired"]
+    cache.trees_reset += counts["trees_reset"]
+    trace_event("apply_closures", start, time.perf_counter(), **counts)
+    return counts
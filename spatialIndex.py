@@ -0,0 +1,253 @@
+import math
+
+import numpy as np
+
+from navPoint import find_rows, get_coordinate_arrays
+
+
+class PointGrid:
+    # Uniform latitude/longitude grid over NavPointStore rows. Rows never move in the
+    # store, so a cell only has to change when a point's coordinates do.
+    def __init__(self, cell_degrees=0.5):
+        self.cell_degrees = cell_degrees
+        self.cells = {}  # (latitude cell, longitude cell) -> list of store rows
+
+
+def _cell(grid, latitude, longitude):
+    return math.floor(latitude / grid.cell_degrees), math.floor(longitude / grid.cell_degrees)
+
+
+def build_point_grid(store, cell_degrees=0.5):
+    grid = PointGrid(cell_degrees)
+    _, latitudes, longitudes = get_coordinate_arrays(store)
+    if not len(latitudes):
+        return grid
+
+    keys = np.stack((np.floor(latitudes / cell_degrees), np.floor(longitudes / cell_degrees)), axis=1).astype(np.int64)
+    order = np.lexsort((keys[:, 1], keys[:, 0]))
+    keys = keys[order]
+    starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+    for rows, key in zip(np.split(order, starts), keys[np.concatenate(([0], starts))].tolist()):
+        grid.cells[tuple(key)] = rows.tolist()
+    return grid
+
+
+def grid_insert(grid, row, latitude, longitude):
+    grid.cells.setdefault(_cell(grid, latitude, longitude), []).append(row)
+
+
+def grid_remove(grid, row, latitude, longitude):
+    key = _cell(grid, latitude, longitude)
+    rows = grid.cells.get(key)
+    if rows is not None and row in rows:
+        rows.remove(row)
+        if not rows:
+            del grid.cells[key]
+
+
+def _rows_in_band(grid, store, min_lat, min_lon, max_lat, max_lon):
+    first_row, first_column = _cell(grid, min_lat, min_lon)
+    last_row, last_column = _cell(grid, max_lat, max_lon)
+
+    if (last_row - first_row + 1) * (last_column - first_column + 1) > len(grid.cells):
+        # Box wider than the data: cheaper to walk the occupied cells
+        candidates = [rows for (i, j), rows in grid.cells.items()
+                      if first_row <= i <= last_row and first_column <= j <= last_column]
+    else:
+        candidates = [grid.cells[(i, j)]
+                      for i in range(first_row, last_row + 1)
+                      for j in range(first_column, last_column + 1) if (i, j) in grid.cells]
+
+    rows = np.fromiter((row for cell in candidates for row in cell), dtype=np.int64)
+    latitudes = store.latitudes[rows]
+    longitudes = store.longitudes[rows]
+    inside = (latitudes >= min_lat) & (latitudes <= max_lat) & (longitudes >= min_lon) & (longitudes <= max_lon)
+    return rows[inside]
+
+
+def grid_rows_in_bbox(grid, store, min_lat, min_lon, max_lat, max_lon):
+    # Store rows inside the box, edges included. A box with min_lon > max_lon
+    # crosses the antimeridian.
+    if min_lon <= max_lon:
+        return _rows_in_band(grid, store, min_lat, min_lon, max_lat, max_lon)
+    return np.concatenate((_rows_in_band(grid, store, min_lat, min_lon, max_lat, 180.0),
+                           _rows_in_band(grid, store, min_lat, -180.0, max_lat, max_lon)))
+
+
+def cap_bbox(latitude, longitude, radius_km, earth_radius):
+    # (min_lat, min_lon, max_lat, max_lon) enclosing every point within radius_km of
+    # (latitude, longitude); min_lon > max_lon when the box crosses the antimeridian
+    angle = radius_km / earth_radius
+    min_lat = latitude - math.degrees(angle)
+    max_lat = latitude + math.degrees(angle)
+    if min_lat <= -90.0 or max_lat >= 90.0 or angle >= math.pi / 2:
+        return max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0
+
+    spread = math.degrees(math.asin(min(1.0, math.sin(angle) / math.cos(math.radians(latitude)))))
+    min_lon = longitude - spread
+    max_lon = longitude + spread
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
+    return min_lat, min_lon, max_lat, max_lon
+
+
+class SegmentGrid:
+    # Uniform grid over segment bounding boxes; a segment is listed in every cell its
+    # box overlaps. Segments are straight lines in latitude/longitude, as on the map.
+    def __init__(self, cell_degrees=0.5):
+        self.cell_degrees = cell_degrees
+        self.cells = {}  # (latitude cell, longitude cell) -> list of NavSegmentStore rows
+
+
+def segment_coordinates(point_store, segment_store, rows):
+    # (lat1, lon1, lat2, lon2) of the given segment rows, NaN where an end point is missing
+    ends = []
+    for numbers in (segment_store.origins[rows], segment_store.destinations[rows]):
+        point_rows = find_rows(point_store, numbers)
+        known = point_rows >= 0
+        latitudes = np.where(known, point_store.latitudes[np.where(known, point_rows, 0)], np.nan)
+        longitudes = np.where(known, point_store.longitudes[np.where(known, point_rows, 0)], np.nan)
+        ends.extend((latitudes, longitudes))
+    return tuple(ends)
+
+
+def _add_segment_boxes(grid, rows, lat1, lon1, lat2, lon2):
+    known = ~(np.isnan(lat1) | np.isnan(lat2))
+    rows = rows[known]
+    size = grid.cell_degrees
+    first_i = np.floor(np.minimum(lat1, lat2)[known] / size).astype(np.int64)
+    last_i = np.floor(np.maximum(lat1, lat2)[known] / size).astype(np.int64)
+    first_j = np.floor(np.minimum(lon1, lon2)[known] / size).astype(np.int64)
+    last_j = np.floor(np.maximum(lon1, lon2)[known] / size).astype(np.int64)
+
+    # One (cell, row) entry for every cell of every box
+    widths = last_j - first_j + 1
+    counts = (last_i - first_i + 1) * widths
+    if not counts.sum():
+        return
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+    k = np.arange(counts.sum()) - starts
+    cell_i = np.repeat(first_i, counts) + k // np.repeat(widths, counts)
+    cell_j = np.repeat(first_j, counts) + k % np.repeat(widths, counts)
+    entries = np.repeat(rows, counts)
+
+    order = np.lexsort((entries, cell_j, cell_i))
+    cell_i, cell_j, entries = cell_i[order], cell_j[order], entries[order]
+    breaks = np.flatnonzero((cell_i[1:] != cell_i[:-1]) | (cell_j[1:] != cell_j[:-1])) + 1
+    heads = np.concatenate(([0], breaks))
+    for i, j, cell_rows in zip(cell_i[heads].tolist(), cell_j[heads].tolist(), np.split(entries, breaks)):
+        grid.cells.setdefault((i, j), []).extend(cell_rows.tolist())
+
+
+def build_segment_grid(point_store, segment_store, cell_degrees=0.5):
+    grid = SegmentGrid(cell_degrees)
+    rows = np.arange(segment_store.count)
+    _add_segment_boxes(grid, rows, *segment_coordinates(point_store, segment_store, rows))
+    return grid
+
+
+def segment_grid_insert(grid, point_store, segment_store, row):
+    rows = np.array([row])
+    _add_segment_boxes(grid, rows, *segment_coordinates(point_store, segment_store, rows))
+
+
+def _segment_candidates(grid, min_lat, min_lon, max_lat, max_lon):
+    first_i, first_j = _cell(grid, min_lat, min_lon)
+    last_i, last_j = _cell(grid, max_lat, max_lon)
+    if (last_i - first_i + 1) * (last_j - first_j + 1) > len(grid.cells):
+        candidates = [rows for (i, j), rows in grid.cells.items()
+                      if first_i <= i <= last_i and first_j <= j <= last_j]
+    else:
+        candidates = [grid.cells[(i, j)]
+                      for i in range(first_i, last_i + 1)
+                      for j in range(first_j, last_j + 1) if (i, j) in grid.cells]
+    return np.unique(np.fromiter((row for cell in candidates for row in cell), dtype=np.int64))
+
+
+def _orientation(ax, ay, bx, by, cx, cy):
+    return np.sign((bx - ax) * (cy - ay) - (by - ay) * (cx - ax))
+
+
+def _on_segment(ax, ay, bx, by, cx, cy):
+    # c is collinear with a-b: is it within the segment's box?
+    return (np.minimum(ax, bx) <= cx) & (cx <= np.maximum(ax, bx)) & \
+        (np.minimum(ay, by) <= cy) & (cy <= np.maximum(ay, by))
+
+
+def _segments_intersect(ax, ay, bx, by, cx, cy, dx, dy):
+    # Element-wise test of segments a-b against c-d, touching counts as intersecting
+    o1 = _orientation(ax, ay, bx, by, cx, cy)
+    o2 = _orientation(ax, ay, bx, by, dx, dy)
+    o3 = _orientation(cx, cy, dx, dy, ax, ay)
+    o4 = _orientation(cx, cy, dx, dy, bx, by)
+    return ((o1 != o2) & (o3 != o4)) | \
+        ((o1 == 0) & _on_segment(ax, ay, bx, by, cx, cy)) | \
+        ((o2 == 0) & _on_segment(ax, ay, bx, by, dx, dy)) | \
+        ((o3 == 0) & _on_segment(cx, cy, dx, dy, ax, ay)) | \
+        ((o4 == 0) & _on_segment(cx, cy, dx, dy, bx, by))
+
+
+def _inside_polygon(polygon, x, y):
+    # Even-odd rule; polygon is a list of (x, y) vertices
+    inside = np.zeros(len(x), dtype=bool)
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        inside ^= crosses & (x < x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+    return inside
+
+
+def _crosses_polygon(polygon, ax, ay, bx, by):
+    hit = _inside_polygon(polygon, ax, ay) | _inside_polygon(polygon, bx, by)
+    for (x1, y1), (x2, y2) in zip(polygon, polygon[1:] + polygon[:1]):
+        hit |= _segments_intersect(ax, ay, bx, by, x1, y1, x2, y2)
+    return hit
+
+
+def segment_rows_in_polygon(grid, point_store, segment_store, polygon):
+    # Sorted rows of the segments that touch the polygon, given as (latitude, longitude) vertices
+    latitudes = [latitude for latitude, _ in polygon]
+    longitudes = [longitude for _, longitude in polygon]
+    rows = _segment_candidates(grid, min(latitudes), min(longitudes), max(latitudes), max(longitudes))
+    lat1, lon1, lat2, lon2 = segment_coordinates(point_store, segment_store, rows)
+    vertices = [(longitude, latitude) for latitude, longitude in polygon]
+    return rows[_crosses_polygon(vertices, lon1, lat1, lon2, lat2)]
+
+
+def segment_rows_in_bbox(grid, point_store, segment_store, min_lat, min_lon, max_lat, max_lon):
+    # Sorted rows of the segments that touch the box; min_lon > max_lon crosses the antimeridian
+    if min_lon > max_lon:
+        return np.union1d(segment_rows_in_bbox(grid, point_store, segment_store, min_lat, min_lon, max_lat, 180.0),
+                          segment_rows_in_bbox(grid, point_store, segment_store, min_lat, -180.0, max_lat, max_lon))
+    return segment_rows_in_polygon(grid, point_store, segment_store,
+                                   [(min_lat, min_lon), (min_lat, max_lon), (max_lat, max_lon), (max_lat, min_lon)])
+
+
+def segment_rows_in_circle(grid, point_store, segment_store, latitude, longitude, radius_km, earth_radius):
+    # Sorted rows of the segments passing within radius_km of the position. Distances
+    # use a flat projection centred on it, accurate for radii of a few hundred km.
+    min_lat, min_lon, max_lat, max_lon = cap_bbox(latitude, longitude, radius_km, earth_radius)
+    if min_lon > max_lon:
+        rows = np.union1d(_segment_candidates(grid, min_lat, min_lon, max_lat, 180.0),
+                          _segment_candidates(grid, min_lat, -180.0, max_lat, max_lon))
+    else:
+        rows = _segment_candidates(grid, min_lat, min_lon, max_lat, max_lon)
+    lat1, lon1, lat2, lon2 = segment_coordinates(point_store, segment_store, rows)
+
+    km_per_degree = math.radians(earth_radius)
+    scale = km_per_degree * math.cos(math.radians(latitude))
+    ax = (lon1 - longitude + 180.0) % 360.0 - 180.0
+    bx = (lon2 - longitude + 180.0) % 360.0 - 180.0
+    ax, bx = ax * scale, bx * scale
+    ay = (lat1 - latitude) * km_per_degree
+    by = (lat2 - latitude) * km_per_degree
+
+    # Distance from the centre (the origin) to the closest point of every segment
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    t = np.clip(-(ax * dx + ay * dy) / np.where(length > 0, length, 1.0), 0.0, 1.0)
+    distances = np.hypot(ax + t * dx, ay + t * dy)
+    return rows[distances <= radius_km]
@@ -1,12 +1,57 @@
 from airSpace import AirSpace, load_from_files, get_navpoint_by_number, get_navpoint_by_name, get_navairport_by_name, \
-    find_neighbors, find_shortest_path
+    find_neighbors, find_shortest_path, close_navsegment, reopen_navsegment, set_navsegment_distance, add_navpoint, \
+    find_navpoints_in_bbox, find_navpoints_within_radius, find_nearest_navpoints, get_segment_distance, \
+    add_navsegment, close_navpoint, reopen_navpoint, get_search_distance, find_navpoints_by_prefix, \
+    find_navpoints_fuzzy, find_outgoing, calculate_distance, segment_great_circle_distances, \
+    validate_segment_distances, print_segment_outliers, shortest_path_tree, route_from_tree, \
+    single_source_shortest_paths, find_segments_in_bbox, find_segments_in_circle, find_segments_in_polygon
+from bulkLoader import add_navpoints_bulk
+from navPoint import NavPoint, NavPointMap, find_rows, get_coordinate_arrays, store_points
+from geoDistance import distances_many_to_many, distances_one_to_many, haversine
+from airGraph import build_graph, build_graph_from_arrays, get_index, get_number, graph_neighbors
+from pathSearch import SEARCH_METHODS, SearchCancelled, SearchStats
+from navSegment import NavSegment
+from routeCache import apply_closures, find_shortest_path_cached, get_route_cache, route_cache_stats
+import math
+import random
+import numpy as np
 from navPoint import get_coords, navpoint_to_str
 from navSegment import get_origin_number, get_destination_number, get_distance
-from navAirport import get_sids, get_stars
+from navAirport import add_sid, add_star, get_sids, get_stars
+from airportMatrix import airport_route_matrix, best_procedure_route
+from bulkLoader import load_from_files_bulk
+from batchRouting import route_batch
+from contractionHierarchy import build_hierarchy, hierarchy_path, load_hierarchy, save_hierarchy
+from airspaceCli import main as cli_main
+from airSnapshot import load_from_files_cached, load_snapshot, save_snapshot
+import airSnapshot
+import benchmarkSuite
+from airspaceMerge import merge_airspaces, merge_files
+from airTiles import find_shortest_path_tiled, open_tiles, save_tiles, tile_stats
+from airspaceMap import open_map_view, open_tiled_map_view, refresh_tiled_map, show_overlay
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from matplotlib.path import Path
+import shutil
+import json
+import pytest
 import matplotlib.pyplot as plt
 import os
 
 
+def data_files(prefix):
+    """Paths of the nav, seg and aer files of a data set next to this file, e.g. "Cat"."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return [os.path.join(current_dir, f"{prefix}_{kind}.txt") for kind in ("nav", "seg", "aer")]
+
+
+def load_airspace(prefix):
+    """AirSpace loaded from the data set's text files."""
+    airspace = AirSpace(prefix)
+    assert load_from_files(airspace, *data_files(prefix))
+    return airspace
+
+
 def test_catalonia_airspace():
     """Test loading and processing Catalonia airspace data."""
     # Create an airspace object for Catalonia
@@ -97,6 +142,969 @@ def test_catalonia_airspace():
         plot_shortest_path(catalonia, start_point, end_point)
 
 
+def test_bulk_loader_skips_short_rows(tmp_path):
+    """Rows with missing or extra fields load the same in both loaders."""
+    nav_file = tmp_path / "Test_nav.txt"
+    seg_file = tmp_path / "Test_seg.txt"
+    aer_file = tmp_path / "Test_aer.txt"
+    nav_file.write_text("1 AAA 41.0 2.0 X\n2 BBB 41.1\n3 CCC 41.2 2.2\n")
+    seg_file.write_text("1 3 10.0\n")
+    aer_file.write_text("")
+
+    expected = AirSpace()
+    assert load_from_files(expected, str(nav_file), str(seg_file), str(aer_file))
+    bulk = AirSpace()
+    assert load_from_files_bulk(bulk, str(nav_file), str(seg_file), str(aer_file))
+
+    assert sorted(bulk.navpoints) == sorted(expected.navpoints) == [1, 3]
+    for number in expected.navpoints:
+        assert get_coords(bulk.navpoints[number]) == get_coords(expected.navpoints[number])
+        assert bulk.navpoints[number].name == expected.navpoints[number].name
+
+
+def test_closures_in_batch_routing_and_hierarchies():
+    """route_batch follows closures like find_shortest_path; hierarchy_path refuses them."""
+    catalonia = load_airspace("Cat")
+    hierarchy = build_hierarchy(catalonia)
+    open_path, open_distance = find_shortest_path(catalonia, 13421, 592)
+    assert hierarchy_path(catalonia, hierarchy, 13421, 592)[1] == pytest.approx(open_distance)
+
+    close_navsegment(catalonia, 591, 593)
+    path, distance = find_shortest_path(catalonia, 13421, 592)
+    assert distance > open_distance
+    for workers in (1, 2):
+        [(batch_path, batch_distance)] = route_batch(catalonia, [(13421, 592)], workers=workers)
+        assert batch_path == path
+        assert batch_distance == pytest.approx(distance)
+    with pytest.raises(ValueError):
+        hierarchy_path(catalonia, hierarchy, 13421, 592)
+
+    reopen_navsegment(catalonia, 591, 593)
+    assert hierarchy_path(catalonia, hierarchy, 13421, 592)[1] == pytest.approx(open_distance)
+
+    for distance in (-1.0, float("nan"), float("inf")):
+        with pytest.raises(ValueError):
+            set_navsegment_distance(catalonia, 591, 593, distance)
+    assert not catalonia.segment_distances
+
+
+def test_cli_reports_bad_lines_and_goes_on(tmp_path):
+    """Bad query lines give per-line errors and the following lines are still answered."""
+    queries = tmp_path / "queries.txt"
+    queries.write_text("nearest nan 2\n"
+                       "nearest 41 inf\n"
+                       '{"query": "nearest", "latitude": 41, "longitude": 2, "k": 1e400}\n'
+                       "nearest 41 2 -1\n"
+                       "nearest 41 2 1.5\n"
+                       "route NOWHERE GODOX\n"
+                       "bogus\n"
+                       "nearest 41 2 2\n"
+                       "neighbors GODOX\n")
+    output = tmp_path / "results.jsonl"
+    assert cli_main([*data_files("Cat"), "--no-cache", "--queries", str(queries), "--output", str(output)]) == 0
+
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [result["line"] for result in results] == list(range(1, 10))
+    assert all("error" in result for result in results[:7])
+    assert len(results[7]["points"]) == 2
+    assert results[8]["point"] == "GODOX" and results[8]["points"]
+
+
+def test_grid_queries_match_a_full_scan():
+    """Point grid queries agree with a brute-force scan, across the antimeridian and near the poles."""
+    spain = load_airspace("Spain")
+    find_nearest_navpoints(spain, 40.0, -3.0)  # builds the grid, kept current by add_navpoint below
+    for number, latitude, longitude in ((900001, 10.0, 179.95), (900002, 10.1, -179.95), (900003, 89.9, 0.0),
+                                        (900004, 89.8, 179.0), (900005, -89.9, -120.0)):
+        add_navpoint(spain, NavPoint(number, f"EDGE{number}", latitude, longitude))
+
+    numbers = np.array(list(spain.navpoints))
+    latitudes = np.array([spain.navpoints[number].latitude for number in numbers])
+    longitudes = np.array([spain.navpoints[number].longitude for number in numbers])
+
+    for latitude, longitude, radius in ((40.4, -3.7, 150.0), (41.3, 2.1, 0.0), (10.0, 180.0, 30.0),
+                                        (10.0, -179.9, 30.0), (89.5, 90.0, 100.0), (-89.5, 60.0, 100.0),
+                                        (36.0, -5.0, 2000.0)):
+        distances = haversine(latitude, longitude, latitudes, longitudes)
+        found = find_navpoints_within_radius(spain, latitude, longitude, radius)
+        assert sorted(point.number for point, _ in found) == sorted(numbers[distances <= radius].tolist())
+        assert [distance for _, distance in found] == sorted(distance for _, distance in found)
+
+        nearest = find_nearest_navpoints(spain, latitude, longitude, 3)
+        assert [distance for _, distance in nearest] == pytest.approx(np.sort(distances)[:3].tolist())
+
+    for min_lat, min_lon, max_lat, max_lon in ((36.0, -6.0, 40.0, 0.0), (5.0, 179.0, 15.0, -179.0),
+                                               (89.0, -180.0, 90.0, 180.0), (-90.0, -180.0, 90.0, 180.0)):
+        if min_lon <= max_lon:
+            inside_lon = (longitudes >= min_lon) & (longitudes <= max_lon)
+        else:
+            inside_lon = (longitudes >= min_lon) | (longitudes <= max_lon)
+        inside = inside_lon & (latitudes >= min_lat) & (latitudes <= max_lat)
+        found = find_navpoints_in_bbox(spain, min_lat, min_lon, max_lat, max_lon)
+        assert sorted(point.number for point in found) == sorted(numbers[inside].tolist())
+
+    for bad in (float("nan"), float("inf")):
+        with pytest.raises(ValueError, match="latitude must be finite"):
+            find_nearest_navpoints(spain, bad, 0.0)
+        with pytest.raises(ValueError):
+            find_navpoints_within_radius(spain, 40.0, bad, 10.0)
+        with pytest.raises(ValueError):
+            find_navpoints_in_bbox(spain, 0.0, 0.0, 10.0, bad)
+    with pytest.raises(ValueError):
+        find_navpoints_within_radius(spain, 40.0, -3.0, float("nan"))
+
+
+def test_search_methods_agree():
+    """Every search method finds the same cost, on both graph backends, and paths cost what their segments add up to."""
+    spain = load_airspace("Spain")
+    add_navpoint(spain, NavPoint(900001, "ISLAND", 40.0, -3.0))  # no segments: unreachable from anywhere
+    numbers = sorted(spain.navpoints)
+    rng = random.Random(5)
+    pairs = [tuple(rng.sample(numbers, 2)) for _ in range(150)]
+    pairs += [(900001, numbers[0]), (numbers[0], 900001), (numbers[0], numbers[0])]
+
+    for graph in (None, build_graph(spain)):
+        spain.graph = graph
+        reachable = 0
+        for start, end in pairs:
+            results = [find_shortest_path(spain, start, end, method) for method in SEARCH_METHODS]
+            expected_path, expected_distance = results[0]
+            for path, distance in results:
+                assert distance == pytest.approx(expected_distance)
+                assert bool(path) == bool(expected_path)
+                if path:
+                    assert path[0] == start and path[-1] == end
+                    assert distance == pytest.approx(sum(get_segment_distance(spain, a, b)
+                                                         for a, b in zip(path, path[1:])))
+            reachable += bool(expected_path)
+            if 900001 in (start, end) or start == end:
+                assert expected_path == [] and expected_distance == 0
+        assert reachable > 20
+
+
+class CancelAfter(SearchStats):
+    """SearchStats whose cancelled flag turns on after the search has checked it a number of times."""
+
+    def __init__(self, checks):
+        super().__init__()
+        self.checks = checks
+
+    @property
+    def cancelled(self):
+        self.checks -= 1
+        return self.checks < 0
+
+    @cancelled.setter
+    def cancelled(self, value):
+        pass
+
+
+def test_route_cache_invalidation_eviction_and_resume():
+    """Cached routes follow airspace changes, stay within their bounds and resume cancelled searches."""
+    catalonia = load_airspace("Cat")
+    cache = get_route_cache(catalonia)
+    cache.max_routes = 3
+    cache.max_trees = 2
+
+    # A repeated query is a hit with the same result
+    expected = find_shortest_path(catalonia, 1663, 14920)
+    assert find_shortest_path_cached(catalonia, 1663, 14920) == expected
+    assert find_shortest_path_cached(catalonia, 1663, 14920) == expected
+    assert route_cache_stats(catalonia)["hits"] == 1
+
+    # New segments and points empty the cache
+    add_navsegment(catalonia, NavSegment(1663, 14920, 1.0))
+    assert find_shortest_path_cached(catalonia, 1663, 14920) == ([1663, 14920], 1.0)
+    add_navpoint(catalonia, NavPoint(900001, "SHORT", 41.0, 1.0))
+    add_navsegment(catalonia, NavSegment(1663, 900001, 0.1))
+    add_navsegment(catalonia, NavSegment(900001, 14920, 0.1))
+    assert find_shortest_path_cached(catalonia, 1663, 14920) == ([1663, 900001, 14920], 0.2)
+    assert route_cache_stats(catalonia)["invalidations"] == 2
+
+    # So does switching to the CSR graph backend
+    catalonia.graph = build_graph(catalonia)
+    assert find_shortest_path_cached(catalonia, 1663, 14920) == ([1663, 900001, 14920], pytest.approx(0.2))
+    assert route_cache_stats(catalonia)["invalidations"] == 3
+    assert cache.graph is catalonia.graph
+
+    # Least recently used routes and trees go first
+    numbers = sorted(catalonia.navpoints)
+    pairs = [(numbers[i], numbers[-1 - i]) for i in range(6)]
+    for start, end in pairs:
+        assert find_shortest_path_cached(catalonia, start, end)[1] == \
+            pytest.approx(find_shortest_path(catalonia, start, end)[1])
+    stats = route_cache_stats(catalonia)
+    assert stats["routes"] == 3 and stats["trees"] == 2 and stats["evictions"] > 0
+    assert list(cache.routes) == [(start, end, "distance") for start, end in pairs[-3:]]
+    assert list(cache.trees) == [(start, "distance") for start, _ in pairs[-2:]]
+
+    # A cancelled search keeps its partial tree, and the next query resumes it
+    start, end = 1663, numbers[0]
+    with pytest.raises(SearchCancelled):
+        find_shortest_path_cached(catalonia, start, end, stats=CancelAfter(20))
+    tree = cache.trees[(start, "distance")]
+    assert tree.settled and tree.to_node(end) not in tree.settled
+    tree_hits = route_cache_stats(catalonia)["tree_hits"]
+    assert find_shortest_path_cached(catalonia, start, end)[1] == pytest.approx(find_shortest_path(catalonia, start, end)[1])
+    assert route_cache_stats(catalonia)["tree_hits"] == tree_hits + 1
+
+
+def test_route_cache_follows_closures():
+    """Cached routes match find_shortest_path through random closures, reopenings and distance changes."""
+    for seed, csr in ((1, False), (2, True), (3, False)):
+        catalonia = load_airspace("Cat")
+        if csr:
+            catalonia.graph = build_graph(catalonia)
+        rng = random.Random(seed)
+        numbers = sorted(catalonia.navpoints)
+        segments = [(segment.origin_number, segment.destination_number) for segment in catalonia.navsegments]
+        origins = rng.sample(numbers, 5)
+        for step in range(40):
+            action = rng.random()
+            if action < 0.3:
+                close_navsegment(catalonia, *rng.choice(segments))
+            elif action < 0.45 and catalonia.closed_segments:
+                reopen_navsegment(catalonia, *rng.choice(sorted(catalonia.closed_segments)))
+            elif action < 0.6:
+                close_navpoint(catalonia, rng.choice(numbers))
+            elif action < 0.7 and catalonia.closed_points:
+                reopen_navpoint(catalonia, rng.choice(sorted(catalonia.closed_points)))
+            elif action < 0.85:
+                origin, destination = rng.choice(segments)
+                set_navsegment_distance(catalonia, origin, destination,
+                                        get_segment_distance(catalonia, origin, destination) * rng.choice((0.3, 0.8, 1.5, 3)))
+            elif catalonia.segment_distances:
+                set_navsegment_distance(catalonia, *rng.choice(sorted(catalonia.segment_distances)), None)
+
+            for _ in range(15):
+                start, end = rng.choice(origins), rng.choice(numbers)
+                path, distance = find_shortest_path_cached(catalonia, start, end)
+                expected_path, expected_distance = find_shortest_path(catalonia, start, end)
+                assert distance == pytest.approx(expected_distance)
+                assert bool(path) == bool(expected_path)
+                assert not set(path) & catalonia.closed_points
+                assert distance == pytest.approx(sum(get_search_distance(catalonia, a, b) for a, b in zip(path, path[1:])))
+
+        stats = route_cache_stats(catalonia)
+        assert stats["trees_repaired"] > 0 and stats["routes_invalidated"] > 0
+        assert stats["invalidations"] == 0  # closures repair the cache, they never empty it
+
+    # The counters of one apply_closures call add up to the cache totals
+    catalonia = load_airspace("Cat")
+    path, _ = find_shortest_path_cached(catalonia, 1663, 14920)
+    for number in numbers[:50]:
+        find_shortest_path_cached(catalonia, 1663, number)
+    routes = len(get_route_cache(catalonia).routes)
+    close_navsegment(catalonia, path[3], path[4])
+    counts = apply_closures(catalonia)
+    assert counts["changes"] == 1 and counts["trees_repaired"] == 1
+    assert counts["routes_invalidated"] >= 1
+    assert counts["routes_invalidated"] + counts["routes_kept"] == routes
+    assert (1663, 14920, "distance") not in get_route_cache(catalonia).routes
+    set_navsegment_distance(catalonia, path[0], path[1], 0.0)  # shortens every route: the tree starts again
+    counts = apply_closures(catalonia)
+    assert counts["trees_reset"] == 1 and counts["routes_kept"] == 0
+    stats = route_cache_stats(catalonia)
+    assert (stats["trees_repaired"], stats["trees_reset"]) == (1, 1)
+    assert find_shortest_path_cached(catalonia, 1663, 14920)[1] == \
+        pytest.approx(find_shortest_path(catalonia, 1663, 14920)[1])
+
+
+def test_snapshot_round_trip(tmp_path):
+    """A snapshot loads back the same airspace, also over an airspace that already holds data."""
+    catalonia = load_airspace("Cat")
+    save_snapshot(catalonia, str(tmp_path / "snapshot"))
+    assert sorted(os.listdir(tmp_path)) == ["snapshot"]
+    save_snapshot(catalonia, str(tmp_path / "snapshot"))  # replacing leaves nothing behind either
+    assert sorted(os.listdir(tmp_path)) == ["snapshot"]
+
+    spain = load_airspace("Spain")
+    close_navsegment(spain, *next((s.origin_number, s.destination_number) for s in spain.navsegments))
+    find_shortest_path_cached(spain, 1663, 14920)
+    for loaded in (AirSpace(), spain):
+        load_snapshot(loaded, str(tmp_path / "snapshot"))
+        assert loaded.name == catalonia.name
+        assert sorted(loaded.navpoints) == sorted(catalonia.navpoints)
+        for number, point in catalonia.navpoints.items():
+            assert (loaded.navpoints[number].name, get_coords(loaded.navpoints[number])) == (point.name, get_coords(point))
+        assert [(s.origin_number, s.destination_number, s.distance) for s in loaded.navsegments] == \
+            [(s.origin_number, s.destination_number, s.distance) for s in catalonia.navsegments]
+        assert {name: (a.sids, a.stars) for name, a in loaded.navairports.items()} == \
+            {name: (a.sids, a.stars) for name, a in catalonia.navairports.items()}
+        assert loaded.names == catalonia.names
+        assert sorted(find_neighbors(loaded, 591)) == sorted(find_neighbors(catalonia, 591))
+        assert find_shortest_path(loaded, 1663, 14920)[1] == pytest.approx(find_shortest_path(catalonia, 1663, 14920)[1])
+        assert find_shortest_path_cached(loaded, 1663, 14920)[1] == pytest.approx(find_shortest_path(catalonia, 1663, 14920)[1])
+        assert not loaded.closed_segments and not loaded.closure_log
+
+
+def test_snapshot_is_rebuilt_when_a_file_changes(tmp_path, monkeypatch):
+    """load_from_files_cached reuses the snapshot while the files are unchanged and rebuilds it otherwise."""
+    paths = []
+    for path in data_files("Cat"):
+        paths.append(str(tmp_path / os.path.basename(path)))
+        shutil.copy(path, paths[-1])
+    cache = str(tmp_path / "cache")
+
+    first = AirSpace()
+    assert load_from_files_cached(first, *paths, cache_directory=cache)
+    assert get_navpoint_by_name(first, "ADX") is not None
+
+    # Unchanged, or only touched: the snapshot is used and nothing is parsed
+    os.utime(paths[0], ns=(0, os.stat(paths[0]).st_mtime_ns + 10 ** 9))
+    with monkeypatch.context() as patch:
+        patch.setattr(airSnapshot, "load_from_files_bulk", lambda *args, **kwargs: pytest.fail("parsed again"))
+        reused = AirSpace()
+        assert load_from_files_cached(reused, *paths, cache_directory=cache)
+    assert sorted(reused.navpoints) == sorted(first.navpoints)
+
+    # Same size, other contents: parsed again and the snapshot rewritten
+    with open(paths[0]) as f:
+        text = f.read()
+    with open(paths[0], "w") as f:
+        f.write(text.replace(" ADX ", " ADY ", 1))
+    rebuilt = AirSpace()
+    assert load_from_files_cached(rebuilt, *paths, cache_directory=cache)
+    assert get_navpoint_by_name(rebuilt, "ADY") is not None and get_navpoint_by_name(rebuilt, "ADX") is None
+    with monkeypatch.context() as patch:
+        patch.setattr(airSnapshot, "load_from_files_bulk", lambda *args, **kwargs: pytest.fail("parsed again"))
+        again = AirSpace()
+        assert load_from_files_cached(again, *paths, cache_directory=cache)
+    assert get_navpoint_by_name(again, "ADY") is not None
+
+
+def test_name_lookups_with_duplicate_and_renamed_points(tmp_path):
+    """Exact, prefix and fuzzy lookups agree across load paths when names repeat or change."""
+    points = [(1, "X", 41.0, 2.0), (2, "X", 41.1, 2.1), (3, "XRAY", 41.2, 2.2), (4, "ALPHA", 41.3, 2.3),
+              (1, "Y", 41.0, 2.0), (4, "XRAY", 41.3, 2.3), (3, "BRAVO", 41.2, 2.2)]
+    incremental = AirSpace()
+    for number, name, latitude, longitude in points:
+        add_navpoint(incremental, NavPoint(number, name, latitude, longitude))
+        find_navpoints_by_prefix(incremental, "X")  # the sorted names are kept in step too
+        find_navpoints_fuzzy(incremental, "X")
+    bulk = AirSpace()
+    add_navpoints_bulk(bulk, *(list(column) for column in zip(*points)))
+    save_snapshot(incremental, str(tmp_path / "snapshot"))
+    snapshot = AirSpace()
+    load_snapshot(snapshot, str(tmp_path / "snapshot"))
+
+    for airspace in (incremental, bulk, snapshot):
+        assert airspace.names == {"X": 2, "Y": 1, "XRAY": 4, "BRAVO": 3}
+        assert get_navpoint_by_name(airspace, "X").number == 2
+        assert get_navpoint_by_name(airspace, "ALPHA") is None
+        assert [point.name for point in find_navpoints_by_prefix(airspace, "x")] == ["X", "XRAY"]
+        assert [point.number for point in find_navpoints_by_prefix(airspace, "")] == [3, 2, 4, 1]
+        assert [(point.number, distance) for point, distance in find_navpoints_fuzzy(airspace, "XRY", 1)] == [(4, 1)]
+        assert [(point.name, distance) for point, distance in find_navpoints_fuzzy(airspace, "Z", 1)] == \
+            [("X", 1), ("Y", 1)]
+
+    # Renaming the last point with a name drops it from every lookup
+    add_navpoint(incremental, NavPoint(2, "ZULU", 41.1, 2.1))
+    assert get_navpoint_by_name(incremental, "X") is None
+    assert [point.name for point in find_navpoints_by_prefix(incremental, "X")] == ["XRAY"]
+    assert all(point.name != "X" for point, _ in find_navpoints_fuzzy(incremental, "X"))
+
+
+def test_hierarchy_matches_dijkstra(tmp_path):
+    """hierarchy_path finds find_shortest_path's distance, also after a save/load round trip, and
+    load_hierarchy rejects a file built from another airspace."""
+    spain = load_airspace("Spain")
+    path = str(tmp_path / "spain.npz")
+    save_hierarchy(build_hierarchy(spain), path)
+    hierarchy = load_hierarchy(spain, path)
+
+    numbers = sorted(spain.navpoints)
+    rng = random.Random(7)
+    reachable = 0
+    for start, end in [tuple(rng.sample(numbers, 2)) for _ in range(200)] + [(numbers[0], numbers[0])]:
+        expected_path, expected_distance = find_shortest_path(spain, start, end)
+        route, distance = hierarchy_path(spain, hierarchy, start, end)
+        assert distance == pytest.approx(expected_distance)
+        assert bool(route) == bool(expected_path)
+        if route:
+            assert route[0] == start and route[-1] == end
+            assert distance == pytest.approx(sum(get_segment_distance(spain, a, b) for a, b in zip(route, route[1:])))
+            reachable += 1
+    assert reachable > 20
+
+    with pytest.raises(ValueError, match="different airspace"):
+        load_hierarchy(load_airspace("Cat"), path)
+    add_navsegment(spain, NavSegment(numbers[0], numbers[1], 1.0))
+    with pytest.raises(ValueError, match="different airspace"):
+        load_hierarchy(spain, path)
+    with pytest.raises(ValueError, match="out of date"):
+        hierarchy_path(spain, hierarchy, numbers[0], numbers[1])
+
+
+def test_tiled_routes_and_map(tmp_path):
+    """Routes read from tiles match the in-memory routes with few tiles resident, save_tiles
+    refuses closures, and the tiled map reads only the region around the view."""
+    spain = load_airspace("Spain")
+    assert save_tiles(spain, str(tmp_path / "tiles"), tile_degrees=1.0) > 10
+    tiled = open_tiles(str(tmp_path / "tiles"), max_tiles=4)
+
+    numbers = sorted(spain.navpoints)
+    rng = random.Random(3)
+    for start, end in [tuple(rng.sample(numbers, 2)) for _ in range(100)] + [(numbers[0], numbers[0])]:
+        for method in ("dijkstra", "astar"):
+            route, distance = find_shortest_path_tiled(tiled, start, end, method)
+            expected_route, expected_distance = find_shortest_path(spain, start, end, method)
+            assert distance == pytest.approx(expected_distance)
+            assert bool(route) == bool(expected_route)
+            if route:
+                assert route[0] == start and route[-1] == end
+                assert distance == pytest.approx(sum(get_segment_distance(spain, a, b)
+                                                     for a, b in zip(route, route[1:])))
+    stats = tile_stats(tiled)
+    assert stats["resident"] <= 4 and stats["evictions"] > 0
+
+    close_navpoint(spain, numbers[0])
+    with pytest.raises(ValueError, match="Reopen"):
+        save_tiles(spain, str(tmp_path / "tiles"))
+    reopen_navpoint(spain, numbers[0])
+    segment = spain.navsegments.store
+    origin, destination = int(segment.origins[0]), int(segment.destinations[0])
+    set_navsegment_distance(spain, origin, destination, 1.0)
+    with pytest.raises(ValueError, match="Reopen"):
+        save_tiles(spain, str(tmp_path / "tiles"))
+    set_navsegment_distance(spain, origin, destination)
+    assert open_tiles(str(tmp_path / "tiles")).keys == tiled.keys  # The refused saves left the tiles alone
+    save_tiles(spain, str(tmp_path / "tiles"), tile_degrees=1.0)
+    assert os.listdir(tmp_path) == ["tiles"]  # No scratch or replaced copy left behind
+
+    fig = Figure()
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    view = open_tiled_map_view(ax, canvas, tiled, 40.0, -4.0, 41.0, -3.0)
+    canvas.draw()
+    assert view.refreshes == 1 and 0 < len(view.airspace.navpoints) < len(spain.navpoints)
+    assert ax.get_xlim() == (-4.0, -3.0) and ax.get_ylim() == (40.0, 41.0)
+    inside = find_navpoints_in_bbox(spain, 39.5, -4.5, 41.5, -2.5)
+    assert {navpoint.number for navpoint in inside} <= set(view.airspace.navpoints)
+
+    ax.set_xlim(-3.8, -3.2)  # Still inside the drawn region
+    assert not refresh_tiled_map(view)
+    ax.set_xlim(0.0, 1.0)
+    ax.set_ylim(41.0, 42.0)
+    assert refresh_tiled_map(view) and view.refreshes == 2
+    canvas.draw()
+    assert {navpoint.number for navpoint in find_navpoints_in_bbox(spain, 41.0, 0.0, 42.0, 1.0)} <= \
+        set(view.airspace.navpoints)
+    assert tile_stats(tiled)["resident"] <= 4
+    ax.set_xlim(-40.0, -39.0)  # Open sea: nothing to draw
+    assert refresh_tiled_map(view) and not view.airspace.navpoints
+    canvas.draw()
+
+
+def test_merge_reports_repeats_and_conflicts(tmp_path):
+    """merge_files drops repeated points and segments, counts them in the MergeReport,
+    reports the ones that disagree by more than tolerance_km and takes a generator."""
+    cat = load_airspace("Cat")
+    spain = load_airspace("Spain")
+    segment_keys = [(int(o), int(d)) for airspace in (cat, spain)
+                    for o, d in zip(airspace.navsegments.store.origins[:airspace.navsegments.store.count],
+                                    airspace.navsegments.store.destinations[:airspace.navsegments.store.count])]
+
+    merged = AirSpace()
+    report = merge_files(merged, (files for files in [data_files("Cat"), data_files("Spain")]))
+    assert report.sources == ["Catalunya", "Spain"]
+    assert report.points == len(merged.navpoints) == len(set(cat.navpoints) | set(spain.navpoints))
+    assert report.duplicate_points == len(cat.navpoints) + len(spain.navpoints) - report.points
+    assert report.segments == len(merged.navsegments) == len(set(segment_keys))
+    assert report.duplicate_segments == len(segment_keys) - report.segments
+    assert report.duplicate_points > 0 and report.duplicate_segments > 0
+    assert not report.point_conflicts and not report.segment_conflicts
+    shared = sorted(set(cat.navpoints) & set(spain.navpoints))
+    for number in shared[:20]:
+        point = get_navpoint_by_number(merged, number)
+        assert (point.name, point.latitude, point.longitude) == \
+            (cat.navpoints[number].name, cat.navpoints[number].latitude, cat.navpoints[number].longitude)
+
+    # A copy of Cat with a point moved 0.5 degrees, one renamed, one moved a few metres,
+    # a segment 5 km longer and another 1 m longer
+    nav_file, seg_file, aer_file = data_files("Cat")
+    with open(nav_file) as f:
+        nav_lines = [line.split() for line in f if line.strip()]
+    moved, renamed, nudged = nav_lines[0], nav_lines[1], nav_lines[2]
+    moved[2] = str(float(moved[2]) + 0.5)
+    renamed[1] += "X"
+    nudged[2] = str(float(nudged[2]) + 0.00005)
+    with open(seg_file) as f:
+        seg_lines = [line.split() for line in f if line.strip()]
+    seg_lines[0][2] = str(float(seg_lines[0][2]) + 5)
+    seg_lines[1][2] = str(float(seg_lines[1][2]) + 0.001)
+    (tmp_path / "Copy_nav.txt").write_text("\n".join(" ".join(line) for line in nav_lines) + "\n")
+    (tmp_path / "Copy_seg.txt").write_text("\n".join(" ".join(line) for line in seg_lines) + "\n")
+    shutil.copy(aer_file, tmp_path / "Copy_aer.txt")
+
+    merged = AirSpace()
+    report = merge_files(merged, [data_files("Cat"),
+                                  [str(tmp_path / f"Copy_{kind}.txt") for kind in ("nav", "seg", "aer")]])
+    assert report.sources == ["Catalunya", "Copy"]
+    assert report.points == len(cat.navpoints) and report.segments == len(cat.navsegments)
+    assert sorted((number, kept_source, source) for number, kept_source, source, _, _, _ in
+                  report.point_conflicts) == sorted([(int(moved[0]), 0, 1), (int(renamed[0]), 0, 1)])
+    conflicts = {number: (kept, dropped, km) for number, _, _, kept, dropped, km in report.point_conflicts}
+    assert conflicts[int(moved[0])][2] == pytest.approx(55.6, abs=0.5)
+    assert conflicts[int(renamed[0])][1].name == renamed[1]
+    assert report.duplicate_points == len(cat.navpoints) - 2
+    assert [(origin, destination, kept_source, source) for origin, destination, kept_source, source, _, _ in
+            report.segment_conflicts] == [(int(seg_lines[0][0]), int(seg_lines[0][1]), 0, 1)]
+    assert report.segment_conflicts[0][5] - report.segment_conflicts[0][4] == pytest.approx(5)
+    assert report.duplicate_segments == len(cat.navsegments) - 1
+    assert get_navpoint_by_number(merged, int(moved[0])).latitude == cat.navpoints[int(moved[0])].latitude
+    assert len(merge_airspaces(AirSpace(), [cat, cat], tolerance_km=0).point_conflicts) == 0
+
+    # Merging into an airspace drops its closures, overrides and cached routes with its old contents
+    start, end = shared[0], shared[-1]
+    find_shortest_path_cached(cat, start, end)
+    close_navpoint(cat, shared[1])
+    set_navsegment_distance(cat, int(seg_lines[0][0]), int(seg_lines[0][1]), 1.0)
+    version = cat.version
+    report = merge_files(cat, [data_files("Spain")])
+    assert report.sources == ["Cat", "Spain"] and report.duplicate_points == len(shared)
+    assert not cat.closed_points and not cat.segment_distances and cat.route_cache is None
+    assert cat.version > version
+    assert find_shortest_path_cached(cat, start, end) == find_shortest_path(cat, start, end)
+
+    assert merge_files(AirSpace(), [[str(tmp_path / "missing_nav.txt"), seg_file, aer_file]]) is None
+
+
+def scan_neighbors(airspace):
+    """{number: {neighbor: distance}} from a scan of every segment, first segment of a pair wins."""
+    neighbors = {}
+    store = airspace.navsegments.store
+    for origin, destination, distance in zip(store.origins[:store.count].tolist(),
+                                             store.destinations[:store.count].tolist(),
+                                             store.distances[:store.count].tolist()):
+        neighbors.setdefault(origin, {}).setdefault(destination, distance)
+        neighbors.setdefault(destination, {}).setdefault(origin, distance)
+    return neighbors
+
+
+def test_neighbors_after_incremental_and_bulk_loads():
+    """find_neighbors, find_outgoing and get_segment_distance agree with a scan of the
+    segments after a per-line load, a bulk load and segments added to a bulk load."""
+    incremental = load_airspace("Cat")
+    bulk = AirSpace()
+    assert load_from_files_bulk(bulk, *data_files("Cat"))
+    expected = scan_neighbors(incremental)
+    assert scan_neighbors(bulk) == expected
+    outgoing = {}
+    for segment in incremental.navsegments:
+        outgoing.setdefault(segment.origin_number, {}).setdefault(segment.destination_number, segment.distance)
+
+    numbers = sorted(incremental.navpoints)
+    for airspace in (incremental, bulk):
+        for number in numbers:
+            assert find_neighbors(airspace, number) == list(expected.get(number, {}))
+            assert find_outgoing(airspace, number) == outgoing.get(number, {})
+            for neighbor, distance in expected.get(number, {}).items():
+                assert get_segment_distance(airspace, number, neighbor) == distance
+    assert find_neighbors(incremental, -1) == [] and find_neighbors(bulk, -1) == []
+
+    # One new connection and one repeat of an existing one with another distance: the
+    # first segment of a pair keeps its distance, on the adjacency maps and on the graph
+    origin, destination = numbers[0], numbers[-1]
+    assert destination not in expected.get(origin, {})
+    repeated = next(number for number in numbers if expected.get(number))
+    repeated_neighbor, repeated_distance = next(iter(expected[repeated].items()))
+    for airspace in (incremental, bulk):
+        add_navsegment(airspace, NavSegment(origin, destination, 12.5))
+        add_navsegment(airspace, NavSegment(repeated_neighbor, repeated, repeated_distance + 100))
+        assert airspace.graph is None
+        assert find_neighbors(airspace, origin) == list(expected.get(origin, {})) + [destination]
+        assert find_neighbors(airspace, destination)[-1] == origin
+        assert get_segment_distance(airspace, destination, origin) == 12.5
+        assert get_segment_distance(airspace, repeated_neighbor, repeated) == repeated_distance
+        assert find_outgoing(airspace, origin)[destination] == 12.5
+        assert airspace.adjacency_count == len(airspace.navsegments)
+        updated = scan_neighbors(airspace)
+        build_graph(airspace)
+        for number in numbers:
+            assert find_neighbors(airspace, number) == list(updated.get(number, {}))
+
+
+def test_csr_graph_matches_the_segments():
+    """Every CSR row lists the neighbors and distances a scan of the segments finds, in the
+    same order, for Spain and for random arrays with repeated pairs and unknown endpoints."""
+    spain = load_airspace("Spain")
+    graph = build_graph(spain)
+    assert spain.graph is graph
+    expected = scan_neighbors(spain)
+    assert list(graph.numbers) == sorted(set(spain.navpoints) | set(expected))
+    assert len(graph.offsets) == len(graph.numbers) + 1 and graph.offsets[-1] == len(graph.targets)
+    for index in range(len(graph.numbers)):
+        number = get_number(graph, index)
+        assert get_index(graph, number) == index
+        assert [(get_number(graph, target), weight) for target, weight in graph_neighbors(graph, index)] == \
+            list(expected.get(number, {}).items())
+    assert get_index(graph, -1) is None and get_index(graph, int(graph.numbers[-1]) + 1) is None
+
+    rng = np.random.default_rng(5)
+    points = np.arange(0, 200, 2)
+    origins = rng.integers(0, 210, 2000)
+    destinations = rng.integers(0, 210, 2000)
+    distances = rng.uniform(1, 100, 2000)
+    graph = build_graph_from_arrays(points, origins, destinations, distances)
+    expected = {}
+    for origin, destination, distance in zip(origins.tolist(), destinations.tolist(), distances.tolist()):
+        expected.setdefault(origin, {}).setdefault(destination, distance)
+        expected.setdefault(destination, {}).setdefault(origin, distance)
+    assert list(graph.numbers) == sorted(set(points.tolist()) | set(expected))
+    for index, number in enumerate(graph.numbers.tolist()):
+        assert [(get_number(graph, target), weight) for target, weight in graph_neighbors(graph, index)] == \
+            list(expected.get(number, {}).items())
+
+
+def test_column_store_views():
+    """NavPointMap behaves as a dict of NavPoints over the column arrays: views read and
+    write their row, have no __dict__, and rows survive growth, re-sorting and overwrites."""
+    points = NavPointMap()
+    rng = random.Random(11)
+    numbers = rng.sample(range(1, 100_000), 1000)  # More than the unsorted recent rows allow
+    for number in numbers:
+        points[number] = NavPoint(number, f"P{number}", number / 2000, -number / 3000)
+    assert len(points) == 1000 and list(points) == numbers
+    assert len(points.store.sorted_numbers) > 0 and len(points.store.recent_rows) < 1000  # Re-sorted on the way
+
+    for row, number in enumerate(numbers):
+        view = points[number]
+        assert view.row == row
+        assert (view.number, view.name, view.latitude, view.longitude) == \
+            (number, f"P{number}", number / 2000, -number / 3000)
+        assert type(view.number) is int and type(view.latitude) is float
+    assert 0 not in points and points.get(0) is None and points.get(0, "none") == "none"
+    with pytest.raises(KeyError):
+        points[0]
+
+    view = points[numbers[10]]
+    with pytest.raises(AttributeError):
+        view.__dict__
+    with pytest.raises(AttributeError):
+        view.altitude = 1
+    with pytest.raises(AttributeError):
+        NavPoint(1, "A", 0, 0).altitude = 1
+    view.latitude = 45.5
+    view.name = "RENAMED"
+    numbers_array, latitudes, longitudes = get_coordinate_arrays(points.store)
+    assert latitudes[10] == 45.5 and points.store.names[10] == "RENAMED"
+    assert np.shares_memory(latitudes, points.store.latitudes) and len(numbers_array) == 1000
+
+    # An overwrite keeps the row, a new number gets the next one
+    points[numbers[10]] = NavPoint(numbers[10], "AGAIN", 1.0, 2.0)
+    assert points[numbers[10]].row == 10 and points[numbers[10]].name == "AGAIN"
+    points[100_001] = NavPoint(100_001, "NEW", 3.0, 4.0)
+    assert points[100_001].row == 1000 and len(points) == 1001
+    assert find_rows(points.store, [numbers[5], 0, 100_001]).tolist() == [5, -1, 1000]
+
+    # Bulk stores: fresh numbers are appended in one go, repeats go row by row
+    store_points(points.store, [200_000, 200_001], ["X", "Y"], [1.0, 2.0], [3.0, 4.0])
+    store_points(points.store, [numbers[0], 200_002, 200_002], ["FIRST", "Z", "Z2"], [5.0, 6.0, 7.0],
+                 [8.0, 9.0, 10.0])
+    assert len(points) == 1004
+    assert (points[numbers[0]].row, points[numbers[0]].name) == (0, "FIRST")
+    assert (points[200_002].name, points[200_002].latitude) == ("Z2", 7.0)
+    assert [points[number].row for number in (200_000, 200_001, 200_002)] == [1001, 1002, 1003]
+
+
+def test_vectorized_distances_and_segment_validation(capsys):
+    """haversine over arrays matches calculate_distance point by point, and
+    validate_segment_distances flags exactly the segments that do not fit the coordinates."""
+    spain = load_airspace("Spain")
+    origins, destinations, distances, geometric = segment_great_circle_distances(spain)
+    for origin, destination, distance in zip(origins.tolist(), destinations.tolist(), geometric.tolist()):
+        assert distance == pytest.approx(calculate_distance(spain, spain.navpoints[origin],
+                                                            spain.navpoints[destination]), rel=1e-9, abs=1e-9)
+
+    points = [spain.navpoints[number] for number in sorted(spain.navpoints)[:50]]
+    latitudes = [point.latitude for point in points]
+    longitudes = [point.longitude for point in points]
+    matrix = distances_many_to_many(latitudes, longitudes, latitudes, longitudes)
+    assert matrix.shape == (50, 50) and np.allclose(np.diag(matrix), 0)
+    assert np.allclose(matrix, matrix.T)
+    assert np.allclose(distances_one_to_many(latitudes[3], longitudes[3], latitudes, longitudes), matrix[3])
+    assert matrix[3, 7] == pytest.approx(calculate_distance(spain, points[3], points[7]), rel=1e-9)
+    assert haversine(0.0, 0.0, 0.0, 180.0) == pytest.approx(math.pi * 6371.0)  # Rounding cannot give NaN
+    assert haversine(90.0, 0.0, -90.0, 45.0) == pytest.approx(math.pi * 6371.0)
+
+    assert validate_segment_distances(spain) == []
+    print_segment_outliers([])
+    assert "All segment distances match" in capsys.readouterr().out
+
+    # A segment 20% too long, one 4% too short, one to an unknown point and one from a point to itself
+    (origin, destination), great_circle = next(((o, d), g) for o, d, g in zip(
+        origins.tolist(), destinations.tolist(), geometric.tolist()) if g > 10)
+    add_navsegment(spain, NavSegment(origin, destination, great_circle * 1.2))
+    add_navsegment(spain, NavSegment(destination, origin, great_circle * 0.96))
+    add_navsegment(spain, NavSegment(origin, -5, 10.0))
+    add_navsegment(spain, NavSegment(origin, origin, 3.0))
+    outliers = validate_segment_distances(spain)
+    assert [(o, d) for o, d, _, _ in outliers] == [(origin, destination), (origin, -5), (origin, origin)]
+    assert outliers[0][2] == pytest.approx(great_circle * 1.2) and outliers[0][3] == pytest.approx(great_circle)
+    assert outliers[1][3] is None and outliers[2][3] == 0
+    assert [(o, d) for o, d, _, _ in validate_segment_distances(spain, tolerance=0.01)] == \
+        [(origin, destination), (destination, origin), (origin, -5), (origin, origin)]
+    assert [(o, d) for o, d, _, _ in validate_segment_distances(spain, tolerance=1.0)] == \
+        [(origin, -5), (origin, origin)]
+
+    print_segment_outliers(outliers, limit=2)
+    out = capsys.readouterr().out
+    assert "3 segment distances do not match" in out and f"{origin} -> -5: endpoint not found" in out
+    assert "... and 1 more" in out
+
+
+def test_bulk_loader_matches_the_text_loader():
+    """load_from_files_bulk builds the same points, segments, airports, name index and
+    routes as load_from_files on both data sets."""
+    for prefix in ("Cat", "Spain"):
+        text = load_airspace(prefix)
+        bulk = AirSpace(prefix)
+        assert load_from_files_bulk(bulk, *data_files(prefix))
+        for column, expected in zip(get_coordinate_arrays(bulk.navpoints.store),
+                                    get_coordinate_arrays(text.navpoints.store)):
+            assert np.array_equal(column, expected)
+        assert bulk.navpoints.store.names == text.navpoints.store.names
+        for field in ("origins", "destinations", "distances"):
+            assert np.array_equal(getattr(bulk.navsegments.store, field)[:bulk.navsegments.store.count],
+                                  getattr(text.navsegments.store, field)[:text.navsegments.store.count])
+        assert bulk.names == text.names
+        assert [(a.name, a.sids, a.stars) for a in bulk.navairports.values()] == \
+            [(a.name, a.sids, a.stars) for a in text.navairports.values()]
+
+        numbers = sorted(text.navpoints)
+        rng = random.Random(13)
+        for start, end in [tuple(rng.sample(numbers, 2)) for _ in range(30)]:
+            assert find_shortest_path(bulk, start, end) == find_shortest_path(text, start, end)
+
+
+def test_trees_and_airport_matrix_match_single_searches():
+    """Routes read from shortest path trees and the airport SID -> STAR matrix match
+    find_shortest_path and one search per SID x STAR pair, also when a STAR is one of
+    the origin's SIDs."""
+    spain = load_airspace("Spain")
+    numbers = sorted(spain.navpoints)
+    rng = random.Random(17)
+    start = numbers[0]
+    targets = rng.sample(numbers, 40) + [start, -1]
+
+    distances, previous = single_source_shortest_paths(spain, start)
+    tree = shortest_path_tree(spain, start, targets[0])
+    for end in targets:
+        path, distance = find_shortest_path(spain, start, end)
+        assert route_from_tree(tree, end) == (path, pytest.approx(distance))
+        if path:
+            assert distances[end] == pytest.approx(distance)
+            chain = [end]
+            while previous[chain[-1]] is not None:
+                chain.append(previous[chain[-1]])
+            assert chain[::-1] == path
+        else:
+            assert end == start or end not in distances
+    assert distances[start] == 0 and previous[start] is None
+    assert single_source_shortest_paths(spain, -1) == ({}, {})
+
+    # A few airports with several SIDs and STARs, so each row starts from many sources
+    for name in list(spain.navairports)[:4]:
+        airport = spain.navairports[name]
+        for number in find_neighbors(spain, airport.sids[0])[:2]:
+            add_sid(airport, number)
+        for number in find_neighbors(spain, airport.stars[0])[:2]:
+            add_star(airport, number)
+    names = list(spain.navairports)[:10]
+    stats = SearchStats()
+    matrix = airport_route_matrix(spain, names, stats)
+    assert list(matrix) == names
+    for origin in names:
+        assert list(matrix[origin]) == [name for name in names if name != origin]
+        for destination, best in matrix[origin].items():
+            expected = best_procedure_route(spain, spain.navairports[origin], spain.navairports[destination])
+            if expected is None:
+                assert best is None
+                continue
+            path, distance = best
+            assert distance == pytest.approx(expected[1])
+            assert path[0] in spain.navairports[origin].sids and path[-1] in spain.navairports[destination].stars
+            assert distance == pytest.approx(sum(get_segment_distance(spain, a, b) for a, b in zip(path, path[1:])))
+    assert stats.settled > 0
+
+
+def clip_to_box(lat1, lon1, lat2, lon2, min_lat, min_lon, max_lat, max_lon):
+    """Whether the straight latitude/longitude segment touches the box (Liang-Barsky clipping)."""
+    low, high = 0.0, 1.0
+    for start, delta, lowest, highest in ((lon1, lon2 - lon1, min_lon, max_lon), (lat1, lat2 - lat1, min_lat, max_lat)):
+        if delta == 0:
+            if not lowest <= start <= highest:
+                return False
+            continue
+        t1, t2 = sorted(((lowest - start) / delta, (highest - start) / delta))
+        low, high = max(low, t1), min(high, t2)
+    return low <= high
+
+
+def test_segment_area_queries_and_avoid():
+    """Segment box, circle and polygon queries match a scan of every segment, include
+    segments added later, and routes with avoid= never use the segments found."""
+    spain = load_airspace("Spain")
+    store = spain.navsegments.store
+    rows = range(store.count)
+    coordinates = []
+    for row in rows:
+        origin = spain.navpoints[int(store.origins[row])]
+        destination = spain.navpoints[int(store.destinations[row])]
+        coordinates.append((origin.latitude, origin.longitude, destination.latitude, destination.longitude))
+
+    for box in [(40.0, -4.0, 41.0, -3.0), (41.2, 1.5, 41.6, 2.5), (36.0, -7.0, 44.0, 4.0), (0.0, 0.0, 1.0, 1.0)]:
+        found = [segment.row for segment in find_segments_in_bbox(spain, *box)]
+        assert found == [row for row in rows if clip_to_box(*coordinates[row], *box)]
+
+    # Circles and polygons against positions sampled along every segment: a segment with
+    # a sample well inside is found, one with every sample well outside is not
+    samples = np.linspace(0.0, 1.0, 400)
+    def along(row):
+        lat1, lon1, lat2, lon2 = coordinates[row]
+        return lat1 + (lat2 - lat1) * samples, lon1 + (lon2 - lon1) * samples
+
+    for latitude, longitude, radius_km in [(40.5, -3.5, 60.0), (41.3, 2.1, 25.0), (28.0, -15.5, 100.0)]:
+        found = {segment.row for segment in find_segments_in_circle(spain, latitude, longitude, radius_km)}
+        for row in rows:
+            nearest = haversine(latitude, longitude, *along(row)).min()
+            if nearest < radius_km * 0.99:
+                assert row in found
+            elif nearest > radius_km * 1.01:
+                assert row not in found
+
+    for polygon in [[(39.0, -5.0), (42.0, -3.0), (39.0, -1.0)],
+                    [(41.0, 0.0), (42.5, 0.5), (42.0, 3.0), (41.5, 1.5), (40.5, 2.5)]]:
+        found = {segment.row for segment in find_segments_in_polygon(spain, polygon)}
+        outline = Path([(longitude, latitude) for latitude, longitude in polygon] + [polygon[0][::-1]], closed=True)
+        for row in rows:
+            latitudes, longitudes = along(row)
+            points = np.column_stack((longitudes, latitudes))
+            # The sign of radius that grows the outline depends on its orientation
+            grown, shrunk = sorted((outline.contains_points(points, radius=0.01).any(),
+                                    outline.contains_points(points, radius=-0.01).any()), reverse=True)
+            if shrunk:
+                assert row in found
+            elif not grown:
+                assert row not in found
+        assert 0 < len(found) < len(rows)
+
+    # A segment added after the grid was built is found by the next query
+    box = (40.0, -4.0, 41.0, -3.0)
+    inside = find_navpoints_in_bbox(spain, *box)
+    far = find_nearest_navpoints(spain, 43.0, 2.0)[0][0]
+    add_navsegment(spain, NavSegment(inside[0].number, far.number, 600.0))
+    assert (inside[0].number, far.number) in [(segment.origin_number, segment.destination_number)
+                                               for segment in find_segments_in_bbox(spain, *box)]
+
+    # avoid= routes around the segments of an area, like closing them does
+    numbers = sorted(spain.navpoints)
+    avoided = find_segments_in_polygon(spain, [(39.0, -5.0), (42.0, -3.0), (39.0, -1.0)])
+    connections = {(segment.origin_number, segment.destination_number) for segment in avoided}
+    connections |= {(b, a) for a, b in connections}
+    rng = random.Random(19)
+    pairs = [tuple(rng.sample(numbers, 2)) for _ in range(40)]
+    for graph in (False, True):
+        spain.graph = build_graph(spain) if graph else None
+        routes = [find_shortest_path(spain, start, end, avoid=avoided) for start, end in pairs]
+        for route, _ in routes:
+            assert not connections & set(zip(route, route[1:]))
+        for segment in avoided:
+            close_navsegment(spain, segment.origin_number, segment.destination_number)
+        closed_routes = [find_shortest_path(spain, start, end) for start, end in pairs]
+        for segment in avoided:
+            reopen_navsegment(spain, segment.origin_number, segment.destination_number)
+        assert [distance for _, distance in routes] == pytest.approx([distance for _, distance in closed_routes])
+        assert any(distance != find_shortest_path(spain, start, end)[1]
+                   for (start, end), (_, distance) in zip(pairs, routes))
+
+
+def test_map_view_redraws_only_the_overlay(tmp_path):
+    """show_overlay blits the overlay onto the kept base map: the pixels match a full
+    redraw, the base artists are not rebuilt, and a background of another size is not used."""
+    cat = load_airspace("Cat")
+    fig = Figure()
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111)
+    view = open_map_view(ax, canvas, cat)
+    assert view.background is not None and view.version == cat.version
+    base = ax.get_children()
+
+    numbers = sorted(cat.navpoints)
+    route = [cat.navpoints[number] for number in find_shortest_path(cat, numbers[0], numbers[50])[0]]
+    center = route[1]
+    neighbors = [(cat.navpoints[number], get_segment_distance(cat, center.number, number))
+                 for number in find_neighbors(cat, center.number)]
+    assert len(route) > 2 and neighbors
+
+    for overlay, title in [(dict(route=route), "Coste"), (dict(highlight=center, neighbors=neighbors), center.name),
+                           ({}, "nodos y segmentos")]:
+        show_overlay(view, **overlay)
+        assert title in ax.get_title()
+        assert all(artist.get_animated() for artist in view.overlay)
+        assert [artist for artist in ax.get_children() if artist not in view.overlay] == base
+        blitted = np.array(canvas.buffer_rgba())
+        canvas.draw()
+        assert np.array_equal(np.array(canvas.buffer_rgba()), blitted)
+    assert view.overlay == []
+    assert view.stats.overlays == 3 and view.stats.full_draws == 0
+
+    fig.savefig(tmp_path / "map.png", dpi=50)  # Fires draw_event at another size
+    show_overlay(view, route=route)
+    assert view.stats.full_draws == 1
+    show_overlay(view, route=route)
+    assert view.stats.full_draws == 1
+
+    add_navsegment(cat, NavSegment(numbers[0], numbers[1], 1.0))
+    assert view.version != cat.version  # The GUI opens a new view for changed data
+
+
+def test_benchmark_suite_flags_regressions(tmp_path, monkeypatch):
+    """compare_results flags metrics more than threshold above the baseline, only for
+    datasets and metrics both runs have, and main exits with 1 when it finds one."""
+    paths = benchmarkSuite.write_synthetic_dataset(str(tmp_path), 1000)
+    airspace = AirSpace()
+    assert load_from_files(airspace, *paths)
+    assert len(airspace.navpoints) > 1000 and airspace.navairports
+    assert all(airport.sids and airport.stars for airport in airspace.navairports.values())
+    result = benchmarkSuite.benchmark_dataset(paths, n_lookups=100, n_routes=5, render=False)
+    assert result["points"] == len(airspace.navpoints) and result["find_shortest_path_ms"] > 0
+
+    baseline = {"results": [
+        {"dataset": "A", "points": 10, "segments": 20, "load_from_files_s": 1.0, "find_neighbors_us": 100.0,
+         "render_s": 0.0, "load_peak_mb": 50.0},
+        {"dataset": "B", "points": 10, "load_from_files_s": 1.0},
+    ]}
+    current = {"results": [
+        {"dataset": "A", "points": 99, "segments": 99, "load_from_files_s": 1.5, "find_neighbors_us": 110.0,
+         "render_s": 2.0, "load_peak_mb": 25.0, "find_shortest_path_ms": 3.0},
+        {"dataset": "C", "points": 10, "load_from_files_s": 9.0},
+    ]}
+    rows = benchmarkSuite.compare_results(baseline, current)
+    assert [(dataset, metric, regressed) for dataset, metric, _, _, _, regressed in rows] == [
+        ("A", "load_from_files_s", True),
+        ("A", "find_neighbors_us", False),  # Exactly at the threshold
+        ("A", "load_peak_mb", False),
+    ]
+    assert rows[0][2:5] == (1.0, 1.5, 1.5) and rows[2][4] == 0.5
+    assert [row[-1] for row in benchmarkSuite.compare_results(baseline, current, threshold=0.6)] == \
+        [False, False, False]
+    assert [row[-1] for row in benchmarkSuite.compare_results(baseline, current, threshold=0.05)] == \
+        [True, True, False]
+
+    with open(tmp_path / "baseline.json", "w") as f:
+        json.dump(baseline, f)
+    monkeypatch.setattr(benchmarkSuite, "run_suite", lambda *args: current)
+    output = str(tmp_path / "current.json")
+    for threshold, code in (("0.1", 1), ("0.6", 0)):
+        monkeypatch.setattr("sys.argv", ["benchmarkSuite.py", "--output", output, "--compare",
+                                         str(tmp_path / "baseline.json"), "--threshold", threshold])
+        assert benchmarkSuite.main() == code
+    with open(output) as f:
+        assert json.load(f) == current
+
+
 def plot_airspace(airspace):
     """Plot the entire airspace with all navigation points and segments."""
     plt.figure(figsize=(12, 10))